@@ -0,0 +1,305 @@
+import os
+import queue
+import threading
+import time
+
+import serial
+
+import settings
+from metrics import metrics
+
+HAZARD_COMMAND = '1'
+SAFE_COMMAND = '0'
+VALID_COMMANDS = (SAFE_COMMAND, HAZARD_COMMAND)
+
+
+def parse_line(line):
+    """
+    Interprets one line printed by arduinoalarm/sketch/sketch.ino.
+
+    Returns 'ready' for the boot banner, '1'/'0' for the hazard/safe
+    acknowledgements and for the hazard loop counter, or None.
+    """
+    line = line.strip()
+    if line == 'Start!':
+        return 'ready'
+    if line == 'Hazard condition.' or line.isdigit():
+        return HAZARD_COMMAND
+    if line == 'Safe condition.':
+        return SAFE_COMMAND
+    return None
+
+
+class AlarmDispatcher(threading.Thread):
+    """
+    Owns the serial link to the Arduino alarm on a worker thread.
+
+    `send` only enqueues, so the Qt thread never blocks on the port. The worker
+    coalesces queued commands down to the latest desired state (the sketch
+    loops in hazard_cond/safe_cond until told otherwise, so repeats are
+    redundant), parses the sketch's output as acknowledgements and reconnects
+    with exponential backoff when the port disappears.
+    """
+
+    def __init__(self, port=None, baud_rate=None, on_line=None, on_state=None):
+        """
+        Args:
+        - port (str): Serial port name, e.g. 'COM3' or '/dev/ttyACM0' (can be set later with set_port).
+        - baud_rate (int): Serial speed (default is settings.ALARM_BAUD_RATE).
+        - on_line (callable): Called with every line the Arduino prints.
+        - on_state (callable): Called with '0'/'1' whenever the acknowledged alarm state changes.
+        """
+        super().__init__(daemon=True)
+        self.port = port
+        self.baud_rate = baud_rate or settings.ALARM_BAUD_RATE
+        self.on_line = on_line
+        self.on_state = on_state
+
+        self.commands = queue.Queue()
+        self.ser = None
+        self.ready = False
+        self.acknowledged_state = None
+        self.commands_written = 0
+        self.commands_coalesced = 0
+        self.reconnects = 0
+
+        self._desired_state = None
+        self._requested_at = None
+        self._sent_state = None
+        self._new_port = None
+        self._opened_at = 0.0
+        self._last_hazard_line = 0.0
+        self._retry_at = 0.0
+        self._failures = 0
+        self._buffer = b''
+        self._lock = threading.Lock()  # guards _requested_at, set by send() and cleared by the worker
+        self._stop_event = threading.Event()
+
+    # Called from the GUI thread
+
+    def send(self, command):
+        """Queues an alarm command ('0' or '1'); never blocks."""
+        if command not in VALID_COMMANDS:
+            raise ValueError(f"Invalid alarm command {command!r}, expected '0' or '1'")
+        with self._lock:
+            if self._requested_at is None:
+                self._requested_at = time.monotonic()
+            self.commands.put(command)
+
+    def set_port(self, port):
+        """Switches to another serial port; the worker reconnects in the background."""
+        self.commands.put(('port', port))
+
+    def stop(self):
+        self._stop_event.set()
+        self.commands.put(None)
+
+    @property
+    def connected(self):
+        return self.ser is not None
+
+    # Worker thread
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                self._drain_commands()
+                if self._new_port is not None:
+                    self._close()
+                    self.port, self._new_port = self._new_port, None
+                    self._failures = 0
+                    self._retry_at = 0.0
+                if self.ser is None:
+                    self._try_open()
+                    continue
+                try:
+                    self._read_lines()
+                    self._write_pending()
+                except (serial.SerialException, OSError) as ex:
+                    print(f"Koneksi Arduino terputus: {ex}")
+                    self._close()
+                    self._schedule_retry()
+        finally:
+            self._close()
+
+    def _drain_commands(self):
+        """Blocks briefly for a command, then collapses everything queued into the latest desired state."""
+        try:
+            item = self.commands.get(timeout=settings.ALARM_POLL_INTERVAL)
+        except queue.Empty:
+            return
+        while True:
+            if isinstance(item, tuple):
+                self._new_port = item[1]
+            elif item is not None:
+                if self._desired_state is not None and self._desired_state != self._sent_state:
+                    self.commands_coalesced += 1
+                elif item == self._sent_state:
+                    self.commands_coalesced += 1
+                self._desired_state = item
+            try:
+                item = self.commands.get_nowait()
+            except queue.Empty:
+                return
+
+    def _try_open(self):
+        if not self.port or time.monotonic() < self._retry_at:
+            return
+        try:
+            self.ser = serial.Serial(self.port, self.baud_rate, timeout=0, write_timeout=1)
+        except (serial.SerialException, OSError):
+            self.ser = None
+            self._schedule_retry()
+            return
+        if self._failures:
+            self.reconnects += 1
+        self._failures = 0
+        self._opened_at = time.monotonic()
+        self._buffer = b''
+        self.ready = False
+        self._sent_state = None  # the board resets on connect, so re-send the current state
+
+    def _schedule_retry(self):
+        delay = min(settings.ALARM_RECONNECT_BASE * (2 ** self._failures), settings.ALARM_RECONNECT_MAX)
+        self._failures += 1
+        self._retry_at = time.monotonic() + delay
+
+    def _read_lines(self):
+        waiting = self.ser.in_waiting
+        if waiting:
+            self._buffer += self.ser.read(waiting)
+        while b'\n' in self._buffer:
+            raw, self._buffer = self._buffer.split(b'\n', 1)
+            line = raw.decode(errors='replace').strip()
+            if not line:
+                continue
+            if self.on_line is not None:
+                self.on_line(line)
+            state = parse_line(line)
+            if state == 'ready':
+                self.ready = True
+            elif state is not None:
+                if state == HAZARD_COMMAND:
+                    self._last_hazard_line = time.monotonic()
+                self._acknowledge(state)
+
+        now = time.monotonic()
+        # The sketch needs ~2 s after the reset that opening the port triggers
+        if not self.ready and now - self._opened_at >= settings.ALARM_BOOT_TIME:
+            self.ready = True
+        # hazard_cond -> safe_cond prints nothing; the hazard counter going quiet is the acknowledgement
+        if (self._sent_state == SAFE_COMMAND and self.acknowledged_state == HAZARD_COMMAND
+                and now - self._last_hazard_line >= settings.ALARM_HEARTBEAT_TIMEOUT):
+            self._acknowledge(SAFE_COMMAND)
+
+    def _acknowledge(self, state):
+        if state != self.acknowledged_state:
+            self.acknowledged_state = state
+            if self.on_state is not None:
+                self.on_state(state)
+
+    def _write_pending(self):
+        if not self.ready or self._desired_state is None:
+            return
+        if self._desired_state == self._sent_state:
+            with self._lock:
+                # Already in that state, nothing to dispatch (unless send() queued another command meanwhile)
+                if self.commands.empty():
+                    self._requested_at = None
+            return
+        with metrics.time('serial_write'):
+            self.ser.write(self._desired_state.encode())
+        self._sent_state = self._desired_state
+        self.commands_written += 1
+        with self._lock:
+            requested_at = self._requested_at
+            if self.commands.empty():
+                self._requested_at = None
+        if requested_at is not None:
+            # From the GUI's send() to the byte leaving on the port, including queueing and reconnects
+            metrics.observe('serial_dispatch', time.monotonic() - requested_at)
+
+    def _close(self):
+        if self.ser is not None:
+            try:
+                self.ser.close()
+            except (serial.SerialException, OSError):
+                pass
+            self.ser = None
+        self.ready = False
+
+    def stats(self):
+        return {
+            'connected': self.connected,
+            'acknowledged_state': self.acknowledged_state,
+            'commands_written': self.commands_written,
+            'commands_coalesced': self.commands_coalesced,
+            'reconnects': self.reconnects,
+        }
+
+
+class SketchEmulator(threading.Thread):
+    """
+    Pseudo-terminal stand-in for arduinoalarm/sketch/sketch.ino (POSIX only).
+
+    Open `emulator.port` with pyserial exactly like a real board. The emulator
+    prints the same banner and acknowledgements and, while in hazard_cond,
+    the same incrementing counter. `time_scale` shortens the sketch's delays.
+    """
+
+    def __init__(self, time_scale=1.0, boot_time=0.5):
+        import pty
+        import tty
+
+        super().__init__(daemon=True)
+        self.master_fd, self.slave_fd = pty.openpty()
+        tty.setraw(self.slave_fd)
+        self.port = os.ttyname(self.slave_fd)
+        self.time_scale = time_scale
+        self.boot_time = boot_time
+        self.state = 'loop'
+        self.received = []
+        self._stop_event = threading.Event()
+
+    def _println(self, text):
+        os.write(self.master_fd, f"{text}\r\n".encode())
+
+    def _read_byte(self, timeout):
+        import select
+
+        readable, _, _ = select.select([self.master_fd], [], [], timeout)
+        if not readable:
+            return None
+        data = os.read(self.master_fd, 1)
+        self.received.append(data.decode(errors='replace'))
+        return data
+
+    def run(self):
+        time.sleep(self.boot_time)
+        self._println("Start!")
+        counter = 0
+        while not self._stop_event.is_set():
+            if self.state == 'loop':
+                data = self._read_byte(0.05)
+                if data == b'1':
+                    self._println("Hazard condition.")
+                    self.state = 'hazard'
+                    counter = 0
+                elif data == b'0':
+                    self._println("Safe condition.")
+                    self.state = 'safe'
+            elif self.state == 'hazard':
+                self._println(counter)
+                counter += 1
+                if self._read_byte(0.3 * self.time_scale) == b'0':
+                    self.state = 'safe'
+            else:
+                if self._read_byte(0.2 * self.time_scale) == b'1':
+                    self.state = 'hazard'
+                    counter = 0
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        os.close(self.master_fd)
+        os.close(self.slave_fd)
@@ -0,0 +1,305 @@
+import asyncio
+import base64
+import itertools
+import json
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+
+import settings
+
+ALERT = 'alert'
+SNAPSHOT = 'snapshot'
+THUMBNAIL = 'thumbnail'
+# Only the newest of these matters to a tablet, so a backlog collapses to one pending event per camera
+COALESCED = (SNAPSHOT, THUMBNAIL)
+
+SSE_HEADERS = (
+    b'HTTP/1.1 200 OK\r\n'
+    b'Content-Type: text/event-stream\r\n'
+    b'Cache-Control: no-cache\r\n'
+    b'Connection: keep-alive\r\n'
+    b'Access-Control-Allow-Origin: *\r\n\r\n'
+)
+
+
+class Subscriber:
+    """
+    Pending events of one connected client.
+
+    Alerts are queued in order up to `queue_size`; when a client falls further
+    behind, its oldest alerts are dropped (the newest one always reflects the
+    current state). Snapshots and thumbnails replace any pending one of the
+    same camera, so they never pile up.
+    """
+
+    def __init__(self, writer, queue_size):
+        self.writer = writer
+        self.queue_size = queue_size
+        self.pending = OrderedDict()
+        self.alerts = 0
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+    def put(self, key, payload):
+        if key[0] in COALESCED:
+            if self.pending.pop(key, None) is not None:
+                self.coalesced += 1
+        else:
+            if self.alerts >= self.queue_size:
+                for old in self.pending:
+                    if old[0] not in COALESCED:
+                        del self.pending[old]
+                        self.alerts -= 1
+                        self.dropped += 1
+                        break
+            self.alerts += 1
+        self.pending[key] = payload
+        self.ready.set()
+
+    def pop(self):
+        key, payload = self.pending.popitem(last=False)
+        if key[0] not in COALESCED:
+            self.alerts -= 1
+        return payload
+
+
+class AlertServer(threading.Thread):
+    """
+    Publishes hazard/safe alerts, detection snapshots and JPEG thumbnails to lifeguard tablets.
+
+    Clients subscribe with Server-Sent Events at http://host:port/events
+    (a browser's EventSource or `curl -N`). The asyncio loop runs on this
+    thread; `publish` may be called from any thread and only schedules the
+    fan-out, so detection never waits on the network. Every event is encoded
+    once and shared by all subscribers, and each subscriber has its own
+    bounded queue (see Subscriber). A client that stops reading for longer
+    than settings.ALERT_WRITE_TIMEOUT is disconnected.
+
+    New subscribers immediately receive the latest alert of every camera.
+    """
+
+    def __init__(self, port=None, host=None, queue_size=None):
+        """
+        Args:
+        - port (int): TCP port, 0 for any free one (default is settings.ALERT_PORT).
+        - host (str): Interface to listen on (default is settings.ALERT_HOST).
+        - queue_size (int): Alerts buffered per subscriber (default is settings.ALERT_QUEUE_SIZE).
+        """
+        super().__init__(daemon=True)
+        self.host = host or settings.ALERT_HOST
+        self.port = settings.ALERT_PORT if port is None else port
+        self.queue_size = queue_size or settings.ALERT_QUEUE_SIZE
+        self.subscribers = set()
+        self.events_published = 0
+        self.slow_disconnects = 0
+        self.loop = None
+        self._server = None
+        self._sequence = itertools.count(1)  # next() is atomic, publish may race between threads
+        self._latest_alerts = {}
+        self._next_snapshot = {}
+        self._next_thumbnail = {}
+        self._sent = self._dropped = self._coalesced = 0
+        self._bound = threading.Event()
+        self._error = None
+
+    def start(self):
+        """Starts the loop and returns once the port is bound; raises OSError when it cannot be."""
+        super().start()
+        self._bound.wait()
+        if self._error is not None:
+            raise self._error
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self._server = self.loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port, backlog=1024))
+        except OSError as ex:
+            self._error = ex
+            self._bound.set()
+            return
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._bound.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.run_until_complete(self._shutdown())
+            self.loop.close()
+
+    def stop(self):
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.join(timeout=5)
+
+    async def _shutdown(self):
+        self._server.close()
+        for subscriber in list(self.subscribers):
+            subscriber.writer.close()
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._server.wait_closed()
+
+    # Publishing, from any thread
+
+    def publish(self, kind, data, camera=None):
+        """
+        Sends one event to every subscriber.
+
+        Args:
+        - kind (str): ALERT, SNAPSHOT, THUMBNAIL or any other event name.
+        - data (dict): JSON-serializable payload; 'camera' and 'time' are added.
+        - camera: Camera the event belongs to (coalescing is per camera).
+        """
+        if self.loop is None or not self.loop.is_running():
+            return
+        sequence = next(self._sequence)
+        data = dict(data, camera=None if camera is None else str(camera), time=time.time())
+        payload = f'id: {sequence}\nevent: {kind}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+        key = (kind, camera) if kind in COALESCED else (kind, sequence)
+        self.loop.call_soon_threadsafe(self._fan_out, key, payload.encode(), camera)
+
+    def publish_alert(self, state, camera=None, track_ids=(), source='detector'):
+        """Publishes a hazard/safe transition, e.g. from the operator buttons or a BreachEvent."""
+        self.publish(ALERT, {'state': state, 'track_ids': [int(i) for i in track_ids], 'source': source}, camera)
+
+    def publish_breach(self, event, camera=None):
+        """Publishes a breach.BreachEvent."""
+        self.publish_alert(event.state, camera, event.track_ids)
+
+    def publish_frame(self, frame, detections=None, camera=None, now=None):
+        """
+        Publishes a detection snapshot and a small JPEG thumbnail, each at its own low rate.
+
+        Cheap to call on every frame: nothing is encoded while nobody is
+        subscribed or before the next interval is due.
+        """
+        if not self.subscribers:
+            return
+        now = time.monotonic() if now is None else now
+        if detections is not None and now >= self._next_snapshot.get(camera, 0.0):
+            self._next_snapshot[camera] = now + settings.ALERT_SNAPSHOT_INTERVAL
+            tracker_id = getattr(detections, 'tracker_id', None)
+            self.publish(SNAPSHOT, {
+                'boxes': detections.xyxy.round(1).tolist(),
+                'confidence': detections.confidence.round(3).tolist() if detections.confidence is not None else None,
+                'track_ids': tracker_id.tolist() if tracker_id is not None else None,
+                'frame_size': [frame.shape[1], frame.shape[0]],
+            }, camera)
+        if now >= self._next_thumbnail.get(camera, 0.0):
+            self._next_thumbnail[camera] = now + settings.ALERT_THUMBNAIL_INTERVAL
+            width = settings.ALERT_THUMBNAIL_WIDTH
+            height = max(int(frame.shape[0] * width / frame.shape[1]), 1)
+            thumbnail = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            ok, jpeg = cv2.imencode('.jpg', thumbnail, [cv2.IMWRITE_JPEG_QUALITY, settings.ALERT_THUMBNAIL_QUALITY])
+            if ok:
+                self.publish(THUMBNAIL, {'jpeg': base64.b64encode(jpeg).decode()}, camera)
+
+    # Event loop side
+
+    def _fan_out(self, key, payload, camera):
+        self.events_published += 1
+        if key[0] == ALERT:
+            self._latest_alerts[camera] = (key, payload)
+        for subscriber in self.subscribers:
+            subscriber.put(key, payload)
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), settings.ALERT_WRITE_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError,
+                asyncio.CancelledError):
+            writer.close()
+            return
+        path = request.split(b' ', 2)[1].split(b'?')[0] if request.count(b' ') >= 2 else b''
+        if path == b'/events':
+            await self._stream(reader, writer)
+            return
+        if path in (b'/', b'/stats'):
+            body = json.dumps(self.stats()).encode()
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n'
+                         b'Connection: close\r\n\r\n' % len(body) + body)
+        else:
+            writer.write(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+        try:
+            await asyncio.wait_for(writer.drain(), settings.ALERT_WRITE_TIMEOUT)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        writer.close()
+
+    async def _stream(self, reader, writer):
+        subscriber = Subscriber(writer, self.queue_size)
+        # Keep the kernel and transport from hiding megabytes of stale events behind a slow client,
+        # so the backlog stays in the subscriber's queue where it is coalesced
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, settings.ALERT_SEND_BUFFER)
+        writer.transport.set_write_buffer_limits(high=settings.ALERT_SEND_BUFFER)
+        writer.write(SSE_HEADERS)
+        for key, payload in self._latest_alerts.values():
+            subscriber.put(key, payload)
+        self.subscribers.add(subscriber)
+        # Clients never send anything after the request; EOF means they went away
+        hangup = asyncio.ensure_future(reader.read())
+        try:
+            while not hangup.done():
+                if not subscriber.pending:
+                    subscriber.ready.clear()
+                    ready = asyncio.ensure_future(subscriber.ready.wait())
+                    done, _ = await asyncio.wait((hangup, ready), timeout=settings.ALERT_KEEPALIVE,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                    ready.cancel()
+                    if hangup in done:
+                        break
+                    if not subscriber.pending:
+                        writer.write(b': keepalive\n\n')
+                else:
+                    writer.write(subscriber.pop())
+                    subscriber.sent += 1
+                try:
+                    await asyncio.wait_for(writer.drain(), settings.ALERT_WRITE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    self.slow_disconnects += 1
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            # Cancelled on shutdown: end the connection handler normally
+            pass
+        finally:
+            self.subscribers.discard(subscriber)
+            self._sent += subscriber.sent
+            self._dropped += subscriber.dropped
+            self._coalesced += subscriber.coalesced
+            hangup.cancel()
+            writer.close()
+
+    def stats(self):
+        subscribers = list(self.subscribers)
+        return {
+            'subscribers': len(subscribers),
+            'events_published': self.events_published,
+            'events_sent': self._sent + sum(s.sent for s in subscribers),
+            'events_dropped': self._dropped + sum(s.dropped for s in subscribers),
+            'events_coalesced': self._coalesced + sum(s.coalesced for s in subscribers),
+            'slow_disconnects': self.slow_disconnects,
+        }
+
+
+def start_alert_server():
+    """Starts the AlertServer configured in settings, or returns None when it is disabled or the port is taken."""
+    if settings.ALERT_PORT is None:
+        return None
+    server = AlertServer()
+    try:
+        server.start()
+    except OSError as ex:
+        print(f"Alert server not started on {server.host}:{server.port}: {ex}")
+        return None
+    print(f"Alerts at http://{server.host}:{server.port}/events")
+    return server
@@ -0,0 +1,259 @@
+import argparse
+import json
+import multiprocessing
+import time
+from collections import deque
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pandas as pd
+
+import settings
+import helper
+from utils import DangerZone, zone_iou
+
+COLUMNS = ['frame', 'time_s', 'x1', 'y1', 'x2', 'y2', 'confidence', 'class_id', 'zone_iou', 'in_zone']
+
+
+def video_info(path):
+    """Returns (frame_count, fps, width, height) of a video file."""
+    capture = cv2.VideoCapture(str(path))
+    try:
+        return (
+            int(capture.get(cv2.CAP_PROP_FRAME_COUNT)),
+            capture.get(cv2.CAP_PROP_FPS) or 25.0,
+            int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        )
+    finally:
+        capture.release()
+
+
+def decode_segment(task):
+    """
+    Decodes frames [start, end) of a video in a pool worker.
+
+    Seeks straight to `start` (OpenCV decodes forward from the preceding
+    keyframe) and only decodes every `stride`-th frame; the others are just
+    grabbed. Frames are downscaled to `frame_size` before being sent back to
+    keep inter-process traffic small.
+
+    Returns:
+    - (start, end, frame_indices, frames)
+    """
+    path, start, end, stride, frame_size = task
+    capture = cv2.VideoCapture(str(path))
+    indices, frames = [], []
+    try:
+        if start:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+        for index in range(start, end):
+            if index % stride:
+                if not capture.grab():
+                    break
+                continue
+            ret, frame = capture.read()
+            if not ret:
+                break
+            indices.append(index)
+            frames.append(cv2.resize(frame, frame_size) if frame_size else frame)
+    finally:
+        capture.release()
+    return start, end, indices, frames
+
+
+class Checkpoint:
+    """
+    Progress of one video, stored next to its result parts so an interrupted run can resume.
+
+    The analysis parameters are stored with it: resuming with another stride,
+    threshold or set of zones would mix incompatible parts, so it raises
+    ValueError instead.
+    """
+
+    def __init__(self, path, params=None):
+        self.path = Path(path)
+        self.params = params or {}
+        self.next_frame = 0
+        self.parts = 0
+        if self.path.exists():
+            state = json.loads(self.path.read_text())
+            if state.get('params') != self.params:
+                raise ValueError(f"{self.path.parent} was analyzed with {state.get('params')}, not {self.params}; "
+                                 f"delete it to start over")
+            self.next_frame = state['next_frame']
+            self.parts = state['parts']
+
+    def save(self, next_frame, parts):
+        self.next_frame, self.parts = next_frame, parts
+        temporary = self.path.with_suffix('.tmp')
+        temporary.write_text(json.dumps({'next_frame': next_frame, 'parts': parts, 'params': self.params}))
+        temporary.replace(self.path)  # atomic, so a crash never leaves a half-written checkpoint
+
+
+def detect_batch(model, frames, conf, imgsz, scale):
+    """Runs one batched model call and returns per-frame (boxes, confidences, class_ids) in source pixels."""
+    outputs = []
+    for result in model(frames, conf=conf, imgsz=imgsz, agnostic_nms=True, verbose=False):
+        boxes = result.boxes
+        outputs.append((
+            boxes.xyxy.cpu().numpy() * scale,
+            boxes.conf.cpu().numpy(),
+            boxes.cls.cpu().numpy().astype(np.int16),
+        ))
+    return outputs
+
+
+def analyze_video(model, path, out_dir, zones, stride=1, workers=None, batch_size=None, segment_frames=None,
+                  conf=0.2, imgsz=None, frame_size=None, file_format='parquet'):
+    """
+    Runs detection and danger-zone scoring over a whole stored video, faster than real time.
+
+    Results are appended as numbered Parquet/Feather parts under out_dir/<video stem>/,
+    one part per decoded segment, and a checkpoint is updated after every part.
+    At most `workers + 1` decoded segments are held at once, so memory
+    stays bounded however long the video is.
+
+    Args:
+    - model (YoloV8): A YOLOv8 model from `helper.load_model`.
+    - path (str): Video file path.
+    - out_dir (str): Output directory.
+    - zones (list): DangerZone objects in source-video pixel coordinates (can be empty).
+    - stride (int): Analyze every stride-th frame.
+    - workers (int): Decode processes (default is settings.ANALYZE_WORKERS).
+    - batch_size (int): Frames per model call (default is settings.BATCH_SIZE).
+    - segment_frames (int): Source frames per decode task / output part (default is settings.ANALYZE_SEGMENT_FRAMES).
+    - conf (float): Confidence threshold.
+    - imgsz (int): Model input size (default is settings.INFERENCE_IMGSZ).
+    - frame_size (tuple): (width, height) frames are decoded to (default is settings.ANALYZE_FRAME_SIZE).
+    - file_format (str): 'parquet' or 'feather'.
+
+    Returns:
+    - stats (dict): Frames analyzed, wall time and speed relative to real time.
+
+    Raises:
+    - ValueError: The video was partly analyzed with other parameters.
+    """
+    workers = workers or settings.ANALYZE_WORKERS
+    batch_size = batch_size or settings.BATCH_SIZE
+    segment_frames = segment_frames or settings.ANALYZE_SEGMENT_FRAMES
+    imgsz = imgsz or settings.INFERENCE_IMGSZ
+    frame_size = frame_size or settings.ANALYZE_FRAME_SIZE
+
+    frame_count, fps, width, height = video_info(path)
+    scale = np.array([width / frame_size[0], height / frame_size[1]] * 2, dtype=np.float32)
+    video_dir = Path(out_dir) / Path(path).stem
+    video_dir.mkdir(parents=True, exist_ok=True)
+    params = {
+        'stride': stride,
+        'conf': conf,
+        'imgsz': imgsz,
+        'frame_size': list(frame_size),
+        'segment_frames': segment_frames,
+        'zones': [np.asarray(getattr(zone, 'vertices', zone), dtype=np.float64).ravel().round(3).tolist()
+                  for zone in zones],
+    }
+    checkpoint = Checkpoint(video_dir / 'checkpoint.json', params)
+    if checkpoint.next_frame >= frame_count:
+        print(f"{path}: already analyzed")
+        return {'frames': 0, 'seconds': 0.0, 'fps': 0.0, 'realtime_factor': 0.0}
+    if checkpoint.next_frame:
+        print(f"{path}: resuming at frame {checkpoint.next_frame}")
+
+    tasks = iter([(str(path), start, min(start + segment_frames, frame_count), stride, frame_size)
+                  for start in range(checkpoint.next_frame, frame_count, segment_frames)])
+
+    analyzed = 0
+    started = time.perf_counter()
+    with multiprocessing.Pool(workers) as pool:
+        # A sliding window of segments: every worker decodes one ahead while the model works on the oldest.
+        # Pool.imap would queue every task at once and buffer finished segments without limit.
+        pending = deque(pool.apply_async(decode_segment, (task,)) for _, task in zip(range(workers), tasks))
+        while pending:
+            _, end, indices, frames = pending.popleft().get()
+            task = next(tasks, None)
+            if task is not None:
+                pending.append(pool.apply_async(decode_segment, (task,)))
+            columns = {name: [] for name in COLUMNS}
+            for offset in range(0, len(frames), batch_size):
+                batch = frames[offset:offset + batch_size]
+                for index, (boxes, confidences, class_ids) in zip(indices[offset:], detect_batch(model, batch, conf, imgsz, scale)):
+                    if zones:
+                        ious = zone_iou(boxes, zones).max(axis=1)
+                    else:
+                        ious = np.zeros(len(boxes))
+                    columns['frame'].append(np.full(len(boxes), index, dtype=np.int32))
+                    columns['time_s'].append(np.full(len(boxes), index / fps, dtype=np.float32))
+                    for column, values in zip(('x1', 'y1', 'x2', 'y2'), boxes.T):
+                        columns[column].append(values.astype(np.float32))
+                    columns['confidence'].append(confidences.astype(np.float32))
+                    columns['class_id'].append(class_ids)
+                    columns['zone_iou'].append(ious.astype(np.float32))
+                    columns['in_zone'].append(ious > settings.BREACH_IOU_THRESHOLD)
+            analyzed += len(frames)
+
+            table = pd.DataFrame({name: np.concatenate(values) if values else np.empty(0)
+                                  for name, values in columns.items()})
+            part = video_dir / f'part-{checkpoint.parts:05d}.{file_format}'
+            if file_format == 'feather':
+                table.to_feather(part)
+            else:
+                table.to_parquet(part, index=False)
+            checkpoint.save(end, checkpoint.parts + 1)
+
+    seconds = time.perf_counter() - started
+    video_seconds = analyzed * stride / fps
+    return {
+        'frames': analyzed,
+        'seconds': seconds,
+        'fps': analyzed / seconds if seconds else 0.0,
+        'realtime_factor': video_seconds / seconds if seconds else 0.0,
+    }
+
+
+def load_results(out_dir, video):
+    """Reads every part written for one video back into a single DataFrame."""
+    video_dir = Path(out_dir) / Path(video).stem
+    parts = sorted(video_dir.glob('part-*'))
+    frames = [pd.read_feather(part) if part.suffix == '.feather' else pd.read_parquet(part) for part in parts]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLUMNS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless batch analysis of stored beach videos")
+    parser.add_argument('videos', nargs='*', help="Video files (default: settings.VIDEOS_DICT)")
+    parser.add_argument('--out', default=str(settings.ANALYZE_OUTPUT_DIR), help="Output directory")
+    parser.add_argument('--stride', type=int, default=1, help="Analyze every N-th frame")
+    parser.add_argument('--workers', type=int, default=settings.ANALYZE_WORKERS, help="Decode processes")
+    parser.add_argument('--batch-size', type=int, default=settings.BATCH_SIZE)
+    parser.add_argument('--segment-frames', type=int, default=settings.ANALYZE_SEGMENT_FRAMES)
+    parser.add_argument('--conf', type=float, default=0.2)
+    parser.add_argument('--imgsz', type=int, default=settings.INFERENCE_IMGSZ)
+    parser.add_argument('--backend', default=None, help="torch, onnx or openvino")
+    parser.add_argument('--format', choices=['parquet', 'feather'], default='parquet')
+    parser.add_argument('--zone', type=float, nargs='+', action='append', default=[],
+                        help="Danger zone as x1 y1 x2 y2 ... in source pixels (repeatable)")
+    args = parser.parse_args()
+
+    videos = args.videos or [str(path) for path in settings.VIDEOS_DICT.values()]
+    zones = [DangerZone.from_flat(zone) for zone in args.zone]
+    model = helper.load_model(settings.DETECTION_MODEL, args.backend, args.imgsz)
+
+    for video in videos:
+        if not Path(video).exists():
+            print(f"Skipping missing video {video}")
+            continue
+        try:
+            stats = analyze_video(model, video, args.out, zones, stride=args.stride, workers=args.workers,
+                                  batch_size=args.batch_size, segment_frames=args.segment_frames, conf=args.conf,
+                                  imgsz=args.imgsz, file_format=args.format)
+        except ValueError as ex:
+            print(f"Skipping {video}: {ex}")
+            continue
+        print(f"{video}: {stats['frames']} frames in {stats['seconds']:.1f}s "
+              f"({stats['fps']:.1f} fps, {stats['realtime_factor']:.1f}x real time)")
+
+
+if __name__ == "__main__":
+    main()
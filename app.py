@@ -1,7 +1,5 @@
 # Python In-built packages
 from pathlib import Path
-import PIL
-import PyQt6
 
 # External packages
 #import streamlit as st
@@ -9,48 +7,69 @@ import PyQt6
 # Local Modules
 import settings
 import helper
+from zones import ZoneSet
 
-# Setting page layout
 
-# Sidebar
-#st.sidebar.header("ML Model Config")
+def main():
+    """Loads the detector and starts the selected source; nothing heavy runs at import time."""
+    # Setting page layout
 
-# Model Options
-model_type = 'Detection' #st.sidebar.radio("Select Task", ['Detection', 'Segmentation'])
+    # Sidebar
+    #st.sidebar.header("ML Model Config")
 
-confidence = 0.2#float(st.sidebar.slider("Select Model Confidence (%)", 0, 100, 30)) / 100
+    # Model Options
+    model_type = 'Detection' #st.sidebar.radio("Select Task", ['Detection', 'Segmentation'])
 
-iou_threshold = 0.01#float(st.sidebar.slider("Select IoU Threshold (%)", 25, 100, 5)) / 100
+    confidence = 0.2#float(st.sidebar.slider("Select Model Confidence (%)", 0, 100, 30)) / 100
 
-# Selecting Detection Or Segmentation
-if model_type == 'Detection':
-    model_path = Path(settings.DETECTION_MODEL)
-#elif model_type == 'Segmentation':
-#    model_path = Path(settings.SEGMENTATION_MODEL)
+    iou_threshold = 0.01#float(st.sidebar.slider("Select IoU Threshold (%)", 25, 100, 5)) / 100
 
-# Load Pre-trained ML Model
-try:
-    model = helper.load_model(model_path)
-except Exception as ex:
-    print("Could not load model")
-    #st.error(f"Unable to load model. Check the specified path: {model_path}")
-    #st.error(ex)
+    # Selecting Detection Or Segmentation
+    if model_type == 'Detection':
+        model_path = Path(settings.DETECTION_MODEL)
+    #elif model_type == 'Segmentation':
+    #    model_path = Path(settings.SEGMENTATION_MODEL)
 
-#st.sidebar.header("Image/Video Config")
-# 
-source_stream = settings.WEBCAM #st.sidebar.radio("Select Source", settings.SOURCES_LIST)
+    # Load Pre-trained ML Model
+    try:
+        model = helper.load_model(model_path)
+    except Exception as ex:
+        print(f"Could not load model from {model_path}: {ex}")
+        #st.error(f"Unable to load model. Check the specified path: {model_path}")
+        #st.error(ex)
+        return
 
-#source_img = None
-# If image is selected
-# Execute helper function upon selection of a radio button
-if source_stream == settings.VIDEO:
-    print("Selected Stored Video")
-    helper.play_stored_video(confidence, model)
+    #st.sidebar.header("Image/Video Config")
+    # 
+    source_stream = settings.WEBCAM #st.sidebar.radio("Select Source", settings.SOURCES_LIST)
 
-elif source_stream == settings.WEBCAM:
-    print("Selected Webcam")
-    helper.play_webcam(confidence, model)
+    #source_img = None
+    # If image is selected
+    # Execute helper function upon selection of a radio button
+    if source_stream == settings.VIDEO:
+        print("Selected Stored Video")
+        # Stored videos are analyzed headless, faster than real time (see analyze.py)
+        import analyze  # deferred: pulls in pandas, only needed for this source
 
-else:
-    print("Please select a valid source type!")
-    #st.error("Please select a valid source type!")
+        for video in settings.VIDEOS_DICT.values():
+            if not Path(video).exists():
+                print(f"Skipping missing video {video}")
+                continue
+            # The zones drawn for this video in the window, scaled to its source resolution
+            _, _, width, height = analyze.video_info(video)
+            zones = ZoneSet.for_camera(str(video), frame_size=(width, height))
+            stats = analyze.analyze_video(model, video, settings.ANALYZE_OUTPUT_DIR, zones, conf=confidence)
+            print(f"{video}: {stats['frames']} frames in {stats['seconds']:.1f}s "
+                  f"({stats['fps']:.1f} fps, {stats['realtime_factor']:.1f}x real time)")
+
+    elif source_stream == settings.WEBCAM:
+        print("Selected Webcam")
+        helper.play_webcam(confidence, model)
+
+    else:
+        print("Please select a valid source type!")
+        #st.error("Please select a valid source type!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+import argparse
+import json
+import platform
+import re
+import time
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+import settings
+
+# Published YOLOv8 detection GFLOPs at 640, used to rank levels before a cost table has been measured
+VARIANT_GFLOPS = {'n': 8.7, 's': 28.6, 'm': 78.9, 'l': 165.2, 'x': 257.8}
+
+
+class Level:
+    """One inference configuration on the ladder: a model variant at an input size."""
+
+    __slots__ = ('variant', 'imgsz')
+
+    def __init__(self, variant, imgsz):
+        self.variant = variant
+        self.imgsz = int(imgsz)
+
+    @property
+    def key(self):
+        return f'{self.variant}@{self.imgsz}'
+
+    def __eq__(self, other):
+        return isinstance(other, Level) and (self.variant, self.imgsz) == (other.variant, other.imgsz)
+
+    def __hash__(self):
+        return hash((self.variant, self.imgsz))
+
+    def __repr__(self):
+        return f"Level({self.key})"
+
+
+def available_imgsz():
+    """
+    Returns the inference input sizes the autoscaler may choose from.
+
+    Exported ONNX/OpenVINO models have their input size baked in (see
+    backends.export_model), so with those backends only the model size changes.
+    """
+    if settings.INFERENCE_BACKEND == 'torch':
+        return tuple(settings.AUTOSCALE_IMGSZ)
+    return (settings.INFERENCE_IMGSZ,)
+
+
+def variant_of(model_path):
+    """Returns the YOLOv8 size letter of a weights file, e.g. 's' for weights/yolov8sBaronv2.pt, or None."""
+    match = re.match(r'yolov8([nsmlx])', Path(model_path).name)
+    return match.group(1) if match else None
+
+
+def find_variants(model_dir=None, variants=None):
+    """
+    Finds one weights file per YOLOv8 size in the weights directory.
+
+    settings.DETECTION_MODEL wins for its own size; other sizes take the first
+    matching yolov8<size>*.pt in name order.
+
+    Returns:
+    - variants (dict): Size letter -> weights path, cheapest size first.
+    """
+    model_dir = Path(model_dir or settings.MODEL_DIR)
+    variants = variants or settings.AUTOSCALE_VARIANTS
+    found = {}
+    if Path(settings.DETECTION_MODEL).exists():
+        found[variant_of(settings.DETECTION_MODEL)] = Path(settings.DETECTION_MODEL)
+    for path in sorted(model_dir.glob('yolov8*.pt')):
+        letter = variant_of(path)
+        if letter in variants:
+            found.setdefault(letter, path)
+    return {letter: found[letter] for letter in VARIANT_GFLOPS if letter in found and letter in variants}
+
+
+class CostTable:
+    """
+    Measured milliseconds per frame of every Level on this host.
+
+    Levels that were never measured fall back to an estimate scaled from the
+    published GFLOPs (quadratic in imgsz) and anchored on the measured levels
+    when there are any, so a partial table still ranks sensibly.
+    """
+
+    def __init__(self, costs=None, host=None):
+        """
+        Args:
+        - costs (dict): Level key ('s@640') -> milliseconds per frame.
+        - host (str): Machine the costs were measured on.
+        """
+        self.costs = dict(costs or {})
+        self.host = host or platform.node()
+
+    @staticmethod
+    def estimate(level):
+        return VARIANT_GFLOPS.get(level.variant, VARIANT_GFLOPS['s']) * (level.imgsz / 640) ** 2
+
+    def predict(self, level):
+        """Expected milliseconds per frame of a level without extra host load."""
+        if level.key in self.costs:
+            return self.costs[level.key]
+        # Milliseconds per estimated GFLOP across the measured levels, or 1 before anything is measured
+        measured = [(ms, self.estimate(Level(*key.split('@')))) for key, ms in self.costs.items()]
+        scale = sum(ms for ms, _ in measured) / sum(flops for _, flops in measured) if measured else 1.0
+        return self.estimate(level) * scale
+
+    def ladder(self, variants, imgsz_steps=None):
+        """Returns every (variant, imgsz) level, cheapest first by predicted cost."""
+        imgsz_steps = imgsz_steps or available_imgsz()
+        levels = sorted((Level(variant, imgsz) for variant in variants for imgsz in imgsz_steps), key=self.predict)
+        # Measurement noise must not rank a larger input of the same model as cheaper: keep the
+        # positions each variant got, but fill them in ascending imgsz order
+        ascending = {variant: iter(sorted(imgsz_steps)) for variant in variants}
+        return [Level(level.variant, next(ascending[level.variant])) for level in levels]
+
+    @classmethod
+    def measure(cls, models, imgsz_steps=None, frame_size=None, runs=3, **predict_kwargs):
+        """
+        Times every variant at every input size on a blank frame of the capture size.
+
+        Args:
+        - models (dict): Variant letter -> loaded model.
+        - imgsz_steps (tuple): Input sizes to time (default is available_imgsz()).
+        - frame_size (tuple): (width, height) of the frames (default is settings.CAPTURE_FRAME_SIZE).
+        - runs (int): Timed calls per level after one untimed call; the median is kept.
+        """
+        imgsz_steps = imgsz_steps or available_imgsz()
+        width, height = frame_size or settings.CAPTURE_FRAME_SIZE
+        predict_kwargs.setdefault('verbose', False)
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        costs = {}
+        for variant, model in models.items():
+            for imgsz in imgsz_steps:
+                model(frame, imgsz=imgsz, **predict_kwargs)
+                seconds = []
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    model(frame, imgsz=imgsz, **predict_kwargs)
+                    seconds.append(time.perf_counter() - start)
+                costs[Level(variant, imgsz).key] = float(np.median(seconds) * 1000)
+        return cls(costs)
+
+    def save(self, path=None):
+        path = Path(path or settings.AUTOSCALE_COST_TABLE)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix('.tmp')
+        temporary.write_text(json.dumps({'host': self.host, 'costs': self.costs}, indent=2))
+        temporary.replace(path)
+        return path
+
+    @classmethod
+    def load(cls, path=None):
+        """Reads a saved table; returns None when there is none for this host."""
+        path = Path(path or settings.AUTOSCALE_COST_TABLE)
+        if not path.exists():
+            return None
+        data = json.loads(path.read_text())
+        if data.get('host') != platform.node():
+            return None
+        return cls(data['costs'], data['host'])
+
+
+class Autoscaler:
+    """
+    Holds one camera's inference latency near a budget by moving along the level ladder.
+
+    Every observed model call goes into a short window. When the window's
+    percentile is over budget by more than settings.AUTOSCALE_DOWN_MARGIN,
+    the controller jumps straight to the most precise level predicted to fit,
+    with the cost table's predictions scaled by how much slower than measured
+    the current level is running (the host load). It steps up one level at a
+    time, and only after the next level has been predicted to fit under
+    settings.AUTOSCALE_UP_MARGIN of the budget for settings.AUTOSCALE_UP_HOLD
+    seconds. No change happens within settings.AUTOSCALE_COOLDOWN seconds of
+    the previous one. The different up and down thresholds plus the hold time
+    keep it from flapping between two neighbouring levels.
+
+    Every change is printed, kept in `changes` and appended to
+    settings.AUTOSCALE_LOG when set, so operators can see when precision was
+    traded for latency.
+    """
+
+    def __init__(self, camera=None, variants=None, costs=None, target_ms=None, target_fps=None, level=None):
+        """
+        Args:
+        - camera: Camera name used in the change log.
+        - variants (list): Loaded model variant letters (default: the size of settings.DETECTION_MODEL).
+        - costs (CostTable): Measured costs (default: the saved table, or GFLOPs estimates).
+        - target_ms (float): Per-frame inference budget (default is settings.AUTOSCALE_TARGET_MS).
+        - target_fps (float): Frame rate to hold instead of a latency (default is settings.AUTOSCALE_TARGET_FPS).
+        - level (Level): Starting level (default: the most precise one predicted to fit the budget).
+        """
+        self.camera = camera
+        target_fps = target_fps or settings.AUTOSCALE_TARGET_FPS
+        self.target_ms = 1000.0 / target_fps if target_fps else (target_ms or settings.AUTOSCALE_TARGET_MS)
+        self.costs = costs or CostTable.load() or CostTable()
+        self.variants = list(variants or [variant_of(settings.DETECTION_MODEL) or 's'])
+        self.window = deque(maxlen=settings.AUTOSCALE_WINDOW)
+        self.changes = deque(maxlen=1000)
+        self.levels = self.costs.ladder(self.variants)
+        if level is None:
+            fitting = [i for i, candidate in enumerate(self.levels) if self.costs.predict(candidate) <= self.target_ms]
+            self.index = fitting[-1] if fitting else 0
+        else:
+            self.index = self.levels.index(level)
+        self._changed_at = -float('inf')
+        self._headroom_since = None
+
+    @property
+    def level(self):
+        return self.levels[self.index]
+
+    @property
+    def imgsz(self):
+        return self.level.imgsz
+
+    @property
+    def variant(self):
+        return self.level.variant
+
+    def set_variants(self, variants):
+        """Rebuilds the ladder when model variants are loaded, keeping the current level."""
+        current = self.level
+        self.variants = list(variants)
+        # Assigned together: the video thread reads the ladder while the GUI thread updates it
+        levels = self.costs.ladder(self.variants)
+        self.levels, self.index = levels, levels.index(current) if current in levels else 0
+
+    def set_costs(self, costs):
+        """Switches to a newly measured cost table, keeping the current level."""
+        current = self.level
+        levels = costs.ladder(self.variants)
+        self.costs = costs
+        self.levels, self.index = levels, levels.index(current)
+
+    def load(self):
+        """How much slower than its table cost the current level runs right now (1.0 = as measured)."""
+        if not self.window:
+            return 1.0
+        return float(np.percentile(self.window, settings.AUTOSCALE_PERCENTILE)) / self.costs.predict(self.level)
+
+    def observe(self, seconds, now=None):
+        """
+        Records the duration of one model call and adjusts the level if needed.
+
+        Returns:
+        - level (Level): The new level when it changed, else None.
+        """
+        now = time.monotonic() if now is None else now
+        self.window.append(seconds * 1000)
+        if len(self.window) < self.window.maxlen or now - self._changed_at < settings.AUTOSCALE_COOLDOWN:
+            return None
+
+        latency = float(np.percentile(self.window, settings.AUTOSCALE_PERCENTILE))
+        load = latency / self.costs.predict(self.level)
+        if latency > self.target_ms * settings.AUTOSCALE_DOWN_MARGIN and self.index > 0:
+            fitting = [i for i in range(self.index) if self.costs.predict(self.levels[i]) * load <= self.target_ms]
+            return self._change(fitting[-1] if fitting else 0, latency, now, 'over budget')
+
+        if self.index + 1 < len(self.levels):
+            upper = self.levels[self.index + 1]
+            if self.costs.predict(upper) * load <= self.target_ms * settings.AUTOSCALE_UP_MARGIN:
+                if self._headroom_since is None:
+                    self._headroom_since = now
+                elif now - self._headroom_since >= settings.AUTOSCALE_UP_HOLD:
+                    return self._change(self.index + 1, latency, now, 'headroom')
+                return None
+        self._headroom_since = None
+        return None
+
+    def _change(self, index, latency, now, reason):
+        previous = self.level
+        self.index = index
+        self.window.clear()
+        self._changed_at = now
+        self._headroom_since = None
+        change = {
+            'time': time.time(),
+            'camera': None if self.camera is None else str(self.camera),
+            'from': previous.key,
+            'to': self.level.key,
+            'reason': reason,
+            'latency_ms': round(latency, 2),
+            'target_ms': round(self.target_ms, 2),
+        }
+        self.changes.append(change)
+        print(f"Autoscale camera {change['camera']}: {change['from']} -> {change['to']} "
+              f"({reason}, p{settings.AUTOSCALE_PERCENTILE} {latency:.0f} ms, target {self.target_ms:.0f} ms)")
+        if settings.AUTOSCALE_LOG is not None:
+            path = Path(settings.AUTOSCALE_LOG)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'a') as f:
+                f.write(json.dumps(change) + '\n')
+        return self.level
+
+    def stats(self):
+        return {
+            'autoscale_level': self.level.key,
+            'autoscale_target_ms': self.target_ms,
+            'autoscale_load': self.load(),
+            'autoscale_changes': len(self.changes),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the autoscaler's cost table for the weights on this host")
+    parser.add_argument('--model-dir', default=str(settings.MODEL_DIR))
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    import helper
+
+    variants = find_variants(args.model_dir)
+    if not variants:
+        parser.error(f"no yolov8{'/'.join(settings.AUTOSCALE_VARIANTS)} weights in {args.model_dir}")
+    models = {letter: helper.load_model(path) for letter, path in variants.items()}
+    table = CostTable.measure(models, runs=args.runs, agnostic_nms=True)
+    for level in table.ladder(variants):
+        print(f"{level.key:>8}  {table.predict(level):8.1f} ms")
+    print(f"Saved {table.save()}")
+
+
+if __name__ == "__main__":
+    main()
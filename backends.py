@@ -0,0 +1,157 @@
+import argparse
+import hashlib
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+
+import settings
+
+# Inference backends: name -> (ultralytics export format, artifact suffix)
+BACKENDS = {
+    'torch': (None, '.pt'),
+    'onnx': ('onnx', '.onnx'),
+    'openvino': ('openvino', '_openvino_model'),
+}
+
+
+def file_hash(path, length=12):
+    """Returns a short sha256 hex digest of the file at path."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+
+def artifact_path(model_path, backend, imgsz):
+    """
+    Returns where the exported artifact for a model/backend/input size is cached.
+
+    Artifacts live next to the .pt file and are keyed by the weights' hash and
+    the input size, e.g. weights/yolov8sBaronv2-3f2a9c1d0b4e-640.onnx.
+    """
+    model_path = Path(model_path)
+    _, suffix = BACKENDS[backend]
+    return model_path.with_name(f"{model_path.stem}-{file_hash(model_path)}-{imgsz}{suffix}")
+
+
+def export_model(model_path, backend, imgsz=None):
+    """
+    Exports a PyTorch YOLO model for a CPU runtime once and returns the cached artifact path.
+
+    Args:
+    - model_path (str): The path to the YOLO .pt model file.
+    - backend (str): 'onnx' or 'openvino'.
+    - imgsz (int): Input size baked into the exported model (default is settings.INFERENCE_IMGSZ).
+
+    Returns:
+    - Path of the exported model (file for ONNX, directory for OpenVINO).
+    """
+    imgsz = imgsz or settings.INFERENCE_IMGSZ
+    export_format, _ = BACKENDS[backend]
+    if export_format is None:
+        return Path(model_path)
+
+    target = artifact_path(model_path, backend, imgsz)
+    if target.exists():
+        return target
+
+    from ultralytics import YOLO  # deferred: importing ultralytics pulls in torch
+
+    exported = Path(YOLO(str(model_path)).export(format=export_format, imgsz=imgsz))
+    if not target.exists():
+        shutil.move(str(exported), str(target))
+    elif exported.is_dir():
+        # Another process finished the same export first
+        shutil.rmtree(exported, ignore_errors=True)
+    else:
+        exported.unlink(missing_ok=True)
+    return target
+
+
+def load_backend(model_path, backend=None, imgsz=None):
+    """
+    Loads a detector for the requested backend, exporting it first if needed.
+
+    Exported models are still wrapped in `ultralytics.YOLO`, so calling them
+    returns the same Results objects (and `sv.Detections.from_yolov8` input)
+    as the PyTorch model.
+
+    Args:
+    - model_path (str): The path to the YOLO .pt model file.
+    - backend (str): 'torch', 'onnx' or 'openvino' (default is settings.INFERENCE_BACKEND).
+    - imgsz (int): Input size for exported models (default is settings.INFERENCE_IMGSZ).
+
+    Returns:
+    A YOLO object detection model.
+    """
+    backend = backend or settings.INFERENCE_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {sorted(BACKENDS)}")
+    from ultralytics import YOLO
+
+    if backend == 'torch':
+        return YOLO(str(model_path))
+    return YOLO(str(export_model(model_path, backend, imgsz)), task='detect')
+
+
+def class_names(model):
+    """
+    Returns a model's {class id: name} for every backend.
+
+    For exported models `model.model` is only the artifact's path, and older
+    ultralytics versions only know the names once the predictor has been set
+    up by the first call (e.g. the warm-up).
+    """
+    from fastpath import raw_backend
+
+    for owner in (model, getattr(model, 'model', None), raw_backend(model)):
+        names = getattr(owner, 'names', None)
+        if names:
+            return dict(names)
+    return {}
+
+
+def warm_up(model, frame_size=None, runs=None, **predict_kwargs):
+    """
+    Runs a few throwaway inferences so the first real frame is not the slow one.
+
+    The first calls pay for lazy layer initialisation, kernel selection and
+    (for exported backends) graph compilation at the given input shape, so the
+    dummy frames have the deployed capture size.
+
+    Args:
+    - model (YoloV8): A model from `load_backend`.
+    - frame_size (tuple): (width, height) of the frames the model will see (default is settings.CAPTURE_FRAME_SIZE).
+    - runs (int): Number of warm-up calls (default is settings.WARMUP_RUNS).
+    - predict_kwargs: Extra keyword arguments for the model call (e.g. imgsz).
+
+    Returns:
+    - seconds (list): Duration of each warm-up call.
+    """
+    width, height = frame_size or settings.CAPTURE_FRAME_SIZE
+    runs = settings.WARMUP_RUNS if runs is None else runs
+    predict_kwargs.setdefault('verbose', False)
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    seconds = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        model(frame, **predict_kwargs)
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the detector for a CPU inference backend")
+    parser.add_argument('--model', default=str(settings.DETECTION_MODEL))
+    parser.add_argument('--backend', choices=[name for name in BACKENDS if name != 'torch'], default='onnx')
+    parser.add_argument('--imgsz', type=int, default=settings.INFERENCE_IMGSZ)
+    args = parser.parse_args()
+
+    print(export_model(args.model, args.backend, args.imgsz))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1602 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import traceback
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import settings
+from utils import calculate_iou, zone_iou, DangerZone, average_precision, box_iou, foot_regions
+
+
+def _time_call(func, repeat=5):
+    """Returns the best wall-clock time in milliseconds of `repeat` calls to func."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def _detector():
+    """
+    Returns (model, name) for the configured detector.
+
+    Falls back to synthetic.StubModel when the weights or ultralytics are
+    missing, so the model benchmarks still run (with stub accuracy).
+    """
+    try:
+        from backends import load_backend
+        return load_backend(settings.DETECTION_MODEL), Path(settings.DETECTION_MODEL).stem
+    except Exception as ex:
+        from synthetic import StubModel
+
+        print(f"Using the stub model: {ex}")
+        return StubModel(), 'stub'
+
+
+def random_boxes(count, frame_size=(1280, 650), seed=0):
+    """Generates `count` random xyxy person-sized boxes inside a (width, height) frame."""
+    rng = np.random.default_rng(seed)
+    width, height = frame_size
+    sizes = rng.uniform((10, 20), (80, 200), size=(count, 2))
+    origins = rng.uniform((0, 0), (width - 80, height - 200), size=(count, 2))
+    return np.hstack([origins, origins + sizes])
+
+
+def bench_zone_scoring(counts=(10, 100, 1000)):
+    """
+    Compares the per-box `calculate_iou` loop with the batched `zone_iou` engine.
+
+    Both are run against the same 4-vertex zone. The zone is an axis-aligned
+    rectangle so the two results must agree exactly.
+    """
+    polygon = [(200, 250), (1100, 250), (1100, 640), (200, 640)]
+    zone = DangerZone(polygon)
+    results = []
+    for count in counts:
+        boxes = random_boxes(count)
+        loop_ms = _time_call(lambda: [calculate_iou(box, polygon) for box in boxes])
+        batched_ms = _time_call(lambda: zone_iou(boxes, [zone]))
+        expected = np.array([calculate_iou(box, polygon) for box in boxes])
+        max_error = float(np.abs(zone_iou(boxes, [zone])[:, 0] - expected).max())
+        results.append({
+            'boxes': count,
+            'loop_ms': loop_ms,
+            'batched_ms': batched_ms,
+            'speedup': loop_ms / batched_ms,
+            'max_abs_error': max_error,
+        })
+    return results
+
+
+def bench_zone_raster(counts=(10, 100, 1000), frame_size=(1280, 650)):
+    """
+    Summed-area-table zone scoring (zones.ZoneSet) against the exact polygon clipper and the rectangle loop.
+
+    Uses a slanted shoreline and a second, overlapping zone. Errors are the
+    largest difference in the covered fraction of a foot strip, measured
+    against `zone_iou`; the rectangle column shows how much `calculate_iou`
+    over-counts on a slanted polygon.
+    """
+    from zones import ZoneSet
+
+    shoreline = [(0, 420), (1280, 300), (1280, 650), (0, 650)]
+    zones = ZoneSet({'shore': shoreline, 'rocks': [(900, 200), (1200, 260), (1100, 500), (850, 450)]},
+                    frame_size=frame_size)
+    shape = (frame_size[1], frame_size[0])
+    zone_area = np.array([zone.area for zone in zones])
+
+    def coverage(iou, strips):
+        # Recover intersection / strip area from IoU = I / (S + Z - I)
+        strip_area = ((strips[:, 2] - strips[:, 0]) * (strips[:, 3] - strips[:, 1]))[:, None]
+        return iou * (strip_area + zone_area[:iou.shape[1]]) / (1 + iou) / np.maximum(strip_area, 1e-9)
+
+    compile_ms = _time_call(lambda: (zones.set('shore', shoreline), zones.compile(shape)))
+    results = []
+    for count in counts:
+        boxes = random_boxes(count, frame_size)
+        strips = foot_regions(boxes)
+        exact = coverage(zone_iou(boxes, list(zones)), strips)
+        exact_ms = _time_call(lambda: zone_iou(boxes, list(zones)))
+        raster_ms = _time_call(lambda: zones.iou(boxes, shape))
+        raster = coverage(zones.iou(boxes, shape), strips)
+        rectangle = coverage(np.array([[calculate_iou(box, shoreline)] for box in boxes]), strips)
+        results.append({
+            'boxes': count,
+            'compile_ms': compile_ms,
+            'polygon_ms': exact_ms,
+            'sat_ms': raster_ms,
+            'speedup': exact_ms / raster_ms,
+            'sat_max_coverage_error': float(np.abs(raster - exact).max()),
+            'rectangle_max_coverage_error': float(np.abs(rectangle[:, 0] - exact[:, 0]).max()),
+        })
+    return results
+
+
+def bench_backends(backends=('torch', 'onnx', 'openvino'), image_dir=None, repeat=5):
+    """
+    Parity and speed of each inference backend on the images in `images/`.
+
+    The PyTorch detections are used as the reference, so `ap50_vs_torch` is
+    1.0 for torch itself and `map_drift` is how much an exported model loses.
+    Without a loaded torch backend only the timings are reported.
+    """
+    from backends import load_backend
+
+    image_dir = image_dir or settings.IMAGES_DIR
+    images = [cv2.imread(str(path)) for path in sorted(image_dir.glob('*.jpg'))]
+    images = [image for image in images if image is not None]
+
+    results = []
+    reference = None
+    for backend in backends:
+        try:
+            model = load_backend(settings.DETECTION_MODEL, backend)
+        except Exception as ex:
+            print(f"Skipping backend {backend}: {ex}")
+            continue
+        model(images[0], imgsz=settings.INFERENCE_IMGSZ, verbose=False)  # warm-up
+
+        predictions = []
+        elapsed = 0.0
+        for image in images:
+            elapsed += _time_call(lambda: model(image, imgsz=settings.INFERENCE_IMGSZ, verbose=False), repeat)
+            boxes = model(image, imgsz=settings.INFERENCE_IMGSZ, verbose=False)[0].boxes
+            predictions.append((boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy()))
+        if backend == 'torch':
+            reference = [boxes for boxes, _ in predictions]
+
+        row = {
+            'backend': backend,
+            'images': len(images),
+            'ms_per_frame': elapsed / len(images),
+        }
+        if reference is not None:
+            ap = average_precision(predictions, reference)
+            row.update({'ap50_vs_torch': ap, 'map_drift': 1.0 - ap})
+        results.append(row)
+    return results
+
+
+def synthetic_track_stream(concurrent, frames, churn=0.02, fps=25.0, seed=0):
+    """
+    Yields (timestamp, track_ids, in_zone) frames of a synthetic crowd.
+
+    About `churn` of the tracks are replaced by new IDs every frame, and each
+    track's in-zone flag flips with a small probability so dwell times vary.
+    """
+    rng = np.random.default_rng(seed)
+    ids = np.arange(concurrent, dtype=np.int64)
+    in_zone = rng.random(concurrent) < 0.3
+    next_id = concurrent
+    for frame in range(frames):
+        replaced = rng.random(concurrent) < churn
+        count = int(replaced.sum())
+        ids[replaced] = np.arange(next_id, next_id + count)
+        next_id += count
+        flip = rng.random(concurrent) < 0.01
+        in_zone = in_zone ^ flip
+        # Occasionally a track is occluded for a frame
+        visible = rng.random(concurrent) > 0.05
+        yield frame / fps, ids[visible].copy(), in_zone[visible].copy()
+
+
+def bench_breach_engine(concurrency=(10, 100, 500, 1000), frames=500):
+    """Per-frame cost of BreachEngine.update driven by synthetic track streams."""
+    from breach import BreachEngine
+
+    results = []
+    for concurrent in concurrency:
+        stream = list(synthetic_track_stream(concurrent, frames))
+        engine = BreachEngine(min_dwell=1.0, clear_time=3.0, track_ttl=2.0)
+        events = 0
+        start = time.perf_counter()
+        for now, ids, in_zone in stream:
+            events += len(engine.update(ids, in_zone, now))
+        elapsed = time.perf_counter() - start
+        results.append({
+            'tracks': concurrent,
+            'us_per_frame': elapsed / frames * 1e6,
+            'live_tracks': len(engine),
+            'breaching': len(engine.active_breachers),
+            'events': events,
+        })
+    return results
+
+
+def _count_allocations(func, frames):
+    """Runs func `frames` times and returns (ms/frame, NumPy/OpenCV bytes allocated per frame)."""
+    import tracemalloc
+
+    func()  # let lazily allocated buffers settle first
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    allocated = 0
+    for _ in range(frames):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        func()
+        allocated += tracemalloc.get_traced_memory()[1] - before
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    return elapsed * 1000 / frames, allocated / frames
+
+
+def bench_display(frame_sizes=((1280, 650), (1920, 1080)), widget_width=1040, frames=100):
+    """Per-frame cost of the old cvtColor/resize/RGB888 display path against DisplayConverter."""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt6.QtGui import QGuiApplication, QImage, QPixmap
+    from display import DisplayConverter, fit_size
+
+    app = QGuiApplication.instance() or QGuiApplication(sys.argv)  # QPixmap needs a running app
+
+    def legacy(frame):
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        new_width, new_height = fit_size(frame.shape[1], frame.shape[0], widget_width)
+        frame = cv2.resize(frame, (new_width, new_height))
+        image = QImage(frame.data, new_width, new_height, 3 * new_width, QImage.Format.Format_RGB888)
+        return QPixmap.fromImage(image)
+
+    results = []
+    for width, height in frame_sizes:
+        frame = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+        converter = DisplayConverter()
+        legacy_ms, legacy_bytes = _count_allocations(lambda: legacy(frame), frames)
+        converter_ms, converter_bytes = _count_allocations(lambda: converter.to_pixmap(frame, widget_width), frames)
+        row = {
+            'frame': f'{width}x{height}',
+            'legacy_ms': legacy_ms,
+            'legacy_bytes_per_frame': int(legacy_bytes),
+            'converter_ms': converter_ms,
+            'converter_bytes_per_frame': int(converter_bytes),
+        }
+        row.update({f'stage_{key}': value for key, value in converter.timer.report().items() if key.endswith('_ms')})
+        results.append(row)
+    return results
+
+
+def _person_boxes(result):
+    boxes = result.boxes
+    keep = boxes.cls.cpu().numpy() == 0
+    return boxes.xyxy.cpu().numpy()[keep], boxes.conf.cpu().numpy()[keep], boxes.cls.cpu().numpy()[keep]
+
+
+def _recall(predicted, reference, iou_threshold=0.3):
+    """Returns (matched, total) reference boxes covered by a predicted box."""
+    if len(reference) == 0:
+        return 0, 0
+    if len(predicted) == 0:
+        return 0, len(reference)
+    return int((box_iou(reference, predicted).max(axis=1) >= iou_threshold).sum()), len(reference)
+
+
+def bench_motion_gate(videos=None, max_frames=600, zones=None):
+    """
+    Effective inference rate and danger-zone recall of motion-gated mode on the stored footage.
+
+    Every frame is run through the detector once; full mode uses all of those
+    results, motion mode only the frames the AdaptiveScheduler picks (boxes
+    are propagated in between). Full-mode detections inside the zones are the
+    reference for recall. Videos missing from settings.VIDEOS_DICT are skipped.
+    """
+    videos = videos or [path for path in settings.VIDEOS_DICT.values() if path.exists()]
+    if not videos:
+        print("No videos from settings.VIDEOS_DICT found, skipping")
+        return []
+
+    from motion import AdaptiveScheduler
+
+    model, model_name = _detector()
+    zones = zones or []
+
+    results = []
+    for path in videos:
+        capture = cv2.VideoCapture(str(path))
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        scheduler = AdaptiveScheduler(zones)
+        matched = total = 0
+        index = 0
+        while index < max_frames:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            frame = cv2.resize(frame, settings.CAPTURE_FRAME_SIZE)
+            now = index / fps
+            reference = _person_boxes(model(frame, agnostic_nms=True, verbose=False)[0])
+            if scheduler.should_detect(frame, now):
+                scheduler.observe(*reference, now)
+            predicted, _, _ = scheduler.propagate(now)
+
+            reference_boxes = reference[0]
+            if zones:
+                reference_boxes = reference_boxes[zone_iou(reference_boxes, zones).max(axis=1, initial=0) > settings.BREACH_IOU_THRESHOLD]
+            hit, count = _recall(predicted, reference_boxes)
+            matched += hit
+            total += count
+            index += 1
+        capture.release()
+
+        stats = scheduler.stats(index / fps)
+        results.append({
+            'video': path.name,
+            'model': model_name,
+            'frames': index,
+            'capture_fps': stats['capture_fps'],
+            'inference_fps': stats['inference_fps'],
+            'detector_ratio': stats['detector_ratio'],
+            'zone_recall': matched / total if total else 1.0,
+        })
+    return results
+
+
+def bench_roi(image_dir=None, tile_sizes=(0, 640), small_height=32, repeat=3):
+    """
+    Pixels processed and small-object recall of ROI-cropped / tiled inference against full-frame inference.
+
+    The danger zone is taken as the lower half of each image in `images/`.
+    Full-frame detections at the default input size are the reference;
+    `small_found_only_by_roi` counts boxes under `small_height` pixels that
+    only the native-resolution tiles picked up.
+    """
+    from roi import RoiDetector
+
+    image_dir = image_dir or settings.IMAGES_DIR
+    images = [cv2.imread(str(path)) for path in sorted(image_dir.glob('baron*.jpg'))]
+    images = [image for image in images if image is not None]
+    model, model_name = _detector()
+
+    results = []
+    for image in images:
+        height, width = image.shape[:2]
+        zone = DangerZone([(0, height // 2), (width, height // 2), (width, height), (0, height)])
+        full = _person_boxes(model(image, agnostic_nms=True, verbose=False)[0])[0]
+        full = full[zone_iou(full, [zone], bottom_percent=0.1).max(axis=1, initial=0) > 0] if len(full) else full
+        full_ms = _time_call(lambda: model(image, agnostic_nms=True, verbose=False), repeat)
+
+        for tile_size in tile_sizes:
+            detector = RoiDetector(model, [zone], tile_size=tile_size, classes=[0])
+            boxes, _, _ = detector.detect(image)
+            roi_ms = _time_call(lambda: detector.detect(image), repeat)
+            hit, total = _recall(boxes, full)
+            small = boxes[(boxes[:, 3] - boxes[:, 1]) < small_height] if len(boxes) else boxes
+            matched_small = box_iou(small, full).max(axis=1, initial=0) >= 0.3 if len(small) else np.zeros(0, bool)
+            results.append({
+                'image': f'{width}x{height}',
+                'model': model_name,
+                'tile_size': tile_size or 'crop',
+                'tiles': len(detector.tiles),
+                'full_pixels': width * height,
+                'roi_pixels': detector.pixels_per_frame,
+                'full_ms': full_ms,
+                'roi_ms': roi_ms,
+                'recall_vs_full': hit / total if total else 1.0,
+                'small_found_only_by_roi': int((~matched_small).sum()),
+            })
+    return results
+
+
+def random_detections(count, frame_size=(1280, 650), seed=0):
+    """Random person detections with track IDs, as sv.Detections."""
+    import supervision as sv
+
+    rng = np.random.default_rng(seed)
+    return sv.Detections(
+        xyxy=random_boxes(count, frame_size, seed).astype(np.float32),
+        confidence=rng.uniform(0.2, 1.0, count).astype(np.float32),
+        class_id=np.zeros(count, dtype=int),
+        tracker_id=np.arange(count),
+    )
+
+
+def bench_annotation(counts=(5, 50, 500), frame_size=(1280, 650), display_width=1040, frames=50):
+    """
+    Per-frame annotation cost: a new sv.BoxAnnotator on the full frame (the old VideoThread path)
+    against a reused OverlayRenderer drawing at display resolution.
+    """
+    import supervision as sv
+    from display import fit_size
+    from overlay import OverlayRenderer
+
+    names = {0: 'person'}
+    width, height = frame_size
+    display_size = fit_size(width, height, display_width)
+    scale = display_size[0] / width
+    source = np.random.default_rng(1).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    display = cv2.resize(source, display_size)
+    zone = DangerZone([(200, 250), (1100, 250), (1100, 640), (200, 640)])
+
+    def legacy(detections):
+        scene = source  # the old path drew in place on the full-resolution frame
+        box_annotator = sv.BoxAnnotator(thickness=2, text_thickness=2, text_scale=1)
+        labels = [f"{names[class_id]} {confidence:0.2f}" for _, confidence, class_id, _ in detections]
+        return box_annotator.annotate(scene=scene, detections=detections, labels=labels)
+
+    results = []
+    for count in counts:
+        detections = random_detections(count, frame_size)
+        renderer = OverlayRenderer(names, [zone])
+        scene = display.copy()
+        legacy_ms = _time_call(lambda: [legacy(detections) for _ in range(frames)], 1) / frames
+        overlay_ms = _time_call(lambda: [renderer.render(scene, detections, scale) for _ in range(frames)], 1) / frames
+        disabled = OverlayRenderer(names, [zone], enabled=False)
+        headless_ms = _time_call(lambda: [disabled.render(scene, detections, scale) for _ in range(frames)], 1) / frames
+        results.append({
+            'detections': count,
+            'legacy_ms': legacy_ms,
+            'overlay_ms': overlay_ms,
+            'headless_ms': headless_ms,
+            'glyphs_cached': renderer.stats()['glyphs_cached'],
+        })
+    return results
+
+
+def _import_seconds(module):
+    """Imports a module in a fresh interpreter and returns the import time in seconds."""
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    if output.returncode:
+        return None
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def bench_startup(modules=('helper', 'gui', 'app', 'analyze', 'supervision'), runs=None):
+    """
+    Import time of the entry points and time to the first detection, with and without warm-up.
+
+    Each import is measured in a fresh interpreter. The first-detection part
+    loads settings.DETECTION_MODEL and times the first call on a capture-size
+    frame against the steady-state call after `backends.warm_up`; it is
+    skipped when ultralytics is not installed.
+    """
+    results = []
+    for module in modules:
+        seconds = _import_seconds(module)
+        results.append({'stage': f'import {module}', 'ms': seconds * 1000 if seconds is not None else 'failed'})
+
+    try:
+        import ultralytics  # noqa: F401
+    except ImportError:
+        print("ultralytics not installed, skipping time to first detection")
+        return results
+
+    from backends import load_backend, warm_up
+
+    width, height = settings.CAPTURE_FRAME_SIZE
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    start = time.perf_counter()
+    model = load_backend(settings.DETECTION_MODEL)
+    loaded = time.perf_counter()
+    model(frame, agnostic_nms=True, verbose=False)
+    first = time.perf_counter()
+    warmup = warm_up(model, runs=runs, agnostic_nms=True)
+    steady = _time_call(lambda: model(frame, agnostic_nms=True, verbose=False))
+    results.extend([
+        {'stage': 'load model', 'ms': (loaded - start) * 1000},
+        {'stage': 'first detection (cold)', 'ms': (first - loaded) * 1000},
+        {'stage': 'warm-up total', 'ms': sum(warmup) * 1000},
+        {'stage': 'detection (warm)', 'ms': steady},
+    ])
+    return results
+
+
+def _write_test_video(path, frames=125, frame_size=(640, 360), fps=25.0):
+    """Writes a small moving-gradient video so stream benchmarks need no footage."""
+    width, height = frame_size
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    base = np.tile(np.arange(width, dtype=np.uint8), (height, 1))
+    for index in range(frames):
+        gray = np.roll(base, index * 4, axis=1)
+        writer.write(cv2.merge([gray, gray, gray]))
+    writer.release()
+
+
+def bench_capture(consumer_fps=(5, 10, 25), seconds=3.0, drop_every=50, outage=0.5, reconnect_timeout=15.0):
+    """
+    Decode skipping and reconnect time of CaptureWorker against the file-backed StreamEmulator.
+
+    A consumer reads at a fixed rate from a 25 FPS emulated camera, with and
+    without decode skipping; a last run drops the connection every
+    `drop_every` frames to measure reconnect time. That run keeps reading
+    until the first reconnect (at most `reconnect_timeout` seconds), since the
+    jittered backoff can outlast `seconds`, and fails if none happened.
+    """
+    import tempfile
+
+    from capture import CaptureWorker, StreamEmulator
+
+    def consume(worker, rate, until=None):
+        ages = []
+        end = time.monotonic() + seconds
+        deadline = end + reconnect_timeout
+        while time.monotonic() < end or (until is not None and not until() and time.monotonic() < deadline):
+            frame, captured_at, _ = worker.read_latest(timeout=1.0)
+            if frame is not None:
+                ages.append(time.monotonic() - captured_at)
+                time.sleep(1.0 / rate)
+        worker.stop()
+        worker.join()
+        return ages
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / 'stream.mp4'
+        _write_test_video(path)
+        for rate in consumer_fps:
+            for skip in (False, True):
+                worker = CaptureWorker('rtsp://emulated', opener=StreamEmulator(path), realtime=False, skip_decode=skip)
+                worker.start()
+                ages = consume(worker, rate)
+                stats = worker.stats()
+                results.append({
+                    'consumer_fps': rate,
+                    'skip_decode': skip,
+                    'frames_read': len(ages),
+                    'frame_age_ms': float(np.mean(ages) * 1000) if ages else 0.0,
+                    'decode_skip_ratio': stats['decode_skip_ratio'],
+                })
+
+        worker = CaptureWorker('rtsp://emulated', opener=StreamEmulator(path, drop_every, outage), realtime=False)
+        worker.start()
+        ages = consume(worker, 10, until=lambda: worker.reconnects > 0)
+        stats = worker.stats()
+        if not stats['reconnects']:
+            raise RuntimeError(f"CaptureWorker did not reconnect within {seconds + reconnect_timeout:.0f} s")
+        results.append({
+            'consumer_fps': 10,
+            'outage_s': outage,
+            'frames_read': len(ages),
+            'reconnects': stats['reconnects'],
+            'reconnect_ms': stats['reconnect_seconds'] * 1000 / max(stats['reconnects'], 1),
+        })
+    return results
+
+
+def bench_alerts(client_counts=(100, 500), slow_fraction=0.1, seconds=5.0, alert_rate=20.0, thumbnail_rate=10.0):
+    """
+    Load test of the alert fan-out server with hundreds of local stand-in tablets.
+
+    A fraction of the clients connect and then never read, like a tablet that
+    froze on a bad Wi-Fi link. The publisher must not slow down because of
+    them, and the other clients must still get every alert. Clients run on
+    their own event loop in this process, so delivery latency includes
+    contention with them.
+    """
+    import asyncio
+    import base64
+    import socket
+    import threading
+    from alerts import AlertServer, THUMBNAIL
+    from synthetic import SyntheticBeach
+
+    # Thumbnails are what fill a stalled client's socket buffers
+    frame, _ = SyntheticBeach((320, 163), people=10).next()
+    jpeg = base64.b64encode(cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, settings.ALERT_THUMBNAIL_QUALITY])[1]).decode()
+
+    results = []
+    for clients in client_counts:
+        slow = int(clients * slow_fraction)
+        server = AlertServer(port=0, host='127.0.0.1')
+        server.start()
+        connected = []
+        latencies = []
+        done = threading.Event()
+
+        async def client(is_slow):
+            loop = asyncio.get_running_loop()
+            request = b'GET /events HTTP/1.1\r\nHost: localhost\r\n\r\n'
+            if is_slow:
+                # Never reads, and a small receive window stands in for a congested Wi-Fi link
+                sock = socket.socket()
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+                sock.setblocking(False)
+                try:
+                    await loop.sock_connect(sock, ('127.0.0.1', server.port))
+                    await loop.sock_sendall(sock, request)
+                    connected.append(is_slow)
+                    while not done.is_set():
+                        await asyncio.sleep(0.05)
+                finally:
+                    sock.close()
+                return
+            reader, writer = await asyncio.open_connection('127.0.0.1', server.port, limit=1 << 20)
+            writer.write(request)
+            await reader.readuntil(b'\r\n\r\n')
+            connected.append(is_slow)
+            try:
+                while True:
+                    event = await reader.readuntil(b'\n\n')
+                    if b'event: alert' in event:
+                        sent_at = json.loads(event.split(b'data: ', 1)[1])['time']
+                        latencies.append(time.time() - sent_at)
+            finally:
+                writer.close()
+
+        async def run_clients():
+            tasks = [asyncio.ensure_future(client(i < slow)) for i in range(clients)]
+            while not done.is_set():
+                await asyncio.sleep(0.05)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        thread = threading.Thread(target=asyncio.run, args=(run_clients(),), daemon=True)
+        thread.start()
+        deadline = time.monotonic() + 30
+        while server.stats()['subscribers'] < clients and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        alerts = int(seconds * alert_rate)
+        alert_seconds = []
+        thumbnail_seconds = []
+        start = time.monotonic()
+        for i in range(alerts):
+            begin = time.perf_counter()
+            server.publish_alert('hazard' if i % 2 == 0 else 'safe', camera=0)
+            alert_seconds.append(time.perf_counter() - begin)
+            if i % max(int(alert_rate / thumbnail_rate), 1) == 0:
+                begin = time.perf_counter()
+                server.publish(THUMBNAIL, {'jpeg': jpeg}, camera=0)
+                thumbnail_seconds.append(time.perf_counter() - begin)
+            time.sleep(max(start + (i + 1) / alert_rate - time.monotonic(), 0))
+
+        expected = alerts * (clients - slow)
+        deadline = time.monotonic() + 10
+        while len(latencies) < expected and time.monotonic() < deadline:
+            time.sleep(0.05)
+        stats = server.stats()
+        done.set()
+        thread.join(timeout=10)
+        server.stop()
+
+        delivered = np.array(latencies) * 1000 if latencies else np.zeros(1)
+        results.append({
+            'clients': clients,
+            'slow_clients': slow,
+            'connected': len(connected),
+            'publish_alert_ms': float(np.median(alert_seconds) * 1000),
+            'publish_thumbnail_ms': float(np.median(thumbnail_seconds) * 1000),
+            'delivery_p50_ms': float(np.percentile(delivered, 50)),
+            'delivery_p95_ms': float(np.percentile(delivered, 95)),
+            'alerts_delivered': len(latencies) / max(expected, 1),
+            'dropped': stats['events_dropped'],
+            'coalesced': stats['events_coalesced'],
+            'slow_disconnects': stats['slow_disconnects'],
+        })
+    return results
+
+
+def bench_autoscale(target_ms=100.0, phases=((60.0, 1.0), (60.0, 3.0), (80.0, 1.0)), seed=0):
+    """
+    Latency-budget autoscaler against a fixed s@640 detector on a simulated host.
+
+    Model calls are simulated on a virtual clock (nothing sleeps): a call
+    costs the level's table cost times the host load of the current phase,
+    with 10% log-normal noise. The middle phase triples the load, like the
+    host picking up more cameras. Rows report each phase separately.
+    """
+    from autoscale import Autoscaler, CostTable, Level
+
+    costs = CostTable({Level(variant, imgsz).key: base * (imgsz / 640) ** 2
+                       for variant, base in (('n', 35.0), ('s', 90.0))
+                       for imgsz in settings.AUTOSCALE_IMGSZ})
+    results = []
+    for name in ('fixed s@640', 'autoscale'):
+        rng = np.random.default_rng(seed)
+        scaler = Autoscaler('bench', ['n', 's'], costs, target_ms=target_ms) if name == 'autoscale' else None
+        now = 0.0
+        for index, (duration, load) in enumerate(phases):
+            end = now + duration
+            latencies, sizes = [], []
+            while now < end:
+                level = scaler.level if scaler is not None else Level('s', 640)
+                seconds = costs.predict(level) * load * rng.lognormal(0, 0.1) / 1000
+                now += seconds
+                latencies.append(seconds * 1000)
+                sizes.append(level.imgsz)
+                if scaler is not None:
+                    scaler.observe(seconds, now)
+            latencies = np.array(latencies)
+            results.append({
+                'controller': name,
+                'phase': index,
+                'load': load,
+                'frames': len(latencies),
+                'p90_ms': float(np.percentile(latencies, 90)),
+                'over_budget': float(np.mean(latencies > target_ms)),
+                'mean_imgsz': float(np.mean(sizes)),
+                'level': level.key,
+                'changes': len(scaler.changes) if scaler is not None else 0,
+            })
+    return results
+
+
+def bench_detlog(days=14, fps=1.0, people=8, frames=20000):
+    """
+    Detection log write cost and query latency over weeks of simulated detections.
+
+    Weeks of records are bulk-appended (`people` detections per frame at
+    `fps`, tracks living ten minutes, two zones), then queried through the
+    indexes and, for reference, with a full boolean scan of every segment,
+    which is what a flat file loaded into pandas would need. Per-frame
+    append cost is measured separately on `frames` single-frame appends.
+    """
+    import shutil
+    import tempfile
+    from detlog import DetectionLog, BREACHING, IN_ZONE
+
+    directory = tempfile.mkdtemp()
+    rng = np.random.default_rng(0)
+    start = 1_700_000_000.0
+    try:
+        log = DetectionLog('bench', directory, writable=True)
+        zone_bits = np.array([1 << log.zone_bit('A'), 1 << log.zone_bit('B')], dtype=np.uint32)
+        chunk = 3600
+        total_frames = int(days * 86400 * fps)
+        begin = time.perf_counter()
+        for first in range(0, total_frames, chunk):
+            frame_index = np.repeat(np.arange(first, min(first + chunk, total_frames)), people)
+            count = len(frame_index)
+            inside = rng.uniform(size=(count, 2)) < (0.2, 0.05)
+            breaching = inside.any(axis=1) & (rng.uniform(size=count) < 0.3)
+            log.append(start + frame_index / fps, random_boxes(count, seed=first), rng.uniform(0.3, 1, count),
+                       np.zeros(count), (frame_index // int(600 * fps)) * people + np.tile(np.arange(people), count // people),
+                       (inside * zone_bits).sum(axis=1), rng.uniform(0, 0.5, count),
+                       np.where(inside.any(axis=1), IN_ZONE, 0) | np.where(breaching, BREACHING, 0))
+        bulk_seconds = time.perf_counter() - begin
+        records = len(log)
+        log.close()
+
+        frame_log = DetectionLog('frames', directory, writable=True)
+        boxes = random_boxes(people)
+        confidence = np.full(people, 0.9)
+        begin = time.perf_counter()
+        for i in range(frames):
+            frame_log.append(start + i / 25, boxes, confidence)
+        append_ms = (time.perf_counter() - begin) * 1000 / frames
+        frame_log.close()
+
+        begin = time.perf_counter()
+        log = DetectionLog('bench', directory)
+        open_ms = (time.perf_counter() - begin) * 1000
+        hour_start = start + (days // 2) * 86400 + 14 * 3600
+        track_id = int(days // 2 * 86400 * fps // int(600 * fps) * people + 3)
+
+        def scan(mask_fn):
+            return sum(int(np.count_nonzero(mask_fn(segment.records))) for segment in log.segments)
+
+        zone_bit = 1 << log.zone_names.index('A')
+        queries = {
+            'zone_hour_breaches': (
+                lambda: log.query(hour_start, hour_start + 3600, zone='A', flags=BREACHING),
+                lambda r: (r['time'] >= hour_start) & (r['time'] < hour_start + 3600)
+                & (r['zones'] & zone_bit > 0) & (r['flags'] & BREACHING > 0)),
+            'track_all_time': (
+                lambda: log.query(track_id=track_id),
+                lambda r: r['track_id'] == track_id),
+            'one_day': (
+                lambda: log.query(hour_start - 14 * 3600, hour_start + 10 * 3600),
+                lambda r: (r['time'] >= hour_start - 14 * 3600) & (r['time'] < hour_start + 10 * 3600)),
+        }
+        results = []
+        for name, (indexed, mask_fn) in queries.items():
+            matched = len(indexed())
+            assert matched == scan(mask_fn), name
+            results.append({
+                'query': name,
+                'records': records,
+                'segments': len(log.segments),
+                'matched': matched,
+                'indexed_ms': _time_call(indexed),
+                'scan_ms': _time_call(lambda: scan(mask_fn), repeat=1),
+                'open_ms': open_ms,
+                'bulk_records_per_s': records / bulk_seconds,
+                'frame_append_ms': append_ms,
+            })
+        return results
+    finally:
+        shutil.rmtree(directory)
+
+
+def _beach_calibration(frame_size=(1280, 650), height=8.0, tilt=12.0, focal=900.0):
+    """Calibration of a pinhole camera `height` metres up looking out to sea, shoreline 50 m away."""
+    from homography import Calibration
+
+    width, frame_height = frame_size
+    pitch = np.radians(tilt)
+
+    def project(x, y):
+        # Camera at (0, 0, height) looking along +y, pitched down by `tilt` degrees
+        depth = y * np.cos(pitch) + height * np.sin(pitch)
+        down = height * np.cos(pitch) - y * np.sin(pitch)
+        return width / 2 + focal * x / depth, frame_height / 2 + focal * down / depth
+
+    world = [(-10, 20), (10, 20), (-20, 80), (20, 80), (0, 45)]
+    shoreline = [project(-80, 50), project(0, 52), project(80, 50)]
+    return Calibration([project(*p) for p in world], world, shoreline, project(0, 70), frame_size, 'bench')
+
+
+def bench_ground(frame_sizes=((1280, 650), (1920, 1080)), counts=(10, 100, 1000), frames=200):
+    """
+    Foot point -> metres from shore through the precomputed lookup table versus on the fly.
+
+    'per_box' maps each foot point with cv2.perspectiveTransform and measures
+    its distance to the shoreline one box at a time; 'vectorized' does the
+    same for all boxes at once; 'lut' is the single gather of GroundLUT.
+    The table's rounding error is reported for boxes within 200 m of the
+    shoreline, with its build and cached (memory-mapped) load times.
+    """
+    import shutil
+    import tempfile
+    from homography import GroundLUT, _segment_distance
+
+    directory = tempfile.mkdtemp()
+    results = []
+    try:
+        for frame_size in frame_sizes:
+            calibration = _beach_calibration(frame_size)
+            begin = time.perf_counter()
+            ground = GroundLUT(calibration, directory=directory)
+            build_ms = (time.perf_counter() - begin) * 1000
+            begin = time.perf_counter()
+            ground = GroundLUT(calibration, directory=directory)
+            load_ms = (time.perf_counter() - begin) * 1000
+            shore = calibration.to_world(calibration.shoreline)
+            water_side = _segment_distance(calibration.to_world([calibration.water_point]), shore[:-1], shore[1:])[1][0]
+
+            def feet_of(boxes):
+                return np.column_stack([(boxes[:, 0] + boxes[:, 2]) * 0.5, boxes[:, 3] - 1])
+
+            def per_box(boxes):
+                distances = []
+                for foot in feet_of(boxes):
+                    point = calibration.to_world(foot)
+                    distance, side = _segment_distance(point, shore[:-1], shore[1:])
+                    distances.append(distance[0] * side[0] * water_side)
+                return np.array(distances)
+
+            def vectorized(boxes):
+                distance, side = _segment_distance(calibration.to_world(feet_of(boxes)), shore[:-1], shore[1:])
+                return distance * side * water_side
+
+            for count in counts:
+                boxes = [random_boxes(count, frame_size, seed) for seed in range(frames)]
+                # Near the horizon one pixel spans tens of metres; what matters is accuracy around the danger distance
+                exact = vectorized(boxes[0])
+                near = ~np.isnan(ground.offshore(boxes[0])) & (np.abs(exact) < 200)
+                error = np.abs(ground.offshore(boxes[0])[near] - exact[near])
+                timings = {}
+                for name, fn in (('per_box', per_box), ('vectorized', vectorized), ('lut', ground.offshore)):
+                    n = max(1, frames // 10) if name == 'per_box' else frames
+                    begin = time.perf_counter()
+                    for i in range(n):
+                        fn(boxes[i])
+                    timings[name] = (time.perf_counter() - begin) * 1000 / n
+                results.append({
+                    'frame_size': f'{frame_size[0]}x{frame_size[1]}',
+                    'boxes': count,
+                    'per_box_ms': timings['per_box'],
+                    'vectorized_ms': timings['vectorized'],
+                    'lut_ms': timings['lut'],
+                    'speedup': timings['vectorized'] / timings['lut'],
+                    'max_error_200m': float(error.max()) if len(error) else 0.0,
+                    'build_ms': build_ms,
+                    'load_ms': load_ms,
+                    'lut_mb': ground.lut.nbytes / 2 ** 20,
+                })
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+
+def bench_metrics(calls=100000):
+    """Per-call cost of a metrics stage timer and of observe(), enabled and disabled, plus snapshot cost."""
+    from metrics import Registry
+
+    results = []
+    for enabled in (False, True):
+        registry = Registry(enabled=enabled)
+
+        def timed():
+            for _ in range(calls):
+                with registry.time('model', '0'):
+                    pass
+
+        def observed():
+            for _ in range(calls):
+                registry.observe('model', 0.01, '0')
+
+        results.append({
+            'enabled': enabled,
+            'timer_ns': _time_call(timed, repeat=3) * 1e6 / calls,
+            'observe_ns': _time_call(observed, repeat=3) * 1e6 / calls,
+            'prometheus_text_ms': _time_call(registry.prometheus_text),
+        })
+    return results
+
+
+def bench_model(frame_sizes=((1280, 650), (1920, 1080)), people=(5, 20, 80), frames=30):
+    """CPU cost and recall of the synthetic stub model at several resolutions and crowd densities."""
+    from synthetic import SyntheticBeach, StubModel
+
+    model = StubModel()
+    results = []
+    for frame_size in frame_sizes:
+        for crowd in people:
+            scene = SyntheticBeach(frame_size, people=crowd)
+            rendered = [(frame.copy(), boxes) for frame, boxes in scene.frames(frames)]
+            model_ms = _time_call(lambda: [model(frame) for frame, _ in rendered], 1) / frames
+            matched = total = 0
+            for frame, boxes in rendered:
+                hit, count = _recall(model(frame)[0].boxes.xyxy.numpy(), boxes, iou_threshold=0.5)
+                matched += hit
+                total += count
+            results.append({
+                'frame': f'{frame_size[0]}x{frame_size[1]}',
+                'people': crowd,
+                'model_ms': model_ms,
+                'recall': matched / total if total else 1.0,
+            })
+    return results
+
+
+def bench_pipeline(frame_sizes=((1280, 650), (1920, 1080)), people=(10, 40), frames=60, widget_width=1040):
+    """
+    End-to-end CPU pipeline on synthetic footage with the stub model.
+
+    Per frame: resize to settings.CAPTURE_FRAME_SIZE, model, detection
+    filtering, zone scoring and breach update, overlay annotation and Qt
+    conversion. Stage medians come from the shared metrics registry, so the
+    stages carry the same names as in the GUI.
+    """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    import supervision as sv
+    from PyQt6.QtGui import QGuiApplication
+    from breach import BreachEngine
+    from display import DisplayConverter
+    from metrics import metrics
+    from overlay import OverlayRenderer
+    from synthetic import SyntheticBeach, StubModel
+    from zones import ZoneSet
+
+    app = QGuiApplication.instance() or QGuiApplication(sys.argv)  # QPixmap needs a running app
+    width, height = settings.CAPTURE_FRAME_SIZE
+    model = StubModel()
+    enabled = metrics.enabled
+    metrics.enabled = True
+    results = []
+    try:
+        for frame_size in frame_sizes:
+            for crowd in people:
+                scene = SyntheticBeach(frame_size, people=crowd)
+                rendered = [frame.copy() for frame, _ in scene.frames(frames)]
+                zones = ZoneSet({'water': scene.shoreline_zone()}, frame_size=frame_size).scaled(settings.CAPTURE_FRAME_SIZE)
+                overlay = OverlayRenderer(model.names, zones)
+                converter = DisplayConverter(camera='bench')
+                engine = BreachEngine()
+                resized = np.empty((height, width, 3), dtype=np.uint8)
+
+                metrics.reset()
+                start = time.perf_counter()
+                for index, frame in enumerate(rendered):
+                    with metrics.time('resize', 'bench'):
+                        cv2.resize(frame, (width, height), dst=resized)
+                    with metrics.time('model', 'bench'):
+                        result = model(resized)[0]
+                    with metrics.time('nms', 'bench'):
+                        detections = sv.Detections.from_yolov8(result)
+                        detections = detections[detections.class_id == 0]
+                    with metrics.time('zone_scoring', 'bench'):
+                        in_zone = zones.iou(detections.xyxy).max(axis=1, initial=0) > settings.BREACH_IOU_THRESHOLD
+                        engine.update(np.arange(len(detections)), in_zone, index / scene.fps)
+                    converter.to_pixmap(resized, widget_width,
+                                        draw=lambda scaled, scale: overlay.render(scaled, detections, scale))
+                elapsed = time.perf_counter() - start
+
+                row = {
+                    'frame': f'{frame_size[0]}x{frame_size[1]}',
+                    'people': crowd,
+                    'fps': frames / elapsed,
+                    'end_to_end_ms': elapsed * 1000 / frames,
+                }
+                stages = metrics.snapshot()['stages']
+                for (stage, _), stats in sorted(stages.items(), key=lambda item: str(item[0])):
+                    row[f'{stage}_ms'] = stats['p50'] * 1000
+                results.append(row)
+    finally:
+        metrics.reset()
+        metrics.enabled = enabled
+    return results
+
+
+class _BatchCostStub:
+    """
+    StubModel with a simulated accelerator cost: `call_ms` per model call plus `frame_ms` per frame.
+
+    Calls are serialized like on a single GPU, so the fixed per-call cost
+    (kernel launches, transfers) is what batching amortizes.
+    """
+
+    def __init__(self, call_ms=20.0, frame_ms=4.0):
+        import threading
+        from synthetic import StubModel
+
+        self.stub = StubModel()
+        self.call_ms = call_ms
+        self.frame_ms = frame_ms
+        self._lock = threading.Lock()
+
+    def __call__(self, source, conf=0.25, **kwargs):
+        frames = source if isinstance(source, list) else [source]
+        with self._lock:
+            time.sleep((self.call_ms + self.frame_ms * len(frames)) / 1000)
+            return self.stub(frames, conf, **kwargs)
+
+
+def bench_scheduler(cameras=4, seconds=4.0, call_ms=20.0, frame_ms=4.0, frame_size=(640, 360)):
+    """
+    Detection throughput of BatchScheduler: one batched model call versus one call per camera.
+
+    `cameras` emulated 25 fps streams share one model with a simulated
+    accelerator cost (see _BatchCostStub). 'per_camera' runs one scheduler
+    per stream with batch_size=1, as one VideoThread per camera would;
+    'batched' runs a single scheduler with batch_size=cameras.
+    """
+    import tempfile
+
+    from capture import StreamEmulator
+    from scheduler import BatchScheduler
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / 'stream.mp4'
+        _write_test_video(path, frame_size=frame_size)
+        sources = {f'cam{index}': f'rtsp://emulated/{index}' for index in range(cameras)}
+        for mode in ('per_camera', 'batched'):
+            model = _BatchCostStub(call_ms, frame_ms)
+            if mode == 'batched':
+                schedulers = [BatchScheduler(model, sources, batch_size=cameras, opener=StreamEmulator(path))]
+            else:
+                schedulers = [BatchScheduler(model, {name: source}, batch_size=1, opener=StreamEmulator(path))
+                              for name, source in sources.items()]
+            for scheduler in schedulers:
+                scheduler.start()
+            time.sleep(seconds)
+            for scheduler in schedulers:
+                scheduler.stop()
+            for scheduler in schedulers:
+                scheduler.join()
+
+            stats = [scheduler.stats() for scheduler in schedulers]
+            per_camera = [camera for stat in stats for camera in stat['cameras'].values()]
+            batches = sum(stat['batches_run'] for stat in stats)
+            frames = sum(camera['frames_processed'] for camera in per_camera)
+            results.append({
+                'mode': mode,
+                'cameras': cameras,
+                'detections_fps': frames / seconds,
+                'model_calls': batches,
+                'mean_batch_size': frames / batches if batches else 0.0,
+                'latency_p95_ms': float(np.mean([camera['latency_p95_ms'] for camera in per_camera])),
+            })
+    return results
+
+
+def bench_multicore(cameras=4, worker_counts=None, seconds=5.0, frame_size=(640, 360)):
+    """
+    Throughput of the shared-memory ProcessPipeline as inference processes are added.
+
+    Every camera plays a synthetic clip (or a stored video from
+    settings.VIDEOS_DICT when present) as fast as it decodes, looped, through
+    the stub model. The speedup column is relative to one inference process.
+    """
+    import tempfile
+    from pipeline import ProcessPipeline
+    from synthetic import StubModel, write_video
+
+    worker_counts = worker_counts or sorted({1, 2, max(os.cpu_count() or 1, 1)})
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        videos = [str(path) for path in settings.VIDEOS_DICT.values() if Path(path).exists()]
+        if not videos:
+            videos = [str(Path(directory) / 'synthetic.mp4')]
+            write_video(videos[0], frame_size, seconds=4.0, people=20)
+        sources = {f'camera{i}': videos[i % len(videos)] for i in range(cameras)}
+
+        baseline = None
+        for workers in worker_counts:
+            pipeline = ProcessPipeline(sources, StubModel, workers=workers, slots=workers + 2,
+                                       frame_size=frame_size, realtime=False, loop=True)
+            pipeline.start()
+            try:
+                # Skip process start-up and model loading: discard results for the first second of output
+                warmup_end = None
+                while warmup_end is None or time.monotonic() < warmup_end:
+                    item = pipeline.get(timeout=30.0)
+                    if item is None:
+                        raise RuntimeError("ProcessPipeline produced no frames")
+                    item.release()
+                    warmup_end = warmup_end or time.monotonic() + 1.0
+                processed = 0
+                end = time.monotonic() + seconds
+                while time.monotonic() < end:
+                    item = pipeline.get(timeout=0.5)
+                    if item is not None:
+                        item.release()
+                        processed += 1
+                stats = pipeline.stats()
+            finally:
+                pipeline.stop()
+            fps = processed / seconds
+            baseline = baseline or fps
+            results.append({
+                'cameras': cameras,
+                'workers': workers,
+                'fps': fps,
+                'frame_ms': 1000 / fps if fps else 0.0,
+                'speedup': fps / baseline if baseline else 0.0,
+                'dropped': sum(camera['frames_dropped'] for camera in stats['cameras'].values()),
+                'restarts': stats['restarts'],
+            })
+    return results
+
+
+class _SwapStub:
+    """StubModel with `megabytes` of dummy weights, optionally wrong classes or failing after `fail_after` calls."""
+
+    def __init__(self, megabytes=64, names=None, fail_after=None):
+        from synthetic import StubModel
+
+        self.stub = StubModel()
+        if names is not None:
+            self.stub.names = names
+        self.model = self.stub
+        self.weights = np.ones(megabytes * 2 ** 18, dtype=np.float32)
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def __call__(self, source, conf=0.25, **kwargs):
+        self.calls += 1
+        if self.fail_after is not None and self.calls > self.fail_after:
+            raise RuntimeError("simulated inference failure")
+        return self.stub(source, conf, **kwargs)
+
+
+def bench_model_swap(seconds=8.0, frame_size=(640, 360), load_seconds=1.0):
+    """
+    Frames delivered by VideoThread while models are hot-swapped under it.
+
+    A synthetic clip plays at its native 25 fps through the real
+    VideoThread. The 'swap' run goes through three swaps with the stub
+    model, each loaded in the background by ModelLoader with
+    `load_seconds` of simulated loading:
+    - good weights, swapped in;
+    - weights whose class 0 is not 'person', rejected by the smoke test;
+    - weights that fail on live frames after passing the smoke test,
+      rolled back.
+    The 'steady' run never swaps. Dropped frames are frames the capture
+    ring overwrote before VideoThread read them.
+    """
+    import tempfile
+    from PyQt6.QtCore import QCoreApplication, Qt
+    from capture import StreamEmulator, streams
+    from gui import ModelLoader, VideoThread
+    from modelswap import ModelManager
+    from synthetic import write_video
+    from zones import ZoneSet
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    direct = Qt.ConnectionType.DirectConnection
+    specs = {
+        'good.pt': {},
+        'wrong-classes.pt': {'names': {0: 'boat'}},
+        # Two warm-up calls and the smoke test pass, then a few live frames
+        'crashes.pt': {'fail_after': settings.WARMUP_RUNS + 1 + 10},
+    }
+
+    def loader(path):
+        time.sleep(load_seconds)
+        return _SwapStub(**specs.get(Path(path).name, {}))
+
+    results = []
+    saved = streams.worker_kwargs, settings.DETLOG_ENABLED
+    settings.DETLOG_ENABLED = False
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            video = str(Path(directory) / 'synthetic.mp4')
+            write_video(video, frame_size, seconds=4.0, people=10)
+            streams.worker_kwargs = {'opener': StreamEmulator(video)}
+            for run, schedule in (('steady', ()), ('swap', ((1.0, 'good.pt'), (3.5, 'wrong-classes.pt'),
+                                                            (5.0, 'crashes.pt')))):
+                thread = VideoThread(video, mode='full', zones=ZoneSet())
+                models = ModelManager(install=lambda model, path: thread.set_model(model), loader=loader,
+                                      frame_size=frame_size)
+                models.swap(models.prepare('good.pt'), 'good.pt')
+                emitted = []
+                thread.frame_update.connect(lambda frame, detections: emitted.append(
+                    (time.monotonic(), detections is not None)), direct)
+                thread.model_failed.connect(lambda message: models.rollback(), direct)
+                loaders = []
+                thread.start()
+                # Count from the first delivered frame, past stream start-up and the first-frame imports
+                while not emitted:
+                    time.sleep(0.01)
+                dropped_at_start = thread.capture_worker.stats()['dropped_frames']
+                started = time.monotonic()
+                for at, path in schedule:
+                    time.sleep(max(0.0, started + at - time.monotonic()))
+                    model_loader = ModelLoader(path, frame_size, models=models, variants=False)
+                    model_loader.model_ready.connect(lambda model, path=path: models.swap(model, path), direct)
+                    model_loader.start()
+                    loaders.append(model_loader)
+                time.sleep(max(0.0, started + seconds - time.monotonic()))
+                capture = thread.capture_worker.stats()
+                thread.stop()
+                for model_loader in loaders:
+                    model_loader.wait()
+                app.processEvents()
+                models.commit()
+                times = np.array([t for t, _ in emitted])
+                gaps = np.diff(times) * 1000 if len(times) > 1 else np.zeros(1)
+                stats = models.stats()
+                results.append({
+                    'run': run,
+                    'frames': len(emitted),
+                    'fps': len(emitted) / (times[-1] - times[0]) if len(times) > 1 else 0.0,
+                    'dropped_frames': capture['dropped_frames'] - dropped_at_start,
+                    'frames_without_model': sum(1 for _, detected in emitted if not detected),
+                    'max_gap_ms': float(gaps.max()),
+                    'p99_gap_ms': float(np.percentile(gaps, 99)),
+                    'swaps': stats['model_swaps'],
+                    'rollbacks': stats['model_rollbacks'],
+                    'rejected': stats['models_rejected'],
+                    'unreleased': stats['models_unreleased'],
+                })
+    finally:
+        streams.worker_kwargs, settings.DETLOG_ENABLED = saved
+    return results
+
+
+class _FakeCapture:
+    """cv2.VideoCapture stand-in that takes `delay` seconds to open and may find nothing."""
+
+    def __init__(self, delay, present):
+        time.sleep(delay)
+        self.present = present
+
+    def isOpened(self):
+        return self.present
+
+    def grab(self):
+        return self.present
+
+    def get(self, prop):
+        return {cv2.CAP_PROP_FRAME_WIDTH: 1280, cv2.CAP_PROP_FRAME_HEIGHT: 720, cv2.CAP_PROP_FPS: 30.0,
+                cv2.CAP_PROP_FOURCC: cv2.VideoWriter_fourcc(*'MJPG')}.get(prop, 0)
+
+    def release(self):
+        pass
+
+
+class _FakeSerial:
+    """serial.Serial stand-in printing the alarm sketch's boot banner after `delay` seconds."""
+
+    def __init__(self, port, baud_rate, timeout=None, delay=0.5):
+        self.ready_at = time.monotonic() + delay
+        self.sent = False
+
+    def read(self, size):
+        if not self.sent and time.monotonic() >= self.ready_at:
+            self.sent = True
+            return b'Start!\r\n'
+        time.sleep(0.02)
+        return b''
+
+    def close(self):
+        pass
+
+
+def bench_devices(indices=10, present=(0, 2), open_seconds=0.2, missing_seconds=1.0, ports=2):
+    """
+    Device discovery time on startup and rescan, from the cache (hit) and with probing (miss).
+
+    Cameras are simulated: `present` indices open in `open_seconds`, the
+    others block for `missing_seconds` before failing, like a missing
+    DirectShow device. Serial ports answer with the alarm sketch's banner
+    after half a second. 'serial_loop' is the old populate_camera_list,
+    opening every index in turn; the registry rows probe concurrently.
+    Rows:
+    - cold: first start without a cache, everything probed;
+    - warm_start: registry loaded from that cache, list ready without probing;
+    - rescan: a refresh with nothing changed;
+    - hotplug: a refresh after one camera and one serial port were plugged in.
+    """
+    import tempfile
+    from devices import DeviceRegistry
+
+    nodes = {index: f'node{index}' for index in range(indices)}
+    port_list = [(f'/dev/ttyACM{i}', 'Arduino Uno', f'USB VID:PID=2341:0043 SER={i}', 0x2341) for i in range(ports)]
+    plugged = set(present)
+
+    def opener(source):
+        return _FakeCapture(open_seconds if source in plugged else missing_seconds, source in plugged)
+
+    def serial_loop():
+        return [i for i in range(indices) if opener(i).isOpened()]
+
+    begin = time.perf_counter()
+    serial_loop()
+    results = [{'scan': 'serial_loop', 'scan_ms': (time.perf_counter() - begin) * 1000, 'probed': indices,
+                'cached': 0, 'cameras': len(plugged), 'serial_ports': 0}]
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = Path(directory) / 'devices.json'
+
+        def registry():
+            return DeviceRegistry(cameras=range(indices), streams={}, cache_path=cache, camera_opener=opener,
+                                  serial_opener=_FakeSerial, port_lister=lambda: list(port_list),
+                                  video_nodes=lambda index: nodes.get(index))
+
+        def row(name, devices, begin, startup=False):
+            stats = devices.stats()
+            results.append({
+                'scan': name,
+                'scan_ms': (time.perf_counter() - begin) * 1000,
+                'probed': 0 if startup else stats['probed'],
+                'cached': len(devices.devices) if startup else stats['cached'],
+                'cameras': len(devices.cameras()),
+                'serial_ports': len(devices.serial_ports()),
+            })
+
+        begin = time.perf_counter()
+        devices = registry()
+        devices.refresh()
+        row('cold', devices, begin)
+
+        begin = time.perf_counter()
+        devices = registry()
+        row('warm_start', devices, begin, startup=True)
+
+        begin = time.perf_counter()
+        devices.refresh()
+        row('rescan', devices, begin)
+
+        nodes[indices] = f'node{indices}'
+        devices.camera_indices.append(indices)
+        plugged.add(indices)
+        port_list.append((f'/dev/ttyACM{ports}', 'USB Serial', 'USB VID:PID=1A86:7523', 0x1A86))
+        begin = time.perf_counter()
+        devices.refresh()
+        row('hotplug', devices, begin)
+    return results
+
+
+def bench_alarm(bursts=(1, 5, 50), time_scale=0.1, timeout=5.0):
+    """
+    AlarmDispatcher against the SketchEmulator pty: coalescing and time to acknowledgement.
+
+    Every round sends a burst of alternating '0'/'1' commands as fast as the
+    GUI could, ending in the opposite of the previous round's state, then waits
+    until the emulated sketch acknowledges it. The bytes the sketch received
+    must never repeat a state and must end in the requested one. settle_ms
+    includes the safe acknowledgement, which only comes after
+    settings.ALARM_HEARTBEAT_TIMEOUT without a hazard counter line.
+    """
+    if os.name != 'posix':
+        print("SketchEmulator needs a POSIX pty, skipping")
+        return []
+    from alarm import AlarmDispatcher, SketchEmulator, HAZARD_COMMAND, SAFE_COMMAND
+
+    emulator = SketchEmulator(time_scale=time_scale, boot_time=0.2)
+    emulator.start()
+    dispatcher = AlarmDispatcher(emulator.port)
+    dispatcher.start()
+    results = []
+    try:
+        deadline = time.monotonic() + timeout
+        while not dispatcher.ready and time.monotonic() < deadline:
+            time.sleep(0.01)
+        if not dispatcher.ready:
+            raise RuntimeError("AlarmDispatcher did not see the sketch's banner")
+
+        state = SAFE_COMMAND
+        for size in bursts:
+            final = HAZARD_COMMAND if state == SAFE_COMMAND else SAFE_COMMAND
+            other = state
+            burst = [final if (size - 1 - index) % 2 == 0 else other for index in range(size)]
+            written, coalesced, received = (dispatcher.commands_written, dispatcher.commands_coalesced,
+                                            len(emulator.received))
+            begin = time.monotonic()
+            for command in burst:
+                dispatcher.send(command)
+            while dispatcher.acknowledged_state != final and time.monotonic() - begin < timeout:
+                time.sleep(0.005)
+            settle = time.monotonic() - begin
+            if dispatcher.acknowledged_state != final:
+                raise RuntimeError(f"burst of {size} not acknowledged within {timeout} s")
+
+            sent = emulator.received[received:]
+            # The worker only writes state changes, and always ends on the latest request
+            assert sent and sent[-1] == final, (size, sent)
+            assert all(a != b for a, b in zip([state] + sent, sent)), (size, sent)
+            results.append({
+                'burst': size,
+                'commands_written': dispatcher.commands_written - written,
+                'commands_coalesced': dispatcher.commands_coalesced - coalesced,
+                'bytes_received': len(sent),
+                'settle_ms': settle * 1000,
+            })
+            state = final
+    finally:
+        dispatcher.stop()
+        dispatcher.join()
+        emulator.stop()
+    return results
+
+
+def bench_fastpath(frame_sizes=((1280, 650), (1920, 1080)), people=20, frames=30):
+    """
+    Per-frame time and allocations of the general ultralytics path against fastpath.FastDetector.
+
+    'general' is what VideoThread did before: model(frame), then
+    sv.Detections.from_yolov8 and a class filter. Both paths run on the
+    detector weights when they load, otherwise on the synthetic stub. With the
+    stub, the model itself costs next to nothing, so what is left is the
+    difference in pre- and postprocessing. `fast_model_*` is the network
+    call alone on the fast path, and the rest of `fast_*` is letterbox and
+    decoding. `match` is the fraction of general-path boxes that the fast
+    path also finds (IoU >= 0.5). The stub segments the general path's
+    full-resolution frame but only the letterboxed input on the fast path,
+    so it matches less than the real detector.
+    """
+    import supervision as sv
+    from fastpath import FastDetector, raw_backend
+    from synthetic import SyntheticBeach
+
+    model, model_name = _detector()
+
+    def general(frame):
+        result = model(frame, agnostic_nms=True, verbose=False)[0]
+        detections = sv.Detections.from_yolov8(result)
+        return detections[detections.class_id == 0]
+
+    results = []
+    for frame_size in frame_sizes:
+        rendered = [frame.copy() for frame, _ in SyntheticBeach(frame_size, people=people).frames(frames)]
+        general(rendered[0])  # sets up the predictor, as the warm-up does in the GUI
+        detector = FastDetector()
+        row = {'model': model_name, 'frame': f'{frame_size[0]}x{frame_size[1]}'}
+        for name, detect in (('general', general), ('fast', lambda frame: detector.detect(model, frame))):
+            row[f'{name}_ms'] = _time_call(lambda: [detect(frame) for frame in rendered], 3) / frames
+            cycle = iter(rendered * 2)
+            _, allocated = _count_allocations(lambda: detect(next(cycle)), frames)
+            row[f'{name}_kb_per_frame'] = allocated / 1024
+        backend = raw_backend(model)
+        image = detector._layout(rendered[0].shape, settings.INFERENCE_IMGSZ, backend).fill(rendered[0])
+        row['fast_model_ms'] = _time_call(lambda: backend(image), 3)
+        row['fast_model_kb_per_frame'] = _count_allocations(lambda: backend(image), frames)[1] / 1024
+        matched = total = 0
+        for frame in rendered:
+            hit, count = _recall(detector.detect(model, frame).xyxy, general(frame).xyxy, iou_threshold=0.5)
+            matched += hit
+            total += count
+        row['match'] = matched / total if total else 1.0
+        results.append(row)
+    return results
+
+
+BENCHMARKS = {
+    'zones': bench_zone_scoring,
+    'zone_raster': bench_zone_raster,
+    'backends': bench_backends,
+    'breach': bench_breach_engine,
+    'display': bench_display,
+    'motion': bench_motion_gate,
+    'roi': bench_roi,
+    'annotation': bench_annotation,
+    'startup': bench_startup,
+    'capture': bench_capture,
+    'metrics': bench_metrics,
+    'detlog': bench_detlog,
+    'ground': bench_ground,
+    'autoscale': bench_autoscale,
+    'alerts': bench_alerts,
+    'model': bench_model,
+    'pipeline': bench_pipeline,
+    'multicore': bench_multicore,
+    'model_swap': bench_model_swap,
+    'devices': bench_devices,
+    'fastpath': bench_fastpath,
+    'scheduler': bench_scheduler,
+    'alarm': bench_alarm,
+}
+
+
+def compare(results, baseline, tolerance=None, min_ms=0.05):
+    """
+    Finds timings that got slower than the baseline.
+
+    Rows are matched by benchmark name and position; every `*_ms` value is
+    compared, and one counts as a regression when it exceeds the baseline by
+    more than `tolerance` (relative) and `min_ms` (absolute, to ignore noise
+    on sub-millisecond stages).
+
+    Returns:
+    - regressions (list): (benchmark, row index, key, baseline ms, current ms) tuples.
+    """
+    tolerance = settings.BENCHMARK_TOLERANCE if tolerance is None else tolerance
+    regressions = []
+    for name, rows in results.items():
+        for index, (row, reference) in enumerate(zip(rows, baseline.get(name, []))):
+            for key, value in row.items():
+                old = reference.get(key)
+                if not key.endswith('_ms') or not isinstance(value, float) or not isinstance(old, (int, float)):
+                    continue
+                if value > old * (1 + tolerance) and value - old > min_ms:
+                    regressions.append((name, index, key, old, value))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Performance benchmarks for the drowning detection pipeline")
+    parser.add_argument('names', nargs='*', help=f"Benchmarks to run, any of {sorted(BENCHMARKS)} (default: all)")
+    parser.add_argument('--json', metavar='PATH', help="Write the results as JSON")
+    parser.add_argument('--baseline', metavar='PATH', help="JSON results of an earlier run to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=settings.BENCHMARK_TOLERANCE,
+                        help="Allowed relative slowdown against the baseline")
+    args = parser.parse_args()
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    results = {}
+    failures = {}
+    for name in args.names or sorted(BENCHMARKS):
+        print(f"== {name}")
+        try:
+            results[name] = BENCHMARKS[name]()
+        except Exception as ex:
+            # One broken benchmark must not lose the others' report
+            traceback.print_exc()
+            failures[name] = f"{type(ex).__name__}: {ex}"
+            continue
+        for row in results[name]:
+            print("  " + "  ".join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}" for key, value in row.items()))
+
+    if args.json:
+        report = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'python': platform.python_version(),
+            'results': results,
+            'failures': failures,
+        }
+        Path(args.json).write_text(json.dumps(report, indent=2, default=float))
+        print(f"Results written to {args.json}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())['results']
+        regressions = compare(results, baseline, args.tolerance)
+        for name, index, key, old, new in regressions:
+            print(f"REGRESSION {name}[{index}] {key}: {old:.3f} -> {new:.3f} ms")
+        if not regressions:
+            print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+    for name, error in failures.items():
+        print(f"FAILED {name}: {error}")
+    if failures or (args.baseline and regressions):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+import time
+from collections import deque
+from collections.abc import Mapping
+
+import numpy as np
+
+import settings
+
+HAZARD = 'hazard'
+SAFE = 'safe'
+# The track ID index is rebuilt once this many entries (or this fraction of it) changed
+MERGE_MIN = 64
+MERGE_FRACTION = 0.125
+
+
+class BreachEvent:
+    """A debounced hazard/safe transition emitted by the BreachEngine."""
+
+    __slots__ = ('state', 'timestamp', 'track_ids')
+
+    def __init__(self, state, timestamp, track_ids):
+        self.state = state
+        self.timestamp = timestamp
+        self.track_ids = track_ids
+
+    def __repr__(self):
+        return f"BreachEvent({self.state!r}, {self.timestamp:.3f}, {self.track_ids!r})"
+
+
+class BreachCounts(Mapping):
+    """Read-only track_id -> breach count view over the engine's arrays (nothing is copied per frame)."""
+
+    def __init__(self, engine):
+        self._engine = engine
+
+    def __getitem__(self, track_id):
+        slot = self._engine.slot_of(track_id)
+        if slot < 0:
+            raise KeyError(track_id)
+        return int(self._engine.breach_count[slot])
+
+    def __iter__(self):
+        return iter(self._engine.track_ids().tolist())
+
+    def __len__(self):
+        return len(self._engine)
+
+
+class BreachEngine:
+    """
+    Per-track danger-zone breach state for hundreds of concurrent tracks.
+
+    State lives in preallocated NumPy columns indexed by slot; track IDs map to
+    slots through a sorted ID index, so a frame update is a handful of
+    vectorized operations. Tracks are expired through a queue of per-frame
+    buckets. An expired track only has its slot marked dead (its entry is
+    live only while `track_id[slot]` still holds the ID), and new IDs go into
+    a small sorted side index. Both are folded into the main index in
+    batches, so adding and expiring a track cost O(1) amortized.
+    """
+
+    def __init__(self, min_dwell=None, clear_time=None, track_ttl=None, capacity=256):
+        """
+        Args:
+        - min_dwell (float): Seconds a track must stay in the zone before it counts as breaching.
+        - clear_time (float): Seconds without any breaching track before a safe transition is emitted.
+        - track_ttl (float): Seconds after which an unseen track is expired.
+        - capacity (int): Initial number of track slots (grows automatically).
+        """
+        self.min_dwell = settings.BREACH_MIN_DWELL if min_dwell is None else min_dwell
+        self.clear_time = settings.BREACH_CLEAR_TIME if clear_time is None else clear_time
+        self.track_ttl = settings.TRACK_TTL if track_ttl is None else track_ttl
+
+        self.track_id = np.full(capacity, -1, dtype=np.int64)
+        self.entry_time = np.full(capacity, np.nan)
+        self.dwell_time = np.zeros(capacity)
+        self.breach_count = np.zeros(capacity, dtype=np.int32)
+        self.last_seen = np.zeros(capacity)
+        self.in_zone = np.zeros(capacity, dtype=bool)
+        self.breaching = np.zeros(capacity, dtype=bool)
+
+        self._free = list(range(capacity - 1, -1, -1))
+        self._sorted_ids = np.empty(0, dtype=np.int64)
+        self._sorted_slots = np.empty(0, dtype=np.intp)
+        # New IDs since the last merge, merged into the main index once it outgrows MERGE_FRACTION of it
+        self._recent_ids = np.empty(0, dtype=np.int64)
+        self._recent_slots = np.empty(0, dtype=np.intp)
+        self._live = 0
+        self._dead = 0  # index entries whose track expired, dropped once they are half of the index
+        self._buckets = deque()  # (timestamp, slots seen at that timestamp)
+
+        self.hazard = False
+        self._last_breach_time = None
+        self.active_breachers = set()
+        self.breach_counts = BreachCounts(self)
+
+    def __len__(self):
+        return self._live
+
+    def track_ids(self):
+        ids = np.concatenate([self._sorted_ids, self._recent_ids])
+        slots = np.concatenate([self._sorted_slots, self._recent_slots])
+        return np.sort(ids[self.track_id[slots] == ids])
+
+    def slot_of(self, track_id):
+        """Returns the slot of a track ID, or -1 if the track is unknown."""
+        return int(self._lookup(np.array([track_id], dtype=np.int64))[0])
+
+    @staticmethod
+    def _search(keys, ids):
+        """Returns (positions, matched) of `ids` in one sorted index."""
+        if len(keys) == 0:
+            return np.zeros(len(ids), dtype=np.intp), np.zeros(len(ids), dtype=bool)
+        index = np.minimum(np.searchsorted(keys, ids), len(keys) - 1)
+        return index, keys[index] == ids
+
+    def _lookup(self, ids):
+        slots = np.full(len(ids), -1, dtype=np.intp)
+        # An ID is in at most one of the two indexes (see _allocate)
+        for keys, values in ((self._sorted_ids, self._sorted_slots), (self._recent_ids, self._recent_slots)):
+            index, matched = self._search(keys, ids)
+            candidate = values[index] if len(values) else slots
+            live = matched & (self.track_id[candidate] == ids)
+            slots[live] = candidate[live]
+        return slots
+
+    def _grow(self, needed):
+        old = len(self.track_id)
+        new = max(old * 2, old + needed)
+        for name, fill in (('track_id', -1), ('entry_time', np.nan), ('dwell_time', 0),
+                           ('breach_count', 0), ('last_seen', 0), ('in_zone', False), ('breaching', False)):
+            column = getattr(self, name)
+            grown = np.full(new, fill, dtype=column.dtype)
+            grown[:old] = column
+            setattr(self, name, grown)
+        self._free.extend(range(new - 1, old - 1, -1))
+
+    def _allocate(self, ids, now):
+        """Assigns fresh slots to new, sorted, unique track IDs."""
+        if len(ids) > len(self._free):
+            self._grow(len(ids) - len(self._free))
+        slots = np.array([self._free.pop() for _ in range(len(ids))], dtype=np.intp)
+        self.track_id[slots] = ids
+        self.entry_time[slots] = np.nan
+        self.dwell_time[slots] = 0
+        self.breach_count[slots] = 0
+        self.last_seen[slots] = now
+        self.in_zone[slots] = False
+        self.breaching[slots] = False
+
+        self._live += len(ids)
+
+        # An ID that comes back after expiring still has its dead entry: point it at the new slot
+        pending = np.ones(len(ids), dtype=bool)
+        for keys, values in ((self._sorted_ids, self._sorted_slots), (self._recent_ids, self._recent_slots)):
+            index, matched = self._search(keys, ids)
+            matched &= pending
+            values[index[matched]] = slots[matched]
+            pending &= ~matched
+            self._dead -= int(matched.sum())
+        if pending.any():
+            position = np.searchsorted(self._recent_ids, ids[pending])
+            self._recent_ids = np.insert(self._recent_ids, position, ids[pending])
+            self._recent_slots = np.insert(self._recent_slots, position, slots[pending])
+            if len(self._recent_ids) > max(MERGE_MIN, MERGE_FRACTION * len(self._sorted_ids)):
+                self._compact()
+        return slots
+
+    def _compact(self):
+        """Merges the side index into the main one and drops the dead entries, O(N) every O(N) changes."""
+        ids = np.concatenate([self._sorted_ids, self._recent_ids])
+        slots = np.concatenate([self._sorted_slots, self._recent_slots])
+        live = self.track_id[slots] == ids
+        order = np.argsort(ids[live], kind='stable')
+        self._sorted_ids, self._sorted_slots = ids[live][order], slots[live][order]
+        self._recent_ids = self._recent_ids[:0]
+        self._recent_slots = self._recent_slots[:0]
+        self._dead = 0
+
+    def update(self, track_ids, in_zone, now=None):
+        """
+        Advances the engine by one frame.
+
+        Args:
+        - track_ids (numpy array): (N,) tracker IDs seen in this frame.
+        - in_zone (numpy array): (N,) bool, whether each track overlaps the danger zone.
+        - now (float): Frame timestamp in seconds (default is time.monotonic()).
+
+        Returns:
+        - events (list): BreachEvent transitions triggered by this frame (usually empty).
+        """
+        now = time.monotonic() if now is None else now
+        track_ids = np.asarray(track_ids, dtype=np.int64)
+        in_zone = np.asarray(in_zone, dtype=bool)
+
+        slots = self._lookup(track_ids)
+        new = slots < 0
+        if new.any():
+            new_ids = np.unique(track_ids[new])
+            new_slots = self._allocate(new_ids, now)
+            slots[new] = new_slots[np.searchsorted(new_ids, track_ids[new])]
+
+        was_in_zone = self.in_zone[slots]
+        stayed = in_zone & was_in_zone
+        self.dwell_time[slots[stayed]] += now - self.last_seen[slots[stayed]]
+
+        entered = slots[in_zone & ~was_in_zone]
+        self.entry_time[entered] = now
+        self.entry_time[slots[~in_zone]] = np.nan
+
+        self.in_zone[slots] = in_zone
+        self.last_seen[slots] = now
+        self._buckets.append((now, slots))
+
+        was_breaching = self.breaching[slots]
+        is_breaching = in_zone & (now - np.nan_to_num(self.entry_time[slots], nan=now) >= self.min_dwell)
+        self.breaching[slots] = is_breaching
+        self.breach_count[slots[is_breaching & ~was_breaching]] += 1
+        started = track_ids[is_breaching & ~was_breaching]
+        stopped = track_ids[was_breaching & ~is_breaching]
+        self.active_breachers.update(started.tolist())
+        self.active_breachers.difference_update(stopped.tolist())
+
+        self._expire(now)
+        return self._transitions(now)
+
+    def _expire(self, now):
+        """Drops tracks not seen for track_ttl seconds by popping whole per-frame buckets."""
+        cutoff = now - self.track_ttl
+        while self._buckets and self._buckets[0][0] < cutoff:
+            seen_at, slots = self._buckets.popleft()
+            # A slot may have been refreshed (or reused) since this bucket was queued
+            stale = slots[(self.last_seen[slots] == seen_at) & (self.track_id[slots] >= 0)]
+            stale = np.unique(stale)
+            if len(stale) == 0:
+                continue
+            self.active_breachers.difference_update(self.track_id[stale][self.breaching[stale]].tolist())
+            # Marking the slot dead is enough for _lookup; the index entries go in the next compaction
+            self.track_id[stale] = -1
+            self.in_zone[stale] = False
+            self.breaching[stale] = False
+            self._free.extend(stale.tolist())
+            self._live -= len(stale)
+            self._dead += len(stale)
+        if self._dead > max(MERGE_MIN, (len(self._sorted_ids) + len(self._recent_ids)) // 2):
+            self._compact()
+
+    def _transitions(self, now):
+        events = []
+        if self.active_breachers:
+            self._last_breach_time = now
+            if not self.hazard:
+                self.hazard = True
+                events.append(BreachEvent(HAZARD, now, sorted(self.active_breachers)))
+        elif self.hazard and now - self._last_breach_time >= self.clear_time:
+            self.hazard = False
+            events.append(BreachEvent(SAFE, now, []))
+        return events
+
+    def is_breaching(self, track_ids):
+        """Returns (N,) bool, whether each track is currently breaching; unknown tracks are not."""
+        slots = self._lookup(np.asarray(track_ids, dtype=np.int64))
+        return np.where(slots >= 0, self.breaching[slots], False)
+
+    def track_state(self, track_id):
+        """Returns a dict with the entry time, dwell time and breach count of one track."""
+        slot = self.slot_of(track_id)
+        if slot < 0:
+            raise KeyError(track_id)
+        return {
+            'entry_time': float(self.entry_time[slot]),
+            'dwell_time': float(self.dwell_time[slot]),
+            'breach_count': int(self.breach_count[slot]),
+            'in_zone': bool(self.in_zone[slot]),
+            'breaching': bool(self.breaching[slot]),
+        }
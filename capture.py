@@ -0,0 +1,524 @@
+import random
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+import settings
+from metrics import metrics
+
+
+class FrameRingBuffer:
+    """
+    A bounded, preallocated ring of frames shared by one writer and one reader.
+
+    The writer (capture thread) never blocks: when the reader falls behind, the
+    oldest unread frames are simply overwritten. The reader always receives the
+    newest frame and every frame it skipped is counted as dropped.
+    """
+
+    def __init__(self, capacity, frame_shape, dtype=np.uint8, on_commit=None):
+        """
+        Args:
+        - capacity (int): Number of frame slots, at least 3 (one being written, one latest, one being read).
+        - frame_shape (tuple): Shape of a single frame, e.g. (650, 1280, 3).
+        - dtype: Frame dtype (default is np.uint8).
+        - on_commit (callable): Optional callback invoked after every committed frame.
+        """
+        if capacity < 3:
+            raise ValueError("FrameRingBuffer needs at least 3 slots")
+        self.capacity = capacity
+        self.frame_shape = tuple(frame_shape)
+        self.frames = np.zeros((capacity,) + self.frame_shape, dtype=dtype)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.sequence = np.zeros(capacity, dtype=np.int64)
+
+        self._cond = threading.Condition()
+        self._latest = -1         # slot holding the newest committed frame
+        self._writing = -1        # slot currently being filled by the writer
+        self._reading = -1        # slot currently being copied by the reader
+        self._written = 0         # frames committed so far
+        self._last_read_seq = 0   # sequence number of the last frame handed out
+        self._closed = False
+        self._waiting = 0         # readers blocked in read_latest
+        self._last_read_at = None
+        self._read_interval = None  # smoothed time between reads
+        self.on_commit = on_commit
+
+        self.dropped_frames = 0
+
+    def begin_write(self):
+        """
+        Reserves a free slot for the writer and returns (slot, view).
+
+        The view can be used directly as the `dst` of `cv2.resize` so the frame
+        lands in the ring without an intermediate copy.
+        """
+        with self._cond:
+            slot = (self._latest + 1) % self.capacity
+            while slot == self._latest or slot == self._reading:
+                slot = (slot + 1) % self.capacity
+            self._writing = slot
+        return slot, self.frames[slot]
+
+    def commit_write(self, slot, timestamp=None):
+        """Publishes the slot filled after `begin_write` as the newest frame."""
+        with self._cond:
+            self._written += 1
+            self.sequence[slot] = self._written
+            self.timestamps[slot] = time.monotonic() if timestamp is None else timestamp
+            self._latest = slot
+            self._writing = -1
+            self._cond.notify_all()
+        if self.on_commit is not None:
+            self.on_commit()
+
+    def read_latest(self, out=None, timeout=None):
+        """
+        Copies the newest unread frame and returns (frame, timestamp, sequence).
+
+        Blocks until a frame newer than the last one read is available. Returns
+        (None, None, None) on timeout or when the buffer is closed and drained.
+
+        Args:
+        - out (numpy array): Optional destination array to copy the frame into.
+        - timeout (float): Seconds to wait for a new frame (default waits forever).
+        """
+        with self._cond:
+            self._waiting += 1
+            try:
+                ready = self._cond.wait_for(
+                    lambda: self._closed or self._written > self._last_read_seq, timeout
+                )
+            finally:
+                self._waiting -= 1
+            if not ready or self._written == self._last_read_seq:
+                return None, None, None
+            now = time.monotonic()
+            if self._last_read_at is not None:
+                interval = now - self._last_read_at
+                self._read_interval = interval if self._read_interval is None else 0.8 * self._read_interval + 0.2 * interval
+            self._last_read_at = now
+            slot = self._latest
+            seq = int(self.sequence[slot])
+            timestamp = float(self.timestamps[slot])
+            self.dropped_frames += seq - self._last_read_seq - 1
+            self._last_read_seq = seq
+            self._reading = slot
+
+        # The writer never picks a slot that is being read, so copy outside the lock
+        if out is None:
+            frame = self.frames[slot].copy()
+        else:
+            np.copyto(out, self.frames[slot])
+            frame = out
+
+        with self._cond:
+            self._reading = -1
+        return frame, timestamp, seq
+
+    def wants_frame(self, horizon, now=None):
+        """
+        Returns True when a frame committed now is likely to be read before the next one.
+
+        Used by the writer to skip decoding frames that would only be
+        overwritten: that is the case when nobody is waiting and, at the
+        reader's usual pace, its next read is more than `horizon` seconds away.
+        """
+        with self._cond:
+            if self._waiting or self._read_interval is None:
+                return True
+            now = time.monotonic() if now is None else now
+            return self._last_read_at + self._read_interval - now <= horizon
+
+    def close(self):
+        """Wakes up the reader; no further frames will be written."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self.on_commit is not None:
+            self.on_commit()
+
+    def reallocate(self, frame_shape):
+        """Changes the slot shape; only valid before the first frame is written."""
+        with self._cond:
+            if self._written:
+                raise RuntimeError("Cannot reallocate a FrameRingBuffer that already holds frames")
+            self.frame_shape = tuple(frame_shape)
+            self.frames = np.zeros((self.capacity,) + self.frame_shape, dtype=self.frames.dtype)
+
+    @property
+    def frames_written(self):
+        return self._written
+
+    @property
+    def pending(self):
+        """Number of frames written since the last read (queue depth seen by the reader)."""
+        return self._written - self._last_read_seq
+
+    @property
+    def closed(self):
+        return self._closed
+
+
+class CaptureWorker(threading.Thread):
+    """
+    Dedicated capture thread: reads frames from an OpenCV source as fast as the
+    source delivers them and resizes them straight into a FrameRingBuffer.
+
+    Live sources are reopened with jittered exponential backoff when a read
+    fails, so a network hiccup costs a few frames instead of the stream. Every
+    frame is grabbed to keep the connection drained, but frames the reader
+    will not take before the next one arrives are never decoded.
+    """
+
+    def __init__(self, source, frame_size=None, ring_size=None, realtime=None, native=False,
+                 reconnect=None, skip_decode=None, opener=None):
+        """
+        Args:
+        - source (int or str): Camera index, RTSP URL or video file path.
+        - frame_size (tuple): Output (width, height) of every frame (default is settings.CAPTURE_FRAME_SIZE).
+        - ring_size (int): Number of ring slots (default is settings.CAPTURE_RING_SIZE).
+        - realtime (bool): Pace file sources at their native FPS (default is True for files).
+        - native (bool): Keep the source resolution; frames are decoded straight into the ring.
+        - reconnect (bool): Reopen the source after a failed read (default is True for live sources).
+        - skip_decode (bool): Skip decoding frames that would be dropped (default is settings.CAPTURE_SKIP_DECODE).
+        - opener (callable): Returns a cv2.VideoCapture-like object for the source (default is cv2.VideoCapture).
+        """
+        super().__init__(daemon=True)
+        self.source = source
+        self.native = native
+        self.frame_size = frame_size or settings.CAPTURE_FRAME_SIZE
+        width, height = self.frame_size
+        self.ring = FrameRingBuffer(ring_size or settings.CAPTURE_RING_SIZE, (height, width, 3))
+        if realtime is None:
+            realtime = is_file_source(source)
+        self.realtime = realtime
+        self.reconnect = not is_file_source(source) if reconnect is None else reconnect
+        self.skip_decode = settings.CAPTURE_SKIP_DECODE if skip_decode is None else skip_decode
+        self.opener = opener or cv2.VideoCapture
+        self.source_fps = 0.0
+        self.frames_captured = 0
+        self.frames_skipped = 0
+        self.read_failures = 0
+        self.reconnects = 0
+        self.reconnect_seconds = 0.0
+        self.last_reconnect_seconds = 0.0
+        self._stop_event = threading.Event()
+        self._first_frame_event = threading.Event()
+        self._first_frame = None
+        self._raw = None
+        self._grab_interval = 0.0
+
+    def run(self):
+        lost_at = None
+        attempt = 0
+        try:
+            while not self._stop_event.is_set():
+                capture = self.opener(self.source)
+                if not capture.isOpened() and self.reconnect:
+                    capture.release()
+                    if lost_at is None:
+                        lost_at = time.monotonic()
+                    # Full backoff times a random factor so cameras dropped together do not reconnect in lockstep
+                    delay = min(settings.CAPTURE_RECONNECT_BASE * 2 ** attempt, settings.CAPTURE_RECONNECT_MAX)
+                    attempt += 1
+                    self._stop_event.wait(delay * random.uniform(0.5, 1.0))
+                    continue
+                if lost_at is not None:
+                    self.last_reconnect_seconds = time.monotonic() - lost_at
+                    self.reconnect_seconds += self.last_reconnect_seconds
+                    self.reconnects += 1
+                    print(f"Reconnected to {self.source} after {self.last_reconnect_seconds:.1f}s")
+                    lost_at = None
+                attempt = 0
+                try:
+                    self._read_frames(capture)
+                finally:
+                    capture.release()
+                if not self.reconnect or self._stop_event.is_set():
+                    break
+                lost_at = time.monotonic()
+                print(f"Lost {self.source}, reconnecting")
+        finally:
+            self.ring.close()
+            self._first_frame_event.set()
+
+    def _read_frames(self, capture):
+        """Reads from one open connection until a read fails or the worker is stopped."""
+        self.source_fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+        period = 1.0 / self.source_fps if self.realtime and self.source_fps > 0 else 0.0
+        if self.native and not self.ring.frames_written:
+            width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            if width and height:
+                self.frame_size = (width, height)
+                self.ring.reallocate((height, width, 3))
+        next_deadline = time.monotonic()
+        last_grab = None
+        skipped_in_row = 0
+        camera = str(self.source)
+        while not self._stop_event.is_set():
+            grab_started = time.monotonic()
+            if not capture.grab():
+                self.read_failures += 1
+                return
+            timestamp = time.monotonic()
+            metrics.observe('capture', timestamp - grab_started, camera)
+            if last_grab is not None:
+                self._grab_interval = 0.9 * self._grab_interval + 0.1 * (timestamp - last_grab)
+            last_grab = timestamp
+
+            horizon = period or self._grab_interval
+            if (self.skip_decode and skipped_in_row < settings.CAPTURE_MAX_SKIP
+                    and not self.ring.wants_frame(horizon, timestamp)):
+                skipped_in_row += 1
+                self.frames_skipped += 1
+            else:
+                skipped_in_row = 0
+                if self.native:
+                    slot, dst = self.ring.begin_write()
+                    with metrics.time('decode', camera):
+                        ret, raw = capture.retrieve(dst)
+                    if ret and raw is not dst:
+                        cv2.resize(raw, self.frame_size, dst=dst)  # stream changed size mid-way
+                else:
+                    with metrics.time('decode', camera):
+                        ret, raw = capture.retrieve(self._raw)
+                if not ret:
+                    self.read_failures += 1
+                    return
+                if not self.native:
+                    self._raw = raw
+                    slot, dst = self.ring.begin_write()
+                    with metrics.time('resize', camera):
+                        cv2.resize(raw, self.frame_size, dst=dst)
+                if self._first_frame is None:
+                    self._first_frame = dst.copy()
+                    self._first_frame_event.set()
+                self.ring.commit_write(slot, timestamp)
+                self.frames_captured += 1
+
+            if period:
+                next_deadline += period
+                delay = next_deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_deadline = time.monotonic()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def read_latest(self, out=None, timeout=None):
+        return self.ring.read_latest(out=out, timeout=timeout)
+
+    def first_frame(self, timeout=None):
+        """Returns the first frame of the stream (a private copy), or None if none arrived in time."""
+        self._first_frame_event.wait(timeout)
+        return self._first_frame
+
+    def stats(self):
+        """Capture, decode-skip and reconnect counters."""
+        grabbed = self.frames_captured + self.frames_skipped
+        return {
+            'frames_captured': self.frames_captured,
+            'frames_skipped': self.frames_skipped,
+            'decode_skip_ratio': self.frames_skipped / grabbed if grabbed else 0.0,
+            'dropped_frames': self.ring.dropped_frames,
+            'read_failures': self.read_failures,
+            'reconnects': self.reconnects,
+            'reconnect_seconds': self.reconnect_seconds,
+            'last_reconnect_seconds': self.last_reconnect_seconds,
+        }
+
+
+class StreamManager:
+    """
+    Keeps one long-lived CaptureWorker per camera and shares it between its users.
+
+    Polygon setup takes the stream's first frame and detection reads the live
+    frames from the same connection, instead of each opening the camera. The
+    worker is stopped when its last user releases it. A ring has a single
+    reader, so only one user per stream should call `read_latest`.
+    """
+
+    def __init__(self, **worker_kwargs):
+        """
+        Args:
+        - worker_kwargs: Extra CaptureWorker arguments used for every stream (e.g. opener).
+        """
+        self.worker_kwargs = worker_kwargs
+        self._workers = {}
+        self._users = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(source, native):
+        # 0, '0' and a Path and its string are the same stream
+        source = str(source)
+        return (int(source) if source.isdigit() else source), native
+
+    def acquire(self, source, native=False):
+        """Returns the running worker for a source, starting it on first use."""
+        key = self._key(source, native)
+        with self._lock:
+            worker = self._workers.get(key)
+            if worker is None or not worker.is_alive():
+                worker = CaptureWorker(source, native=native, **self.worker_kwargs)
+                worker.start()
+                self._workers[key] = worker
+                self._users[key] = 0
+            self._users[key] += 1
+            return worker
+
+    def release(self, source, native=False):
+        """Drops one user of a source; the last one stops its worker."""
+        key = self._key(source, native)
+        with self._lock:
+            if key not in self._workers:
+                return
+            self._users[key] -= 1
+            if self._users[key] > 0:
+                return
+            worker = self._workers.pop(key)
+            del self._users[key]
+        worker.stop()
+        worker.join()
+
+    def first_frame(self, source, timeout=None, native=False):
+        """
+        Returns the first frame of a source (a private copy), or None if none arrived in time.
+
+        Uses the running connection when detection already holds one, otherwise
+        opens the stream just for this frame.
+        """
+        worker = self.acquire(source, native)
+        try:
+            return worker.first_frame(timeout)
+        finally:
+            self.release(source, native)
+
+    def stats(self):
+        with self._lock:
+            return {key[0]: worker.stats() for key, worker in self._workers.items()}
+
+    def close(self):
+        with self._lock:
+            workers = list(self._workers.values())
+            self._workers.clear()
+            self._users.clear()
+        for worker in workers:
+            worker.stop()
+        for worker in workers:
+            worker.join()
+
+
+class StreamEmulator:
+    """
+    File-backed stand-in for a flaky network camera, usable as a CaptureWorker `opener`.
+
+    The file is looped and paced at its native FPS like a live stream. Every
+    `drop_every` frames the connection fails and new connections are refused
+    for `outage` seconds, so reconnect handling can be exercised without a
+    camera or RTSP server.
+    """
+
+    def __init__(self, path, drop_every=0, outage=0.0):
+        self.path = str(path)
+        self.drop_every = drop_every
+        self.outage = outage
+        self.opens = 0
+        self._down_until = 0.0
+
+    def __call__(self, source=None):
+        self.opens += 1
+        return _EmulatedCapture(self, time.monotonic() >= self._down_until)
+
+    def _drop(self):
+        self._down_until = time.monotonic() + self.outage
+
+
+class _EmulatedCapture:
+    def __init__(self, emulator, available):
+        self.emulator = emulator
+        self.capture = cv2.VideoCapture(emulator.path) if available else None
+        self.fps = (self.capture.get(cv2.CAP_PROP_FPS) or 25.0) if available else 0.0
+        self.frames = 0
+        self.next_frame_at = time.monotonic()
+
+    def isOpened(self):
+        return self.capture is not None and self.capture.isOpened()
+
+    def get(self, prop):
+        return self.capture.get(prop) if self.capture is not None else 0.0
+
+    def grab(self):
+        if not self.isOpened():
+            return False
+        if self.emulator.drop_every and self.frames >= self.emulator.drop_every:
+            self.emulator._drop()
+            self.release()
+            return False
+        delay = self.next_frame_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_frame_at = max(self.next_frame_at + 1.0 / self.fps, time.monotonic() - 1.0)
+        if not self.capture.grab():
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)  # loop like a live stream
+            if not self.capture.grab():
+                return False
+        self.frames += 1
+        return True
+
+    def retrieve(self, image=None):
+        return self.capture.retrieve(image)
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def release(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+
+# Shared camera connections for the GUI and helper entry points
+streams = StreamManager()
+
+
+class LatencyTracker:
+    """Rolling end-to-end latency statistics (capture timestamp to display hand-off)."""
+
+    def __init__(self, window=300):
+        self.samples = deque(maxlen=window)
+        self.max_latency = 0.0
+
+    def add(self, capture_timestamp, now=None):
+        latency = (time.monotonic() if now is None else now) - capture_timestamp
+        self.samples.append(latency)
+        if latency > self.max_latency:
+            self.max_latency = latency
+        return latency
+
+    def stats(self):
+        if not self.samples:
+            return {'latency_mean_ms': 0.0, 'latency_p95_ms': 0.0, 'latency_max_ms': 0.0}
+        values = np.fromiter(self.samples, dtype=np.float64)
+        return {
+            'latency_mean_ms': float(values.mean() * 1000),
+            'latency_p95_ms': float(np.percentile(values, 95) * 1000),
+            'latency_max_ms': self.max_latency * 1000,
+        }
+
+
+def is_file_source(source):
+    """Returns True when the source is a video file rather than a camera index or network stream."""
+    if isinstance(source, int):
+        return False
+    source = str(source)
+    return not (source.isdigit() or '://' in source)
@@ -0,0 +1,526 @@
+import argparse
+import json
+import os
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+import settings
+
+MAGIC = b'DETLOG01'
+FORMAT_VERSION = 1
+
+# Record flags
+IN_ZONE = 1
+BREACHING = 2
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('record_size', '<u4'),
+    ('capacity', '<u8'),
+    ('count', '<u8'),
+    ('first_time', '<f8'),
+    ('last_time', '<f8'),
+    ('sealed', 'u1'),
+    ('reserved', 'V15'),
+])
+
+# One detection, 48 bytes; `zones` is a bitmask over the camera's zone names (zones.json)
+RECORD_DTYPE = np.dtype([
+    ('time', '<f8'),
+    ('frame', '<u4'),
+    ('track_id', '<i4'),
+    ('x1', '<f4'),
+    ('y1', '<f4'),
+    ('x2', '<f4'),
+    ('y2', '<f4'),
+    ('confidence', '<f4'),
+    ('zone_score', '<f4'),
+    ('zones', '<u4'),
+    ('class_id', '<u2'),
+    ('flags', '<u2'),
+])
+MAX_ZONES = 32
+
+
+def _epoch(value):
+    """Accepts None, UNIX seconds, a datetime or an ISO string ('2024-11-12 14:00')."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
+
+class SegmentIndex:
+    """
+    Secondary indexes of one segment, built incrementally from its records.
+
+    - A sparse time index: the time of every `stride`-th record. Records are
+      in time order, so a time range is found by searching this small array
+      and then one stride of the time column.
+    - Track index: track ID -> ascending record positions.
+    - Zone index: zone bit -> ascending record positions.
+    """
+
+    def __init__(self, stride=None):
+        self.stride = stride or settings.DETLOG_INDEX_STRIDE
+        self.indexed = 0
+        self.sparse_times = np.empty(0)
+        self._tracks = {}
+        self._zones = [[] for _ in range(MAX_ZONES)]
+
+    def update(self, records):
+        """Indexes the records appended since the last update."""
+        start, end = self.indexed, len(records)
+        if end <= start:
+            return
+        new = records[start:end]
+        first = -(-start // self.stride) * self.stride
+        if first < end:
+            self.sparse_times = np.concatenate([self.sparse_times, records['time'][first:end:self.stride]])
+
+        track_ids = new['track_id']
+        tracked = np.flatnonzero(track_ids >= 0)
+        if len(tracked):
+            order = tracked[np.argsort(track_ids[tracked], kind='stable')]
+            ids, starts = np.unique(track_ids[order], return_index=True)
+            for track_id, positions in zip(ids.tolist(), np.split(order + start, starts[1:])):
+                self._tracks.setdefault(track_id, []).append(positions)
+
+        bits = new['zones']
+        present = int(np.bitwise_or.reduce(bits)) if len(bits) else 0
+        for bit in range(MAX_ZONES):
+            if present >> bit & 1:
+                self._zones[bit].append(np.flatnonzero(bits & (1 << bit)) + start)
+        self.indexed = end
+
+    @staticmethod
+    def _joined(parts):
+        if not parts:
+            return np.empty(0, dtype=np.intp)
+        if len(parts) > 1:
+            parts[:] = [np.concatenate(parts)]
+        return parts[0]
+
+    def track_positions(self, track_id):
+        return self._joined(self._tracks.get(int(track_id), []))
+
+    def zone_positions(self, bit):
+        return self._joined(self._zones[bit])
+
+    def time_range(self, times, start=None, end=None):
+        """Returns the [lo, hi) record positions with start <= time < end."""
+        lo = 0 if start is None else self._search(times, start)
+        hi = len(times) if end is None else self._search(times, end)
+        return lo, hi
+
+    def _search(self, times, value):
+        block = int(np.searchsorted(self.sparse_times, value, side='left'))
+        lo = max(block - 1, 0) * self.stride
+        hi = min(block * self.stride, len(times)) if block < len(self.sparse_times) else len(times)
+        return lo + int(np.searchsorted(times[lo:hi], value, side='left'))
+
+    def save(self, path):
+        track_ids = np.array(sorted(self._tracks), dtype=np.int64)
+        tracks = [self.track_positions(track_id) for track_id in track_ids.tolist()]
+        zones = [self.zone_positions(bit) for bit in range(MAX_ZONES)]
+        np.savez(
+            path,
+            stride=self.stride, indexed=self.indexed, sparse_times=self.sparse_times,
+            track_ids=track_ids, track_offsets=np.cumsum([0] + [len(p) for p in tracks]),
+            track_positions=np.concatenate(tracks) if tracks else np.empty(0, dtype=np.intp),
+            zone_offsets=np.cumsum([0] + [len(p) for p in zones]),
+            zone_positions=np.concatenate(zones),
+        )
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        index = cls(int(data['stride']))
+        index.indexed = int(data['indexed'])
+        index.sparse_times = data['sparse_times']
+        offsets, positions = data['track_offsets'], data['track_positions']
+        for i, track_id in enumerate(data['track_ids'].tolist()):
+            index._tracks[track_id] = [positions[offsets[i]:offsets[i + 1]]]
+        offsets, positions = data['zone_offsets'], data['zone_positions']
+        index._zones = [[positions[offsets[bit]:offsets[bit + 1]]] for bit in range(MAX_ZONES)]
+        return index
+
+
+class Segment:
+    """
+    One file of fixed-size records behind a 64-byte header, memory-mapped.
+
+    A writable segment is preallocated to its full capacity (sparse on disk)
+    and the header's record count is only advanced after the records are
+    written, so a reader or a crash never sees half a record. Sealing trims
+    the file to the records actually written and saves the indexes next to it.
+    """
+
+    def __init__(self, path, capacity=None, writable=False):
+        """
+        Args:
+        - path (Path): Segment file; created when it does not exist and `writable` is set.
+        - capacity (int): Records in a new segment (default: settings.DETLOG_SEGMENT_MB worth).
+        - writable (bool): Map the file for appending; readers map it read-only.
+        """
+        self.path = Path(path)
+        self.writable = writable
+        if writable and not self.path.exists():
+            capacity = capacity or settings.DETLOG_SEGMENT_MB * 2 ** 20 // RECORD_DTYPE.itemsize
+            with open(self.path, 'wb') as f:
+                f.truncate(HEADER_DTYPE.itemsize + capacity * RECORD_DTYPE.itemsize)
+            header = np.memmap(self.path, dtype=HEADER_DTYPE, mode='r+', shape=(1,))
+            header[0] = (MAGIC, FORMAT_VERSION, RECORD_DTYPE.itemsize, capacity, 0, np.nan, np.nan, 0, b'')
+            header.flush()
+            del header
+        self._open()
+        self._index = None
+
+    @property
+    def index_path(self):
+        return self.path.with_suffix('.idx.npz')
+
+    def _open(self):
+        header = np.memmap(self.path, dtype=HEADER_DTYPE, mode='r', shape=(1,))
+        if header['magic'][0] != MAGIC or header['record_size'][0] != RECORD_DTYPE.itemsize:
+            raise ValueError(f"{self.path} is not a version {FORMAT_VERSION} detection log segment")
+        self.sealed = bool(header['sealed'][0])
+        mode = 'r+' if self.writable and not self.sealed else 'r'
+        self.header = np.memmap(self.path, dtype=HEADER_DTYPE, mode=mode, shape=(1,))
+        capacity = int(self.header['capacity'][0])
+        self._records = np.memmap(self.path, dtype=RECORD_DTYPE, mode=mode, offset=HEADER_DTYPE.itemsize,
+                                  shape=(capacity,)) if capacity else np.empty(0, dtype=RECORD_DTYPE)
+
+    @property
+    def count(self):
+        return int(self.header['count'][0])
+
+    @property
+    def capacity(self):
+        return int(self.header['capacity'][0])
+
+    @property
+    def first_time(self):
+        return float(self.header['first_time'][0])
+
+    @property
+    def last_time(self):
+        return float(self.header['last_time'][0])
+
+    @property
+    def records(self):
+        """The written records: a read-only view of the mapped file, nothing is copied."""
+        return self._records[:self.count]
+
+    def append(self, batch):
+        """Writes as many records of `batch` as fit; returns how many were written."""
+        count = self.count
+        written = min(len(batch), self.capacity - count)
+        if written <= 0:
+            return 0
+        self._records[count:count + written] = batch[:written]
+        if count == 0:
+            self.header['first_time'] = batch['time'][0]
+        self.header['last_time'] = batch['time'][written - 1]
+        self.header['count'] = count + written
+        return written
+
+    @property
+    def index(self):
+        # Loaded on first use: queries skip most sealed segments by their header time span
+        if self._index is None:
+            self._index = SegmentIndex.load(self.index_path) if self.sealed and self.index_path.exists() \
+                else SegmentIndex()
+        return self._index
+
+    def indexed(self):
+        """Returns the index, catching up on records appended since the last query."""
+        if not self.sealed or self.index.indexed < self.count:
+            self.index.update(self.records)
+        return self.index
+
+    def seal(self):
+        count = self.count
+        self.index.update(self.records)
+        self.index.save(self.index_path)
+        self.header['capacity'] = count
+        self.header['sealed'] = 1
+        self._records.flush()
+        self.header.flush()
+        del self._records, self.header
+        os.truncate(self.path, HEADER_DTYPE.itemsize + count * RECORD_DTYPE.itemsize)
+        self._open()
+
+    def flush(self):
+        if not self.sealed:
+            self._records.flush()
+            self.header.flush()
+
+
+def _slug(camera):
+    slug = re.sub(r'[^A-Za-z0-9_.-]+', '-', str(camera)).strip('-') or 'default'
+    return f'camera-{slug}' if str(camera).isdigit() else slug
+
+
+class DetectionLog:
+    """
+    Append-only per-camera detection log in size-rotated, memory-mapped segments.
+
+    Layout: settings.DETLOG_DIR/<camera>/000001.det, 000002.det, ... plus an
+    .idx.npz of indexes per sealed segment and zones.json, which assigns
+    every zone name a stable bit of the `zones` bitmask.
+
+    Queries only touch the segments whose time span overlaps the range, and
+    within a segment only the pages the indexes point at. A pure time-range
+    query returns views of the mapped files (no copy); track and zone queries
+    gather just the matching rows. Timestamps are kept non-decreasing per
+    camera, so a wall clock stepping back cannot break the time index.
+    One process writes a camera's log; any number may read it.
+    """
+
+    def __init__(self, camera, directory=None, writable=False, segment_records=None):
+        """
+        Args:
+        - camera: Camera index, name or stream URL.
+        - directory (Path): Root of all logs (default is settings.DETLOG_DIR).
+        - writable (bool): Open for appending (readers pass False).
+        - segment_records (int): Records per segment before rotating (default: settings.DETLOG_SEGMENT_MB worth).
+        """
+        self.camera = camera
+        self.directory = Path(directory or settings.DETLOG_DIR) / _slug(camera)
+        self.writable = writable
+        self.segment_records = segment_records
+        if writable:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        zones_file = self.directory / 'zones.json'
+        self.zone_names = json.loads(zones_file.read_text())['names'] if zones_file.exists() else []
+        self.segments = [Segment(path, writable=writable) for path in sorted(self.directory.glob('*.det'))]
+        self._frame = 0
+        self._last_time = self.segments[-1].last_time if self.segments and self.segments[-1].count else -np.inf
+
+    # Writing
+
+    def zone_bit(self, name):
+        """Returns the bit of a zone name, assigning the next free one to a new name."""
+        if name not in self.zone_names:
+            if not self.writable:
+                raise KeyError(f"Zone {name!r} was never logged for camera {self.camera}")
+            if len(self.zone_names) >= MAX_ZONES:
+                raise ValueError(f"A detection log holds at most {MAX_ZONES} zones")
+            self.zone_names.append(name)
+            temporary = self.directory / 'zones.tmp'
+            temporary.write_text(json.dumps({'names': self.zone_names}))
+            temporary.replace(self.directory / 'zones.json')
+        return self.zone_names.index(name)
+
+    def _active(self):
+        segment = self.segments[-1] if self.segments else None
+        if segment is None or segment.sealed or segment.count >= segment.capacity:
+            if segment is not None and not segment.sealed:
+                segment.seal()
+            number = int(self.segments[-1].path.stem) + 1 if self.segments else 1
+            segment = Segment(self.directory / f'{number:06d}.det', self.segment_records, writable=True)
+            self.segments.append(segment)
+            self._apply_retention()
+        return segment
+
+    def _apply_retention(self):
+        if settings.DETLOG_MAX_SEGMENTS is None:
+            return
+        while len(self.segments) > settings.DETLOG_MAX_SEGMENTS:
+            oldest = self.segments.pop(0)
+            oldest.path.unlink()
+            oldest.index_path.unlink(missing_ok=True)
+
+    def append(self, timestamp, xyxy, confidence=None, class_id=None, track_id=None, zones=None,
+               zone_score=None, flags=None, frame=None):
+        """
+        Appends the detections of one frame.
+
+        Args:
+        - timestamp (float): UNIX time of the frame, or (N,) times when importing many frames at once.
+        - xyxy (numpy array): (N, 4) boxes.
+        - confidence, class_id, track_id (numpy array): (N,) per detection; track_id -1 is untracked.
+        - zones (numpy array): (N,) zone bitmasks (see zone_bit).
+        - zone_score (numpy array): (N,) highest zone IoU of each detection.
+        - flags (numpy array): (N,) IN_ZONE / BREACHING bits.
+        - frame (int): Frame number (default: counts appended frames).
+        """
+        xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        count = len(xyxy)
+        self._frame = self._frame + 1 if frame is None else frame
+        if not count:
+            return
+        timestamp = np.maximum.accumulate(np.maximum(np.broadcast_to(np.asarray(timestamp, dtype=np.float64),
+                                                                     (count,)), self._last_time))
+        self._last_time = float(timestamp[-1])
+
+        batch = np.empty(count, dtype=RECORD_DTYPE)
+        batch['time'] = timestamp
+        batch['frame'] = self._frame
+        batch['track_id'] = -1 if track_id is None else track_id
+        batch['x1'], batch['y1'], batch['x2'], batch['y2'] = xyxy.T
+        batch['confidence'] = 0 if confidence is None else confidence
+        batch['zone_score'] = 0 if zone_score is None else zone_score
+        batch['zones'] = 0 if zones is None else zones
+        batch['class_id'] = 0 if class_id is None else class_id
+        batch['flags'] = 0 if flags is None else flags
+        while len(batch):
+            batch = batch[self._active().append(batch):]
+
+    def append_detections(self, detections, zone_iou=None, zone_names=None, timestamp=None, breaching=None,
+                          in_danger=None):
+        """
+        Appends a supervision Detections object, deriving zone bits from a (N, Z) zone IoU matrix.
+
+        Args:
+        - detections (sv.Detections): One frame's detections.
+        - zone_iou (numpy array): (N, Z) IoU with each zone, e.g. ZoneSet.iou.
+        - zone_names (list): Names of the Z zones.
+        - timestamp (float): UNIX time of the frame (default: now).
+        - breaching (numpy array): (N,) bool, detections the breach engine considers breaching.
+        - in_danger (numpy array): (N,) bool, detections past the danger distance (see homography.GroundLUT).
+        """
+        count = len(detections.xyxy)
+        zones = flags = zone_score = None
+        if zone_iou is not None and count and zone_iou.shape[1]:
+            inside = zone_iou > settings.BREACH_IOU_THRESHOLD
+            bits = np.array([1 << self.zone_bit(name) for name in zone_names], dtype=np.uint32)
+            zones = (inside * bits).sum(axis=1).astype(np.uint32)
+            zone_score = zone_iou.max(axis=1)
+            flags = np.where(inside.any(axis=1), IN_ZONE, 0)
+        if in_danger is not None:
+            flags = (0 if flags is None else flags) | np.where(in_danger, IN_ZONE, 0)
+        if breaching is not None:
+            flags = (0 if flags is None else flags) | np.where(breaching, BREACHING, 0)
+        self.append(time.time() if timestamp is None else timestamp, detections.xyxy, detections.confidence,
+                    detections.class_id, getattr(detections, 'tracker_id', None), zones, zone_score, flags)
+
+    def flush(self):
+        if self.segments:
+            self.segments[-1].flush()
+
+    def close(self):
+        """Seals the active segment so the next run starts a new one."""
+        if self.writable and self.segments and not self.segments[-1].sealed:
+            self.segments[-1].seal()
+
+    # Reading
+
+    def refresh(self):
+        """Picks up segments another process created since this log was opened."""
+        known = {segment.path for segment in self.segments}
+        for i, segment in enumerate(self.segments):
+            if not segment.sealed and segment.path.exists():
+                # Reopen: the writer may have sealed (and trimmed) it since
+                self.segments[i] = Segment(segment.path)
+        self.segments = [segment for segment in self.segments if segment.path.exists()]
+        self.segments += [Segment(path) for path in sorted(self.directory.glob('*.det')) if path not in known]
+        zones_file = self.directory / 'zones.json'
+        if zones_file.exists():
+            self.zone_names = json.loads(zones_file.read_text())['names']
+
+    def iter_query(self, start=None, end=None, track_id=None, zone=None, flags=0):
+        """
+        Yields the matching records segment by segment, oldest first.
+
+        Args:
+        - start, end: Time range [start, end) as UNIX seconds, datetime or ISO string.
+        - track_id (int): Only this track.
+        - zone (str): Only detections inside this zone.
+        - flags (int): Only records with all these flag bits set, e.g. BREACHING.
+        """
+        start, end = _epoch(start), _epoch(end)
+        bit = None
+        if zone is not None:
+            if zone not in self.zone_names:
+                return
+            bit = self.zone_names.index(zone)
+        for segment in self.segments:
+            if not segment.count:
+                continue
+            if (end is not None and segment.first_time >= end) or (start is not None and segment.last_time < start):
+                continue
+            records = segment.records
+            index = segment.indexed()
+            lo, hi = index.time_range(records['time'], start, end)
+            if lo >= hi:
+                continue
+            if track_id is None and bit is None:
+                selected = records[lo:hi]
+            else:
+                positions = None
+                for candidates in ([index.track_positions(track_id)] if track_id is not None else []) + \
+                                  ([index.zone_positions(bit)] if bit is not None else []):
+                    candidates = candidates[np.searchsorted(candidates, lo):np.searchsorted(candidates, hi)]
+                    positions = candidates if positions is None else np.intersect1d(positions, candidates,
+                                                                                   assume_unique=True)
+                selected = records[positions]
+            if flags:
+                selected = selected[(selected['flags'] & flags) == flags]
+            if len(selected):
+                yield selected
+
+    def query(self, start=None, end=None, track_id=None, zone=None, flags=0):
+        """
+        Returns the matching records as one structured array (see iter_query for the filters).
+
+        When the result lies in a single segment and only the time range is
+        filtered, this is a view of the mapped file.
+        """
+        parts = list(self.iter_query(start, end, track_id, zone, flags))
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=RECORD_DTYPE)
+
+    def breaches(self, zone=None, start=None, end=None):
+        """Detections flagged as breaching (inside `zone` when given) in a time range."""
+        return self.query(start, end, zone=zone, flags=BREACHING)
+
+    def __len__(self):
+        return sum(segment.count for segment in self.segments)
+
+
+def to_dataframe(records):
+    """Converts query results to a pandas DataFrame with a datetime `time` column."""
+    import pandas as pd  # only needed for analysis
+
+    frame = pd.DataFrame(records)
+    frame['time'] = pd.to_datetime(frame['time'], unit='s')
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a camera's detection log")
+    parser.add_argument('camera', help="Camera index, name or stream URL")
+    parser.add_argument('--start', help="e.g. '2024-11-12 14:00'")
+    parser.add_argument('--end', help="e.g. '2024-11-12 15:00'")
+    parser.add_argument('--zone', help="Zone name")
+    parser.add_argument('--track', type=int, help="Track ID")
+    parser.add_argument('--breaching', action='store_true', help="Only detections flagged as breaching")
+    parser.add_argument('--csv', help="Write the matching detections to a CSV file")
+    args = parser.parse_args()
+
+    log = DetectionLog(args.camera)
+    started = time.perf_counter()
+    records = log.query(args.start, args.end, args.track, args.zone, BREACHING if args.breaching else 0)
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"{len(records)} of {len(log)} detections in {elapsed:.1f} ms "
+          f"({len(log.segments)} segments, zones {log.zone_names})")
+    if len(records):
+        tracks = np.unique(records['track_id'][records['track_id'] >= 0])
+        print(f"{datetime.fromtimestamp(records['time'][0])} .. {datetime.fromtimestamp(records['time'][-1])}, "
+              f"{len(tracks)} tracks")
+    if args.csv:
+        to_dataframe(records).to_csv(args.csv, index=False)
+        print(f"Saved {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
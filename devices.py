@@ -0,0 +1,494 @@
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+import cv2
+
+import settings
+from capture import is_file_source
+
+CAMERA = 'camera'
+STREAM = 'stream'
+SERIAL = 'serial'
+# USB vendor IDs of Arduino boards and of the USB-serial chips common on clones (CH340, FTDI, CP210x)
+ARDUINO_VIDS = {0x2341, 0x2A03, 0x1A86, 0x0403, 0x10C4}
+DEFAULT_PORTS = {'rtsp': 554, 'rtsps': 322, 'http': 80, 'https': 443}
+
+
+class Device:
+    """One camera index, network stream or serial port, with the capabilities found by its last probe."""
+
+    def __init__(self, kind, source, label=None, fingerprint=None):
+        """
+        Args:
+        - kind (str): CAMERA, STREAM or SERIAL.
+        - source (int or str): Camera index, stream URL or serial port name.
+        - label (str): Name shown in the GUI.
+        - fingerprint: Cheap identity of the device as enumerated; a change means it has to be probed again.
+        """
+        self.kind = kind
+        self.source = source
+        self.label = label or (f"Camera {source}" if kind == CAMERA else str(source))
+        self.fingerprint = fingerprint
+        self.available = False
+        self.error = None
+        # Camera and stream: width, height, fps, codec, backend. Serial: description, vid, arduino, baud, response
+        self.info = {}
+        self.probed_at = None
+        self.probe_seconds = None
+
+    @property
+    def key(self):
+        return f'{self.kind}:{self.source}'
+
+    def to_dict(self):
+        return {
+            'kind': self.kind, 'source': self.source, 'label': self.label, 'fingerprint': self.fingerprint,
+            'available': self.available, 'error': self.error, 'info': self.info,
+            'probed_at': self.probed_at, 'probe_seconds': self.probe_seconds,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        device = cls(data['kind'], data['source'], data.get('label'), data.get('fingerprint'))
+        device.available = data.get('available', False)
+        device.error = data.get('error')
+        device.info = data.get('info') or {}
+        device.probed_at = data.get('probed_at')
+        device.probe_seconds = data.get('probe_seconds')
+        return device
+
+    def __repr__(self):
+        state = 'available' if self.available else f'unavailable ({self.error})' if self.error else 'unavailable'
+        return f"Device({self.key!r}, {state}, {self.info})"
+
+
+def _call_with_timeout(func, timeout, *args):
+    """
+    Runs func(*args) on a daemon thread and returns its result, or raises TimeoutError.
+
+    Driver calls such as opening a missing camera cannot be interrupted, so a
+    call that overruns is abandoned rather than joined; being a daemon thread
+    it never keeps the program from exiting.
+    """
+    outcome = {}
+    done = threading.Event()
+
+    def target():
+        try:
+            outcome['value'] = func(*args)
+        except Exception as ex:
+            outcome['error'] = ex
+        finally:
+            done.set()
+
+    threading.Thread(target=target, daemon=True).start()
+    if not done.wait(timeout):
+        raise TimeoutError(f"no answer within {timeout:.1f}s")
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['value']
+
+
+def _open_capture(source, timeout=None):
+    if isinstance(source, str) and '://' in source and timeout:
+        # FFmpeg's own open/read timeouts end a dead stream sooner than the probe deadline
+        milliseconds = int(timeout * 1000)
+        try:
+            return cv2.VideoCapture(source, cv2.CAP_FFMPEG, [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, milliseconds,
+                                                             cv2.CAP_PROP_READ_TIMEOUT_MSEC, milliseconds])
+        except (TypeError, AttributeError, cv2.error):
+            pass  # OpenCV before 4.5.2
+    return cv2.VideoCapture(source)
+
+
+def probe_capture(source, opener=None, timeout=None):
+    """
+    Opens a camera index or stream URL and reads one frame.
+
+    Returns:
+    - info (dict): width, height, fps, codec and backend, or None when nothing answers.
+    """
+    capture = opener(source) if opener is not None else _open_capture(source, timeout)
+    try:
+        if not capture.isOpened() or not capture.grab():
+            return None
+        fourcc = int(capture.get(cv2.CAP_PROP_FOURCC) or 0)
+        codec = ''.join(chr((fourcc >> 8 * i) & 0xFF) for i in range(4)).strip('\x00 ') if fourcc > 0 else None
+        backend = capture.getBackendName() if hasattr(capture, 'getBackendName') else None
+        return {
+            'width': int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'fps': round(float(capture.get(cv2.CAP_PROP_FPS) or 0.0), 2) or None,
+            'codec': codec or None,
+            'backend': backend,
+        }
+    finally:
+        capture.release()
+
+
+def probe_serial(port, baud_rate=None, timeout=None, opener=None):
+    """
+    Opens a serial port and listens for the alarm sketch (arduinoalarm/sketch/sketch.ino).
+
+    Opening the port resets an Arduino, which then prints 'Start!' once it
+    has booted, so the port is read until a line the alarm understands
+    arrives or `timeout` runs out.
+
+    Returns:
+    - info (dict): baud, the first line heard ('response') and whether it came from the alarm sketch.
+    """
+    from alarm import parse_line
+    import serial
+
+    baud_rate = baud_rate or settings.ALARM_BAUD_RATE
+    timeout = settings.DEVICE_SERIAL_TIMEOUT if timeout is None else timeout
+    ser = (opener or serial.Serial)(port, baud_rate, timeout=0.1)
+    try:
+        buffer, response = b'', None
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            buffer += ser.read(64)
+            while b'\n' in buffer:
+                raw, buffer = buffer.split(b'\n', 1)
+                line = raw.decode(errors='replace').strip()
+                if not line:
+                    continue
+                response = response or line
+                if parse_line(line) is not None:
+                    return {'baud': baud_rate, 'response': line, 'alarm': True}
+        return {'baud': baud_rate, 'response': response, 'alarm': False}
+    finally:
+        ser.close()
+
+
+def _reachable(url, timeout):
+    """TCP connect to a stream's host, so a dead camera fails in milliseconds instead of an FFmpeg timeout."""
+    parsed = urlparse(url)
+    port = parsed.port or DEFAULT_PORTS.get(parsed.scheme)
+    if not parsed.hostname or port is None:
+        return True
+    try:
+        socket.create_connection((parsed.hostname, port), timeout=timeout).close()
+        return True
+    except OSError:
+        return False
+
+
+def _list_serial_ports():
+    from serial.tools import list_ports
+    return [(port.device, port.description, port.hwid, port.vid) for port in list_ports.comports()]
+
+
+class DeviceRegistry:
+    """
+    Cameras, network streams and serial ports found on this machine, probed concurrently and cached.
+
+    Every `refresh` first enumerates devices cheaply, without opening
+    anything: the /dev/video* nodes on Linux, the serial ports the OS
+    lists, and a TCP connect to every stream. Only devices that are new or
+    whose fingerprint changed (a camera replugged, a stream back up) are
+    probed, all at once, each with its own timeout; everything else is
+    served from the cache, which is kept in settings.DEVICE_CACHE across
+    runs. Where cameras cannot be enumerated (Windows, macOS) they are
+    re-probed once settings.DEVICE_CACHE_TTL has passed. `watch` repeats
+    the refresh in the background to pick up hotplugged devices.
+    """
+
+    def __init__(self, cameras=None, streams=None, serial=True, baud_rate=None, cache_path=None,
+                 camera_opener=None, serial_opener=None, port_lister=None, video_nodes=None, busy_ports=None):
+        """
+        Args:
+        - cameras (list): Camera indices to look for (default is range(settings.DEVICE_CAMERA_INDICES)).
+        - streams (dict): Name -> stream URL (default is the network streams in settings.CAMERA_SOURCES).
+        - serial (bool): Look for serial ports.
+        - baud_rate (int): Baud rate for the serial probe (default is settings.ALARM_BAUD_RATE).
+        - cache_path (str or Path): Capability cache file, False for none (default is settings.DEVICE_CACHE).
+        - camera_opener (callable): opener(source) returning a cv2.VideoCapture-like object, for tests.
+        - serial_opener (callable): opener(port, baud_rate, timeout) returning a serial.Serial-like object.
+        - port_lister (callable): Returns [(device, description, hwid, vid), ...] (default is pyserial's comports).
+        - video_nodes (callable): video_nodes(index) returns a fingerprint of the camera's device node or None
+          when it is absent; False when cameras cannot be enumerated (default: /dev/video* on Linux).
+        - busy_ports (callable): Returns the serial ports in use (e.g. by AlarmDispatcher), which are not probed.
+        """
+        self.camera_indices = list(range(settings.DEVICE_CAMERA_INDICES)) if cameras is None else list(cameras)
+        if streams is None:
+            streams = {name: url for name, url in settings.CAMERA_SOURCES.items() if not is_file_source(url)}
+        self.streams = dict(streams)
+        self.serial = serial
+        self.baud_rate = baud_rate or settings.ALARM_BAUD_RATE
+        self.cache_path = settings.DEVICE_CACHE if cache_path is None else cache_path
+        self.camera_opener = camera_opener
+        self.serial_opener = serial_opener
+        self.port_lister = port_lister or _list_serial_ports
+        if video_nodes is None:
+            video_nodes = _video_node if sys.platform.startswith('linux') else False
+        self.video_nodes = video_nodes
+        self.busy_ports = busy_ports
+        self.devices = {}
+        self.last_scan = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._watcher = None
+        self.load()
+
+    # Enumeration, without opening anything
+
+    def _enumerate(self):
+        found = []
+        for index in self.camera_indices:
+            fingerprint = self.video_nodes(index) if self.video_nodes else None
+            if self.video_nodes and fingerprint is None:
+                continue  # no device node, nothing to probe
+            found.append(Device(CAMERA, index, fingerprint=fingerprint))
+        if self.streams:
+            # Reachability is the streams' fingerprint: a camera coming back online gets probed again
+            timeout = min(settings.DEVICE_STREAM_TIMEOUT, 1.0)
+            reachable = {}
+            threads = [threading.Thread(target=lambda url=url: reachable.__setitem__(url, _reachable(url, timeout)),
+                                        daemon=True) for url in self.streams.values()]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(timeout + 0.5)
+            for name, url in self.streams.items():
+                found.append(Device(STREAM, url, name, fingerprint=reachable.get(url, False)))
+        if self.serial:
+            try:
+                ports = self.port_lister()
+            except Exception as ex:
+                print(f"Could not list serial ports: {ex}")
+                ports = []
+            for port, description, hwid, vid in ports:
+                device = Device(SERIAL, port, fingerprint=hwid)
+                device.info = {'description': description, 'vid': vid, 'arduino': vid in ARDUINO_VIDS}
+                found.append(device)
+        return found
+
+    def _needs_probe(self, device, cached, now, force):
+        if force or cached is None or cached.fingerprint != device.fingerprint:
+            return True
+        if device.kind == CAMERA and device.fingerprint is None:
+            # Cameras that cannot be enumerated are only re-checked once the cache entry expires
+            return now - (cached.probed_at or 0) > settings.DEVICE_CACHE_TTL
+        return False
+
+    # Probing
+
+    def _probe(self, device):
+        started = time.perf_counter()
+        probed = Device(device.kind, device.source, device.label, device.fingerprint)
+        probed.info = dict(device.info)
+        try:
+            if device.kind == SERIAL:
+                probed.info.update(probe_serial(device.source, self.baud_rate, opener=self.serial_opener))
+                probed.available = True
+            elif device.kind == STREAM and not device.fingerprint:
+                probed.error = 'unreachable'
+            else:
+                info = probe_capture(device.source, self.camera_opener, self._timeout(device))
+                probed.available = info is not None
+                probed.info.update(info or {})
+        except Exception as ex:
+            probed.error = str(ex) or type(ex).__name__
+        probed.probed_at = time.time()
+        probed.probe_seconds = time.perf_counter() - started
+        return probed
+
+    def _timeout(self, device):
+        return {CAMERA: settings.DEVICE_CAMERA_TIMEOUT, STREAM: settings.DEVICE_STREAM_TIMEOUT,
+                SERIAL: settings.DEVICE_SERIAL_TIMEOUT + 1.0}[device.kind]
+
+    def _probe_all(self, devices):
+        """Probes all devices at once; each gets its own deadline and overruns are reported as timed out."""
+        results = {}
+        done = {device.key: threading.Event() for device in devices}
+
+        def run(device):
+            results[device.key] = self._probe(device)
+            done[device.key].set()
+
+        started = time.monotonic()
+        for device in devices:
+            threading.Thread(target=run, args=(device,), daemon=True).start()
+        probed = []
+        for device in devices:
+            remaining = started + self._timeout(device) - time.monotonic()
+            if done[device.key].wait(max(remaining, 0.0)):
+                probed.append(results[device.key])
+            else:
+                timed_out = Device(device.kind, device.source, device.label, device.fingerprint)
+                timed_out.info = dict(device.info)
+                timed_out.error = f"timed out after {self._timeout(device):.1f}s"
+                timed_out.probed_at = time.time()
+                timed_out.probe_seconds = time.monotonic() - started
+                probed.append(timed_out)
+        return probed
+
+    def refresh(self, force=False):
+        """
+        Brings the registry up to date, probing only new and changed devices.
+
+        Args:
+        - force (bool): Probe every device, ignoring the cache.
+
+        Returns:
+        - changes (dict): Keys of the 'added', 'removed' and 'changed' devices.
+        """
+        started = time.perf_counter()
+        now = time.time()
+        found = self._enumerate()
+        busy = set(self.busy_ports() if self.busy_ports is not None else ())
+        with self._lock:
+            cached = dict(self.devices)
+        to_probe, keep = [], []
+        for device in found:
+            previous = cached.get(device.key)
+            if device.kind == SERIAL and device.source in busy:
+                # Opening a port the alarm holds would reset the board under it
+                device.available = True
+                device.info.update({key: value for key, value in (previous.info if previous else {}).items()
+                                    if key not in device.info})
+                device.probed_at = previous.probed_at if previous else None
+                keep.append(device)
+            elif self._needs_probe(device, previous, now, force):
+                to_probe.append(device)
+            else:
+                keep.append(previous)
+        enumerate_seconds = time.perf_counter() - started
+        probed = self._probe_all(to_probe) if to_probe else []
+
+        devices = {device.key: device for device in keep + probed}
+        changes = {
+            'added': sorted(key for key in devices if key not in cached),
+            'removed': sorted(key for key in cached if key not in devices),
+            'changed': sorted(device.key for device in probed if device.key in cached and (
+                cached[device.key].available != device.available or cached[device.key].info != device.info)),
+        }
+        with self._lock:
+            self.devices = devices
+            self.last_scan = {
+                'scan_seconds': time.perf_counter() - started,
+                'enumerate_seconds': enumerate_seconds,
+                'probed': len(probed),
+                'cached': len(keep),
+                'timed_out': sum(1 for device in probed if device.error and device.error.startswith('timed out')),
+                **{key: len(value) for key, value in changes.items()},
+            }
+        self.save()
+        return changes
+
+    # Queries
+
+    def cameras(self):
+        """Available camera indices and streams, cameras first."""
+        with self._lock:
+            devices = [d for d in self.devices.values() if d.kind in (CAMERA, STREAM) and d.available]
+        return sorted(devices, key=lambda d: (d.kind != CAMERA, str(d.source)))
+
+    def serial_ports(self):
+        """Serial ports, the ones answering as the alarm sketch first, then likely Arduinos."""
+        with self._lock:
+            devices = [d for d in self.devices.values() if d.kind == SERIAL]
+        return sorted(devices, key=lambda d: (not d.info.get('alarm'), not d.info.get('arduino'), str(d.source)))
+
+    def stats(self):
+        with self._lock:
+            return dict(self.last_scan, devices=len(self.devices),
+                        available=sum(1 for d in self.devices.values() if d.available))
+
+    # Hotplug
+
+    def watch(self, on_change=None, interval=None):
+        """
+        Refreshes now and then every `interval` seconds on a background thread.
+
+        Args:
+        - on_change (callable): Called with the changes dict whenever a device appeared, vanished or changed.
+        - interval (float): Seconds between checks (default is settings.DEVICE_POLL_INTERVAL).
+        """
+        interval = settings.DEVICE_POLL_INTERVAL if interval is None else interval
+
+        def run():
+            while not self._stop_event.is_set():
+                try:
+                    changes = self.refresh()
+                except Exception as ex:
+                    print(f"Device refresh failed: {ex}")
+                    changes = {}
+                if on_change is not None and any(changes.values()):
+                    on_change(changes)
+                self._stop_event.wait(interval)
+
+        self._stop_event.clear()
+        self._watcher = threading.Thread(target=run, daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=settings.DEVICE_STREAM_TIMEOUT)
+
+    # Cache
+
+    def save(self):
+        if not self.cache_path:
+            return
+        path = Path(self.cache_path)
+        with self._lock:
+            data = {'version': 1, 'devices': [device.to_dict() for device in self.devices.values()]}
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = path.with_suffix('.tmp')
+            temporary.write_text(json.dumps(data, indent=2))
+            temporary.replace(path)
+        except OSError as ex:
+            print(f"Could not save the device cache {path}: {ex}")
+
+    def load(self):
+        """Restores the last scan from the cache file, so the device lists are filled before any probe runs."""
+        if not self.cache_path or not Path(self.cache_path).exists():
+            return False
+        try:
+            data = json.loads(Path(self.cache_path).read_text())
+            devices = [Device.from_dict(item) for item in data.get('devices', [])]
+        except (OSError, ValueError, KeyError) as ex:
+            print(f"Ignoring the device cache {self.cache_path}: {ex}")
+            return False
+        with self._lock:
+            self.devices = {device.key: device for device in devices}
+        return True
+
+
+def _video_node(index):
+    """Fingerprint of /dev/video<index>, or None when there is no such node."""
+    try:
+        stat = os.stat(f'/dev/video{index}')
+    except OSError:
+        return None
+    return f'{stat.st_ino}:{stat.st_ctime_ns}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List the cameras, streams and serial ports on this machine")
+    parser.add_argument('--force', action='store_true', help="Probe every device, ignoring the cache")
+    parser.add_argument('--no-serial', action='store_true', help="Leave serial ports alone (probing resets Arduinos)")
+    args = parser.parse_args()
+
+    registry = DeviceRegistry(serial=not args.no_serial)
+    registry.refresh(force=args.force)
+    for device in sorted(registry.devices.values(), key=lambda d: d.key):
+        print(device)
+    stats = registry.stats()
+    print(f"Scan took {stats['scan_seconds'] * 1000:.0f} ms: {stats['probed']} probed, {stats['cached']} from cache, "
+          f"{stats['timed_out']} timed out")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import time
+
+import cv2
+import numpy as np
+from PyQt6.QtGui import QImage, QPixmap
+
+from metrics import metrics
+
+
+class StageTimer:
+    """Accumulates per-stage wall-clock time and buffer allocations for the display path."""
+
+    def __init__(self):
+        self.frames = 0
+        self.seconds = {}
+        self.allocations = 0
+        self.allocated_bytes = 0
+
+    def add(self, stage, seconds):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def allocated(self, array):
+        self.allocations += 1
+        self.allocated_bytes += array.nbytes
+
+    def report(self):
+        frames = max(self.frames, 1)
+        report = {f'{stage}_ms': total * 1000 / frames for stage, total in self.seconds.items()}
+        report['frames'] = self.frames
+        report['allocations'] = self.allocations
+        report['allocated_bytes'] = self.allocated_bytes
+        return report
+
+
+def fit_size(frame_width, frame_height, widget_width):
+    """
+    Returns the (width, height) a frame is scaled to inside the video label.
+
+    Same rule VideoWindow.update_frame always used: fit the frame inside a
+    square of 80% of the widget width, keeping the aspect ratio.
+    """
+    window_height = int(widget_width * 0.8)
+    window_width = int(widget_width * 0.8)
+
+    if window_height / frame_height < window_width / frame_width:
+        scale_factor = window_height / frame_height
+    else:
+        scale_factor = window_width / frame_width
+
+    return max(int(frame_width * scale_factor), 1), max(int(frame_height * scale_factor), 1)
+
+
+class DisplayConverter:
+    """
+    Turns BGR frames into QPixmaps for the video label with as few copies as possible.
+
+    The scaled output buffer is allocated once and reused through
+    `cv2.resize(dst=...)`; it is only reallocated when the frame or widget size
+    changes. The BGR data is handed to Qt as Format_BGR888, so no cvtColor pass
+    is needed. QPixmap.fromImage copies the pixels, so the buffer can be
+    overwritten by the next frame straight away.
+    """
+
+    def __init__(self, camera=None):
+        """
+        Args:
+        - camera: Label the stage timings are recorded under in `metrics`.
+        """
+        self.camera = camera
+        self.timer = StageTimer()
+        self._key = None
+        self._size = None
+        self._buffer = None
+
+    def _geometry(self, frame, widget_width):
+        key = (frame.shape[1], frame.shape[0], widget_width)
+        if key != self._key:
+            self._key = key
+            self._size = fit_size(frame.shape[1], frame.shape[0], widget_width)
+            width, height = self._size
+            if (width, height) == (frame.shape[1], frame.shape[0]):
+                self._buffer = None
+            else:
+                self._buffer = np.empty((height, width, 3), dtype=np.uint8)
+                self.timer.allocated(self._buffer)
+        return self._size
+
+    def scale(self, frame, widget_width):
+        """Returns the frame scaled for display, written into the reused output buffer."""
+        width, height = self._geometry(frame, widget_width)
+        if self._buffer is None:
+            return np.ascontiguousarray(frame)
+        return cv2.resize(frame, (width, height), dst=self._buffer)
+
+    def to_pixmap(self, frame, widget_width, draw=None):
+        """
+        Converts one BGR frame to a QPixmap scaled for a widget of the given width.
+
+        Args:
+        - frame (numpy array): BGR uint8 frame.
+        - widget_width (int): Current width of the video window.
+        - draw (callable): Optional draw(scaled_frame, scale) hook run on the display-resolution
+          frame before it is handed to Qt, e.g. OverlayRenderer.render.
+
+        Returns:
+        A QPixmap ready for QLabel.setPixmap.
+        """
+        start = time.perf_counter()
+        scaled = self.scale(frame, widget_width)
+        resized = time.perf_counter()
+        if draw is not None:
+            draw(scaled, scaled.shape[1] / frame.shape[1])
+        annotated = time.perf_counter()
+
+        height, width, _ = scaled.shape
+        image = QImage(scaled.data, width, height, scaled.strides[0], QImage.Format.Format_BGR888)
+        wrapped = time.perf_counter()
+
+        pixmap = QPixmap.fromImage(image)
+        done = time.perf_counter()
+
+        self.timer.frames += 1
+        self.timer.add('resize', resized - start)
+        if draw is not None:
+            self.timer.add('annotate', annotated - resized)
+        self.timer.add('qimage', wrapped - annotated)
+        self.timer.add('pixmap', done - wrapped)
+        metrics.observe('display_resize', resized - start, self.camera)
+        if draw is not None:
+            metrics.observe('annotate', annotated - resized, self.camera)
+        metrics.observe('qt_handoff', done - annotated, self.camera)
+        return pixmap
+
+    @property
+    def size(self):
+        return self._size
@@ -0,0 +1,205 @@
+import contextlib
+import sys
+
+import cv2
+import numpy as np
+
+import settings
+from metrics import metrics
+from utils import nms
+
+PERSON_CLASS = 0
+# Grey that ultralytics pads letterboxed images with
+PAD_VALUE = 114
+# One record per detection; results are views into preallocated arrays of this dtype
+DETECTION_DTYPE = np.dtype([('xyxy', np.float32, 4), ('confidence', np.float32), ('class_id', np.int32),
+                            ('tracker_id', np.int64)])
+
+
+class Detections(np.recarray):
+    """
+    Structured-array detections readable like `sv.Detections`.
+
+    `xyxy`, `confidence`, `class_id` and `tracker_id` are views of the record
+    fields, and `len()` and boolean indexing behave the same, so zone
+    scoring, the overlay, the detection log and the alert snapshots take
+    either. `tracker_id` is -1 until a tracker assigns IDs (see tracking.py).
+    """
+
+
+def raw_backend(model):
+    """
+    Returns the network behind an ultralytics model, or None before its first call.
+
+    This is the AutoBackend the predictor builds on its first call (after the
+    warm-up, see backends.warm_up). It takes the letterboxed (1, 3, H, W) input
+    for every export format and returns the raw (1, 4 + classes, anchors)
+    predictions.
+    """
+    return getattr(getattr(model, 'predictor', None), 'model', None)
+
+
+class _Layout:
+    """Letterbox geometry and input buffers for one frame size, input size and backend."""
+
+    def __init__(self, frame_shape, imgsz, stride, rectangular, device=None, half=False):
+        height, width = frame_shape[:2]
+        # Same rounding as ultralytics' LetterBox, so boxes match the general path to the pixel
+        self.ratio = min(imgsz / height, imgsz / width)
+        new_width, new_height = int(round(width * self.ratio)), int(round(height * self.ratio))
+        pad_width, pad_height = imgsz - new_width, imgsz - new_height
+        if rectangular:
+            # PyTorch models take any multiple of the stride, so only pad up to that
+            pad_width, pad_height = pad_width % stride, pad_height % stride
+        left, top = int(round(pad_width / 2 - 0.1)), int(round(pad_height / 2 - 0.1))
+        right, bottom = int(round(pad_width / 2 + 0.1)), int(round(pad_height / 2 + 0.1))
+        self.size = (new_width, new_height)
+        self.offset = np.array([left, top, left, top], dtype=np.float32)
+        self.limits = np.array([width, height, width, height], dtype=np.float32)
+        shape = (1, 3, new_height + top + bottom, new_width + left + right)
+
+        torch = sys.modules.get('torch')
+        self.device_input = None
+        if torch is not None and getattr(device, 'type', 'cpu') != 'cpu':
+            # Pinned host memory lets the copy to the GPU run asynchronously
+            host = torch.empty(shape, dtype=torch.float32).pin_memory()
+            self.input = host.numpy()
+            self.tensor = host
+            self.device_input = torch.empty(shape, dtype=torch.float16 if half else torch.float32, device=device)
+        else:
+            self.input = np.empty(shape, dtype=np.float32)
+            # Shares memory with the array, so filling the array fills the tensor
+            self.tensor = torch.from_numpy(self.input) if torch is not None else self.input
+        # The border is written once; every frame only overwrites the image area
+        self.input.fill(PAD_VALUE / 255)
+        self.channels = [self.input[0, channel, top:top + new_height, left:left + new_width] for channel in range(3)]
+        self.resized = np.empty((new_height, new_width, 3), dtype=np.uint8) if self.size != (width, height) else None
+        # Postprocessing scratch, sized on the first output
+        self.best = self.above = None
+
+    def fill(self, frame):
+        """Letterboxes a BGR frame into the input buffer as normalised RGB, without allocating."""
+        if self.resized is not None:
+            cv2.resize(frame, self.size, dst=self.resized, interpolation=cv2.INTER_LINEAR)
+            frame = self.resized
+        for channel, plane in enumerate(self.channels):
+            np.multiply(frame[:, :, 2 - channel], np.float32(1 / 255), out=plane)
+        if self.device_input is not None:
+            self.device_input.copy_(self.tensor, non_blocking=True)
+            return self.device_input
+        return self.tensor
+
+
+class FastDetector:
+    """
+    Preprocesses, runs and postprocesses the detector with buffers reused frame to frame.
+
+    The general ultralytics path allocates on every call: it builds a new
+    letterbox, an input tensor, a Results object, and then `sv.Detections`
+    and the filtered copies. The cameras never change geometry, so this path
+    computes the letterbox once per frame size and input size and writes each
+    frame straight into a preallocated input buffer. That buffer is pinned
+    host memory when the model is on a GPU. The raw network output is
+    decoded in NumPy:
+    - Classes outside `classes` are dropped before NMS, so NMS only sees
+      people and a box of another class can no longer suppress a person.
+    - The kept boxes go into a ring of preallocated structured arrays.
+
+    A result stays valid for the next `slots - 1` calls. Consumers that keep
+    detections longer than that must copy them.
+    """
+
+    def __init__(self, conf=0.25, iou=0.7, classes=(PERSON_CLASS,), max_det=300, max_nms=30000, slots=None):
+        """
+        Args:
+        - conf (float): Confidence threshold (ultralytics' default).
+        - iou (float): NMS IoU threshold (ultralytics' default).
+        - classes (tuple): Class ids to keep, or None for every class.
+        - max_det (int): Detections kept per frame.
+        - max_nms (int): Most confident candidates passed to NMS.
+        - slots (int): Result arrays in the ring (default is settings.FAST_PATH_RESULT_SLOTS).
+        """
+        self.conf = conf
+        self.iou = iou
+        self.classes = None if classes is None else np.asarray(classes)
+        self.max_det = max_det
+        self.max_nms = max_nms
+        self.results = np.zeros((slots or settings.FAST_PATH_RESULT_SLOTS, max_det), dtype=DETECTION_DTYPE)
+        self._next = 0
+        self._layouts = {}
+
+    def _layout(self, frame_shape, imgsz, backend):
+        stride = int(getattr(backend, 'stride', 32))
+        rectangular = bool(getattr(backend, 'pt', False))
+        if rectangular:
+            imgsz = int(np.ceil(imgsz / stride)) * stride
+        device = getattr(backend, 'device', None)
+        half = bool(getattr(backend, 'fp16', False))
+        key = (frame_shape[:2], imgsz, stride, rectangular, str(device), half)
+        layout = self._layouts.get(key)
+        if layout is None:
+            layout = self._layouts[key] = _Layout(frame_shape, imgsz, stride, rectangular, device, half)
+        return layout
+
+    def detect(self, model, frame, imgsz=None, camera=None):
+        """
+        Detects on one BGR frame.
+
+        Args:
+        - model (YoloV8): A model whose predictor has been set up (see `raw_backend`).
+        - frame (numpy array): BGR frame.
+        - imgsz (int): Inference input size (default is settings.INFERENCE_IMGSZ).
+        - camera (str): Camera label for the stage timers.
+
+        Returns:
+        - detections (Detections): Structured-array detections in frame coordinates.
+        """
+        backend = raw_backend(model)
+        layout = self._layout(frame.shape, imgsz or settings.INFERENCE_IMGSZ, backend)
+        with metrics.time('letterbox', camera):
+            image = layout.fill(frame)
+        torch = sys.modules.get('torch')
+        with metrics.time('model', camera), (torch.inference_mode() if torch is not None else contextlib.nullcontext()):
+            predictions = backend(image)
+        with metrics.time('nms', camera):
+            return self._decode(predictions, layout)
+
+    def _decode(self, predictions, layout):
+        if isinstance(predictions, (list, tuple)):
+            # PyTorch models also return the feature maps
+            predictions = predictions[0]
+        if hasattr(predictions, 'cpu'):
+            predictions = predictions.float().cpu().numpy()
+        predictions = predictions[0]  # (4 + classes, anchors): cx, cy, w, h, then one score per class
+        scores = predictions[4:]
+        if layout.best is None or len(layout.best) != predictions.shape[1]:
+            layout.best = np.empty(predictions.shape[1], dtype=np.float32)
+            layout.above = np.empty(predictions.shape[1], dtype=bool)
+        best = np.max(scores, axis=0, out=layout.best)
+        candidates = np.flatnonzero(np.greater(best, self.conf, out=layout.above))
+        if len(candidates) > self.max_nms:
+            candidates = candidates[np.argsort(-best[candidates])[:self.max_nms]]
+        class_id = scores[:, candidates].argmax(axis=0) if len(scores) > 1 else np.zeros(len(candidates), dtype=np.intp)
+        if self.classes is not None:
+            wanted = np.isin(class_id, self.classes)
+            candidates, class_id = candidates[wanted], class_id[wanted]
+
+        result = self.results[self._next]
+        self._next = (self._next + 1) % len(self.results)
+        if not len(candidates):
+            return result[:0].view(Detections)
+        centre, half_size = predictions[:2, candidates].T, predictions[2:4, candidates].T / 2
+        xyxy = np.hstack([centre - half_size, centre + half_size])
+        confidence = best[candidates]
+        keep = nms(xyxy, confidence, self.iou)[:self.max_det]
+
+        count = len(keep)
+        boxes = result['xyxy'][:count]
+        # Back from letterboxed input to frame pixels
+        np.subtract(xyxy[keep], layout.offset, out=boxes)
+        boxes /= layout.ratio
+        np.clip(boxes, 0, layout.limits, out=boxes)
+        result['confidence'][:count] = confidence[keep]
+        result['class_id'][:count] = class_id[keep]
+        result['tracker_id'][:count] = -1
+        return result[:count].view(Detections)
@@ -2,16 +2,12 @@ import sys
 import cv2
 import argparse
 
-from ultralytics import YOLO
-import supervision as sv
 import numpy as np
-from PyQt6.QtCore import QThread, pyqtSignal, Qt
-from PyQt6.QtGui import QImage, QPixmap
+from PyQt6.QtCore import QThread, QTimer, pyqtSignal, Qt
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
-    QPushButton, QMessageBox, QGraphicsView, QSlider, QComboBox
+    QPushButton, QGraphicsView, QSlider, QComboBox, QFileDialog
 )
-import serial
 import time
 
 # Python In-built packages
@@ -21,57 +17,392 @@ from pathlib import Path
 #Machine Learning
 import settings
 import helper
+from backends import class_names, warm_up
+from modelswap import ModelManager
+from autoscale import Autoscaler, CostTable, find_variants, variant_of
+from capture import LatencyTracker, streams
+from alarm import AlarmDispatcher
+from display import DisplayConverter
+from motion import AdaptiveScheduler, MOTION_MODE
+from roi import RoiDetector, ROI_MODE
+from fastpath import FastDetector, raw_backend
+from overlay import OverlayRenderer
+from zones import ZoneSet
+from metrics import metrics, start_exporters
+from detlog import DetectionLog
+from homography import Calibration, GroundLUT
+from alerts import start_alert_server
+from devices import DeviceRegistry
+from breach import BreachEngine, HAZARD, SAFE
+from tracking import IouTracker
+
+class ModelLoader(QThread):
+    """Loads, warms up and smoke tests the detector off the GUI thread, then hands it over through `model_ready`."""
+    model_ready = pyqtSignal(object)
+    load_failed = pyqtSignal(str)
+    # With settings.AUTOSCALE_ENABLED: further model sizes and the measured cost table, after model_ready
+    variant_ready = pyqtSignal(str, object)
+    costs_ready = pyqtSignal(object)
+
+    def __init__(self, model_path="yolov8s.pt", frame_size=None, models=None, variants=True):
+        super().__init__()
+        self.model_path = model_path
+        self.frame_size = frame_size
+        self.models = models if models is not None else ModelManager(frame_size=frame_size)
+        # Other model sizes are only loaded with the first model, not on every swap
+        self.variants = variants
+        self.timings = {}
+
+    def run(self):
+        try:
+            model = self.models.prepare(self.model_path)
+        except Exception as ex:
+            print(f"Could not load model {self.model_path}: {ex}")
+            self.load_failed.emit(str(ex))
+            return
+        self.timings = dict(self.models.timings)
+        print(f"Model ready in {sum(self.timings.values()):.1f}s (load {self.timings['load_s']:.1f}s, "
+              f"warm-up {self.timings['warmup_s']:.1f}s, smoke test {self.timings['smoke_s']:.1f}s)")
+        self.model_ready.emit(model)
+        if settings.AUTOSCALE_ENABLED and self.variants:
+            self.load_variants(model)
+
+    def load_variants(self, model):
+        # Detection is already running on the primary model while the other sizes load and get timed
+        models = {variant_of(self.model_path): model}
+        for variant, path in find_variants().items():
+            if variant in models:
+                continue
+            try:
+                models[variant] = helper.load_model(path)
+                warm_up(models[variant], self.frame_size, agnostic_nms=True)
+            except Exception as ex:
+                print(f"Could not load model {path}: {ex}")
+                continue
+            self.variant_ready.emit(variant, models[variant])
+        if CostTable.load() is None:
+            costs = CostTable.measure(models, frame_size=self.frame_size, agnostic_nms=True)
+            costs.save()
+            self.costs_ready.emit(costs)
+
 
 class VideoThread(QThread):
-    frame_update = pyqtSignal(np.ndarray)
+    frame_update = pyqtSignal(np.ndarray, object)
+    # The model raised on a live frame; detection pauses until a model is set again, frames keep flowing
+    model_failed = pyqtSignal(str)
+    # breach.BreachEvent hazard/safe transitions of this camera, for the alarm and the alert fan-out
+    breach_event = pyqtSignal(object)
 
-    def __init__(self, selected_camera_index=0):
+    def __init__(self, selected_camera_index=0, mode=None, zones=None, model=None, variants=None):
         super().__init__()
         self.selected_camera_index = selected_camera_index
-        self.model = YOLO("yolov8s.pt")  # Initialize YOLO model
+        self.mode = mode or settings.INFERENCE_MODE
+        # Named zones saved for this camera (see zones.py); empty until some are drawn
+        self.zones = zones if zones is not None else ZoneSet.for_camera(selected_camera_index)
+        # In motion mode the detector only runs when the danger zone changes or the refresh interval expires
+        self.scheduler = AdaptiveScheduler(self.zones) if self.mode == MOTION_MODE else None
+        self.model = None
+        self.roi_detector = None
+        # Letterbox, inference and NMS into reused buffers for the fixed camera geometry (see fastpath.py)
+        self.fast_detector = FastDetector() if settings.FAST_PATH else None
+        self.capture_worker = None
+        # Model size letter -> loaded model, for the autoscaler to choose from
+        self.variants = dict(variants or {})
+        self.autoscaler = None
+        self.detection_log = None
+        self.model_error = None
+        # Ground-plane calibration (see homography.py); its lookup table is built for the first frame's size
+        self.calibration = Calibration.for_camera(selected_camera_index)
+        self.ground = None
+        # Track IDs for the breach engine, which turns danger-zone dwell time into hazard/safe transitions
+        self.tracker = IouTracker()
+        self.breach_engine = BreachEngine()
+        self.latency = LatencyTracker()
+        self._running = True
+        if model is not None:
+            self.set_model(model)
+
+    def set_model(self, model, variant=None):
+        """
+        Starts detecting with `model`; until then frames are passed through without detections.
 
-    def run(self):
-        capture = cv2.VideoCapture(self.selected_camera_index)
-        while True:
-            ret, frame = capture.read()
-            if not ret:
-                break
-            frame = cv2.resize(frame, (1280, 650))
+        Also swaps models on a running thread: the next frame uses the new
+        one, and this thread keeps no reference to the replaced model.
+        """
+        # In roi mode frames stay at native resolution and only the danger zone's crop is detected on
+        self.roi_detector = RoiDetector(model, self.zones) if self.mode == ROI_MODE else None
+        replaced, self.model = self.model, model
+        self.model_error = None
+        if replaced is not None and replaced is not model:
+            self.variants = {v: m for v, m in self.variants.items() if m is not replaced}
+        if variant is not None:
+            self.variants[variant] = model
+        if settings.AUTOSCALE_ENABLED and self.mode != ROI_MODE:
+            # Picks the inference input size (and model size, once others are loaded) to hold the latency budget
+            self.autoscaler = Autoscaler(self.selected_camera_index, list(self.variants) or None)
+
+    def add_variant(self, variant, model):
+        self.variants[variant] = model
+        if self.autoscaler is not None:
+            self.autoscaler.set_variants(self.variants)
 
+    def run(self):
+        # Capture runs in its own thread so a slow model never lets the camera buffer drift behind real time;
+        # the connection is shared and survives network hiccups, it is only released when this thread ends
+        native = self.mode == ROI_MODE
+        self.capture_worker = streams.acquire(self.selected_camera_index, native=native)
+        # Every detection is kept for later analysis (see detlog.py); opened here so this thread owns the writer
+        if settings.DETLOG_ENABLED:
+            self.detection_log = DetectionLog(self.selected_camera_index, writable=True)
+        while self._running:
+            frame, captured_at, _ = self.capture_worker.read_latest(timeout=1.0)
+            if frame is None:
+                if not self.capture_worker.is_alive():
+                    break
+                continue
+
+            now = time.monotonic()
+            camera = str(self.selected_camera_index)
+            propagated = False
+            frame_size = (frame.shape[1], frame.shape[0])
+            # Zones are saved in the coordinates they were drawn on; roi mode delivers native-resolution frames
+            # and a camera may come back at another resolution, so they follow the frames actually received
+            self.zones.fit(frame_size)
+            if self.calibration is not None and (self.ground is None or self.ground.frame_size != frame_size):
+                self.ground = GroundLUT(self.calibration, frame_size)
+            try:
+                detections, propagated = self.detect(frame, now, camera)
+            except Exception as ex:
+                # A model that breaks on live frames must not take the stream down: frames keep flowing
+                # without detections and the window rolls back to the previous model
+                print(f"Detection failed, pausing the model: {ex}")
+                self.model_error = str(ex)
+                self.model_failed.emit(self.model_error)
+                detections = None
+
+            if detections is not None:
+                with metrics.time('tracking', camera):
+                    detections.tracker_id = self.tracker.update(detections.xyxy, now)
+                events = helper.update_breaches(detections.tracker_id, detections.xyxy, self.zones, now,
+                                                ground=self.ground, engine=self.breach_engine, camera=camera)
+                for event in events:
+                    self.breach_event.emit(event)
+
+            if self.detection_log is not None and detections is not None and not propagated:
+                # Only real detector output goes into the log, not motion-mode propagation
+                with metrics.time('detection_log', camera):
+                    zone_iou = self.zones.iou(detections.xyxy, frame.shape) if len(self.zones) else None
+                    in_danger = self.ground.in_danger(detections.xyxy) if self.ground is not None else None
+                    # Track IDs come with the detections (tracking.IouTracker), breaching is the engine's per-track state
+                    breaching = self.breach_engine.is_breaching(detections.tracker_id)
+                    self.detection_log.append_detections(detections, zone_iou, self.zones.names, breaching=breaching,
+                                                         in_danger=in_danger)
+
+            # Emit the frame and its detections; the overlay is drawn after scaling to display resolution
+            metrics.observe('latency', self.latency.add(captured_at), camera)
+            metrics.tick(camera)
+            self.frame_update.emit(frame, detections)
+
+        streams.release(self.selected_camera_index, native=native)
+        if self.detection_log is not None:
+            self.detection_log.close()
+
+    def detect(self, frame, now, camera):
+        """Runs the detector on one frame; returns (detections or None, whether they were propagated)."""
+        import supervision as sv  # deferred: slow to import and only needed once frames flow
+
+        # Read once: set_model may swap them from the GUI thread at any time
+        model, roi_detector = self.model, self.roi_detector
+        propagated = False
+        if model is None or self.model_error is not None:
+            # Model still loading (or failed): show the live picture straight away
+            detections = None
+        elif roi_detector is not None:
+            xyxy, confidence, class_id = roi_detector.detect(frame, camera)
+            with metrics.time('nms', camera):
+                detections = sv.Detections(xyxy=xyxy, confidence=confidence, class_id=class_id)
+                detections = detections[detections.class_id == 0]
+        elif self.scheduler is None or self.scheduler.should_detect(frame, now):
             # YOLOv8 detection
-            result = self.model(frame, agnostic_nms=True)[0]
-            detections = sv.Detections.from_yolov8(result)
-            detections = detections[detections.class_id == 0]  # Filter out class (adjust as needed)
-
-            # Draw bounding boxes
-            box_annotator = sv.BoxAnnotator(
-                thickness=2,
-                text_thickness=2,
-                text_scale=1
-            )
-            labels = [
-                f"{self.model.model.names[class_id]} {confidence:0.2f}"
-                for _, confidence, class_id, _
-                in detections
-            ]
-            frame = box_annotator.annotate(scene=frame, detections=detections, labels=labels)
-
-            # Emit the frame with annotations
-            self.frame_update.emit(frame)
-
-        capture.release()
+            predict_kwargs = {}
+            if self.autoscaler is not None:
+                model = self.variants.get(self.autoscaler.variant, model)
+                predict_kwargs['imgsz'] = self.autoscaler.imgsz
+            started = time.perf_counter()
+            if self.fast_detector is not None and raw_backend(model) is not None:
+                # People only, as structured arrays; times its own letterbox, model and nms stages
+                result = self.fast_detector.detect(model, frame, camera=camera, **predict_kwargs)
+                # The result is a view into the detector's ring, which later frames overwrite: copy it
+                # before tracking writes IDs into it and the queued frame_update hands it to the GUI thread
+                detections = sv.Detections(xyxy=np.array(result.xyxy), confidence=np.array(result.confidence),
+                                           class_id=np.array(result.class_id),
+                                           tracker_id=np.array(result.tracker_id))
+            else:
+                with metrics.time('model', camera):
+                    result = model(frame, agnostic_nms=True, verbose=False, **predict_kwargs)[0]
+                with metrics.time('nms', camera):
+                    detections = sv.Detections.from_yolov8(result)
+                    detections = detections[detections.class_id == 0]  # Filter out class (adjust as needed)
+            if self.autoscaler is not None:
+                self.autoscaler.observe(time.perf_counter() - started, now)
+            if self.scheduler is not None:
+                self.scheduler.observe(detections.xyxy, detections.confidence, detections.class_id, now)
+        else:
+            xyxy, confidence, class_id = self.scheduler.propagate(now)
+            detections = sv.Detections(xyxy=xyxy, confidence=confidence, class_id=class_id)
+            propagated = True
+        return detections, propagated
+
+    def stop(self):
+        self._running = False
+        self.wait()
+
+    def stats(self):
+        """Returns dropped-frame and end-to-end latency counters for the current stream."""
+        stats = self.latency.stats()
+        if self.capture_worker is not None:
+            stats.update(self.capture_worker.stats())
+        if self.scheduler is not None:
+            stats.update(self.scheduler.stats())
+        if self.autoscaler is not None:
+            stats.update(self.autoscaler.stats())
+        return stats
+
+class ProcessVideoThread(QThread):
+    """
+    Drop-in for VideoThread backed by the multi-process pipeline (settings.PROCESS_PIPELINE).
+
+    Decoding and inference run in their own processes (see pipeline.py), each
+    inference process loading its own copy of the model, so this thread copies
+    finished frames out of shared memory, then tracks, scores the breaches and
+    logs the detections exactly like VideoThread before emitting them: the
+    alarm works the same in both modes. `names_ready` fires once the first
+    worker has loaded the model.
+    """
+    frame_update = pyqtSignal(np.ndarray, object)
+    names_ready = pyqtSignal(object)
+    breach_event = pyqtSignal(object)
+
+    def __init__(self, selected_camera_index=0, zones=None, model_path=None):
+        super().__init__()
+        self.selected_camera_index = selected_camera_index
+        # The pipeline always delivers CAPTURE_FRAME_SIZE frames
+        self.zones = zones if zones is not None else ZoneSet.for_camera(selected_camera_index,
+                                                                         frame_size=settings.CAPTURE_FRAME_SIZE)
+        self.model_path = model_path or settings.DETECTION_MODEL
+        self.pipeline = None
+        self.detection_log = None
+        self.calibration = Calibration.for_camera(selected_camera_index)
+        self.ground = None
+        self.tracker = IouTracker()
+        self.breach_engine = BreachEngine()
+        self.latency = LatencyTracker()
+        self._running = True
+
+    def set_model(self, model):
+        # Every inference process loads its own model
+        pass
+
+    def run(self):
+        import functools
+        import supervision as sv
+        from pipeline import ProcessPipeline
+
+        camera = str(self.selected_camera_index)
+        factory = functools.partial(helper.load_model, self.model_path)
+        self.pipeline = ProcessPipeline({camera: self.selected_camera_index}, factory, agnostic_nms=True)
+        self.pipeline.start()
+        if settings.DETLOG_ENABLED:
+            self.detection_log = DetectionLog(self.selected_camera_index, writable=True)
+        announced = False
+        try:
+            while self._running:
+                item = self.pipeline.get(timeout=1.0)
+                if item is None:
+                    if self.pipeline.finished:
+                        break
+                    continue
+                if not announced and self.pipeline.names:
+                    self.names_ready.emit(self.pipeline.names)
+                    announced = True
+                # The slot goes straight back to the decoder; the GUI thread gets its own copy
+                frame = item.frame.copy()
+                item.release()
+                detections = sv.Detections(xyxy=item.xyxy, confidence=item.confidence, class_id=item.class_id)
+                self.process_detections(frame, detections, time.monotonic(), camera)
+                metrics.observe('latency', self.latency.add(item.captured_at), camera)
+                metrics.tick(camera)
+                self.frame_update.emit(frame, detections)
+        finally:
+            self.pipeline.stop()
+            if self.detection_log is not None:
+                self.detection_log.close()
+
+    def process_detections(self, frame, detections, now, camera):
+        """Tracks one frame's detections, feeds the breach engine and appends them to the detection log."""
+        frame_size = (frame.shape[1], frame.shape[0])
+        if self.calibration is not None and (self.ground is None or self.ground.frame_size != frame_size):
+            self.ground = GroundLUT(self.calibration, frame_size)
+        with metrics.time('tracking', camera):
+            detections.tracker_id = self.tracker.update(detections.xyxy, now)
+        events = helper.update_breaches(detections.tracker_id, detections.xyxy, self.zones, now,
+                                        ground=self.ground, engine=self.breach_engine, camera=camera)
+        for event in events:
+            self.breach_event.emit(event)
+        if self.detection_log is not None:
+            with metrics.time('detection_log', camera):
+                zone_iou = self.zones.iou(detections.xyxy, frame.shape) if len(self.zones) else None
+                in_danger = self.ground.in_danger(detections.xyxy) if self.ground is not None else None
+                breaching = self.breach_engine.is_breaching(detections.tracker_id)
+                self.detection_log.append_detections(detections, zone_iou, self.zones.names, breaching=breaching,
+                                                     in_danger=in_danger)
+
+    def stop(self):
+        self._running = False
+        self.wait()
+
+    def stats(self):
+        stats = self.latency.stats()
+        if self.pipeline is not None:
+            stats.update(self.pipeline.stats())
+        return stats
 
 class VideoWindow(QWidget):
+    # Emitted from the device registry's watcher thread when cameras or serial ports come and go
+    devices_changed = pyqtSignal(object)
+
     def __init__(self):
         super().__init__()
+        # Cameras and serial ports from the last scan; the lists are refreshed in the background (see devices.py)
+        self.devices = DeviceRegistry(busy_ports=self.busy_serial_ports)
         self.init_ui()
         self.frame = np.zeros((480, 640, 3), dtype=np.uint8)
-        self.ser = None
+        self.display_converter = DisplayConverter(camera=str(settings.DEFAULT_CAMERA))
+        self.hud_enabled = settings.METRICS_HUD
+        self.hud_lines = []
+        self.hud_updated_at = 0.0
+        self.metrics_exporters = start_exporters()
+        # Hazard/safe transitions, snapshots and thumbnails for the lifeguard tablets (None when disabled)
+        self.alerts = start_alert_server()
+        # Serial I/O runs on its own worker so the GUI thread never waits on the Arduino
+        self.alarm = AlarmDispatcher(on_line=lambda line: print(f"Arduino: {line}"))
+        self.alarm.start()
         self.arduino_connection()
 
-        self.video_thread = VideoThread()
-        self.video_thread.frame_update.connect(self.update_frame)
-        self.video_thread.start()
+        # The window and the live picture come up immediately; the detector loads in the background
+        self.model = None
+        self.model_loader = None
+        self.variants = {}
+        self.overlay = None
+        # Loads, swaps and rolls back the detector's weights while the video keeps running
+        self.models = ModelManager(install=self.install_model)
+        self.start_video_thread(settings.DEFAULT_CAMERA)
+        self.populate_camera_list()
+        # Probes new and replugged devices off the GUI thread and updates both lists
+        self.devices_changed.connect(self.devices_updated)
+        self.devices.watch(self.devices_changed.emit)
+        if settings.PRELOAD_MODEL and not settings.PROCESS_PIPELINE:
+            self.load_machine_learning()
 
     def init_ui(self):
         # Layout utama menggunakan QHBoxLayout
@@ -80,6 +411,26 @@ class VideoWindow(QWidget):
         # Sidebar Layout
         sidebar_layout = QVBoxLayout()
 
+        # Camera selection, filled from the device registry
+        camera_layout = QVBoxLayout()
+        self.camera_label = QLabel("Camera", self)
+        self.camera_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        font = self.camera_label.font()
+        font.setPointSize(14)
+        font.setBold(True)
+        self.camera_label.setFont(font)
+        camera_layout.addWidget(self.camera_label)
+        camera_layout.setSpacing(0)
+        self.camera_combo = QComboBox(self)
+        font = self.camera_combo.font()
+        font.setPointSize(12)
+        font.setBold(True)
+        self.camera_combo.setFont(font)
+        camera_layout.addWidget(self.camera_combo)
+        sidebar_layout.addLayout(camera_layout)
+        self.populate_camera_list()
+        self.camera_combo.currentIndexChanged.connect(self.camera_selection_changed)
+
         # Create a QVBoxLayout for the Arduino Port label and combo box
         arduino_port_layout = QVBoxLayout()
 
@@ -101,7 +452,7 @@ class VideoWindow(QWidget):
         self.arduino_port_combo = QComboBox(self)
         arduino_port_layout.addWidget(self.arduino_port_combo)
 
-        # 2. Populate the QComboBox with port names from COM2 to COM7
+        # 2. Populate the QComboBox with the serial ports found by the device registry
         self.populate_arduino_ports()
 
         # Set font size and make it bold for the combo box
@@ -174,8 +525,26 @@ class VideoWindow(QWidget):
         load_ml_button.clicked.connect(self.load_machine_learning)
         label_button_layout.addWidget(load_ml_button)
 
+        # Button "HUD": toggles the per-stage latency overlay
+        self.hud_button = QPushButton("HUD", self)
+        self.hud_button.setCheckable(True)
+        self.hud_button.setChecked(settings.METRICS_HUD)
+        self.hud_button.setStyleSheet("padding: 4px; background-color: #7f8c8d; color: white; font: bold; font-size: 14px")
+        self.hud_button.toggled.connect(self.toggle_hud)
+        label_button_layout.addWidget(self.hud_button)
+
         content_layout.addLayout(label_button_layout)
 
+        # Non-blocking notification banner, hidden again by a timer
+        self.notification = QLabel(self)
+        self.notification.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.notification.setStyleSheet("border-radius: 5px; padding: 4px; background-color: #BD0000; color: white; font: bold; font-size: 15px")
+        self.notification.hide()
+        self.notification_timer = QTimer(self)
+        self.notification_timer.setSingleShot(True)
+        self.notification_timer.timeout.connect(self.notification.hide)
+        content_layout.addWidget(self.notification)
+
         # Layout untuk video frame dan slider
         video_slider_layout = QHBoxLayout()
 
@@ -220,10 +589,29 @@ class VideoWindow(QWidget):
         self.model_confidence_slider.setFixedWidth(sidebar_width - 20)  # Sesuaikan sesuai kebutuhan
 
     def populate_arduino_ports(self):
-        # Populate the QComboBox with port names from COM2 to COM7
-        for i in range(2, 8):
-            port_name = f'COM{i}'
-            self.arduino_port_combo.addItem(port_name)
+        # Ports answering as the alarm sketch come first, then likely Arduinos; the selection survives a refresh
+        selected = self.arduino_port_combo.currentText()
+        ports = self.devices.serial_ports()
+        self.arduino_port_combo.blockSignals(True)
+        self.arduino_port_combo.clear()
+        for device in ports:
+            self.arduino_port_combo.addItem(str(device.source))
+            self.arduino_port_combo.setItemData(self.arduino_port_combo.count() - 1,
+                                                device.info.get('description') or '', Qt.ItemDataRole.ToolTipRole)
+        index = self.arduino_port_combo.findText(selected) if selected else -1
+        self.arduino_port_combo.setCurrentIndex(index if index >= 0 else 0 if ports else -1)
+        self.arduino_port_combo.blockSignals(False)
+        return self.arduino_port_combo.currentText() != selected
+
+    def busy_serial_ports(self):
+        # The port the alarm holds is never probed: opening it again would reset the board
+        alarm = getattr(self, 'alarm', None)
+        return {alarm.port} if alarm is not None and alarm.port else set()
+
+    def devices_updated(self, changes):
+        self.populate_camera_list()
+        if self.populate_arduino_ports():
+            self.arduino_connection()
 
     def model_confidence_changed(self, value):
         scaled_value = value
@@ -239,71 +627,80 @@ class VideoWindow(QWidget):
         pos = (slider_width - label_width) * (value / 100)
         self.model_confidence_value_label.setGeometry(int(pos), -20, label_width, 20)
 
-    def update_frame(self, frame):
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        frame_height, frame_width, _ = frame.shape
-
-        window_height = int(self.width() * 0.8)
-        window_width = int(self.width() * 0.8)
+    def update_frame(self, frame, detections=None):
+        # BGR straight into a reused buffer and QImage, no cvtColor or per-frame allocations
+        def draw(scaled, scale):
+            if self.overlay is not None:
+                self.overlay.render(scaled, detections, scale)
+            if self.hud_enabled:
+                self.draw_hud(scaled)
 
-        if window_height / frame_height < window_width / frame_width:
-            scale_factor = window_height / frame_height
-        else:
-            scale_factor = window_width / frame_width
+        if self.alerts is not None:
+            self.alerts.publish_frame(frame, detections, self.video_thread.selected_camera_index)
 
-        new_height = int(frame_height * scale_factor)
-        new_width = int(frame_width * scale_factor)
-
-        frame = cv2.resize(frame, (new_width, new_height))
-
-        bytes_per_line = 3 * new_width
-        image = QImage(frame.data, new_width, new_height, bytes_per_line, QImage.Format.Format_RGB888)
-
-        pixmap = QPixmap.fromImage(image)
+        use_draw = self.overlay is not None or self.hud_enabled
+        pixmap = self.display_converter.to_pixmap(frame, self.width(), draw=draw if use_draw else None)
         self.video_display.setPixmap(pixmap)
-        self.video_display.setFixedHeight(new_height)
+        if self.video_display.height() != pixmap.height():
+            self.video_display.setFixedHeight(pixmap.height())
+
+    def toggle_hud(self, checked):
+        self.hud_enabled = checked
+
+    def draw_hud(self, scaled):
+        # Percentiles are recomputed twice a second, not per frame
+        now = time.monotonic()
+        if now - self.hud_updated_at > 0.5:
+            self.hud_lines = metrics.hud_lines(str(self.video_thread.selected_camera_index))
+            self.hud_updated_at = now
+        for i, line in enumerate(self.hud_lines):
+            position = (8, 18 + 16 * i)
+            cv2.putText(scaled, line, position, cv2.FONT_HERSHEY_PLAIN, 1.0, (0, 0, 0), 3, cv2.LINE_AA)
+            cv2.putText(scaled, line, position, cv2.FONT_HERSHEY_PLAIN, 1.0, (255, 255, 255), 1, cv2.LINE_AA)
 
     def send_command(self, command):
-        if self.ser is not None:
-            if command in ['0', '1']:
-                self.ser.write(command.encode())
-                response = self.ser.readline().decode().strip()
-                print(f"Arduino: {response}")
-                if command == '1':
-                    self.custom_message_box("Peringatan", "Sedang dalam Hazard Condition!")
-            else:
-                print("Masukkan perintah yang valid (0 atau 1).")
-        else:
+        if command not in ['0', '1']:
+            print("Masukkan perintah yang valid (0 atau 1).")
+            return
+        if not self.alarm.connected:
             print("Arduino tidak terdeteksi. Aplikasi tetap berjalan tanpa koneksi ke Arduino.")
+        # Queued even while disconnected; the dispatcher sends the latest state once the port is back
+        self.alarm.send(command)
+        if self.alerts is not None:
+            self.alerts.publish_alert(HAZARD if command == '1' else SAFE, self.video_thread.selected_camera_index,
+                                      source='operator')
+        if command == '1':
+            self.custom_message_box("Peringatan", "Sedang dalam Hazard Condition!")
+
+    def breach_changed(self, event):
+        # The breach engine's transitions drive the alarm and the tablets like the operator buttons do
+        self.alarm.send('1' if event.state == HAZARD else '0')
+        if self.alerts is not None:
+            self.alerts.publish_breach(event, self.video_thread.selected_camera_index)
+        if event.state == HAZARD:
+            tracks = ', '.join(f"#{track_id}" for track_id in event.track_ids)
+            self.custom_message_box("Peringatan", f"Orang di zona bahaya: {tracks}")
 
     def button_click(self, command):
         self.send_command(command)
 
     def close_connection(self):
-        if self.ser is not None:
-            self.ser.close()
+        self.alarm.stop()
         self.root.destroy()
 
     def custom_message_box(self, title, message):
-        custom_msg_box = QMessageBox()
-        custom_msg_box.setIcon(QMessageBox.Icon.Warning)
-        custom_msg_box.setWindowTitle(title)
-        custom_msg_box.setText(message)
-        custom_msg_box.addButton("Close", QMessageBox.ButtonRole.RejectRole)
-        custom_msg_box.exec()
+        # A banner instead of a modal QMessageBox: exec() would stall the event loop and the video with it
+        self.notification.setText(f"{title}: {message}")
+        self.notification.show()
+        self.notification_timer.start(int(settings.NOTIFICATION_SECONDS * 1000))
 
     def arduino_connection(self):
         # Function to update the Arduino port when the selection changes
         selected_port = self.arduino_port_combo.currentText()
         print(f"Selected Arduino Port: {selected_port}")
-        baud_rate = 9600
 
-        try:
-            self.ser = serial.Serial(selected_port, baud_rate)
-            time.sleep(2)  
-        except serial.SerialException:
-            self.ser = None
-            print("Arduino tidak terdeteksi. Aplikasi tetap berjalan tanpa koneksi ke Arduino.")
+        # Connects (and waits for the board to boot) in the background, retrying with backoff
+        self.alarm.set_port(selected_port)
 
     def resizeEvent(self, event):
         self.update_video_frame_size()
@@ -313,27 +710,107 @@ class VideoWindow(QWidget):
         self.video_display.setFixedWidth(video_width)
 
     def populate_camera_list(self):
+        # From the registry's cache: no capture is opened here, probing happens on its watcher thread
+        video_thread = getattr(self, 'video_thread', None)
+        selected = video_thread.selected_camera_index if video_thread is not None else settings.DEFAULT_CAMERA
+        self.camera_combo.blockSignals(True)
         self.camera_combo.clear()
-
-        for i in range(10):
-            capture = cv2.VideoCapture(i)
-            if capture.isOpened():
-                self.camera_combo.addItem(f"Camera {i}")
-                capture.release()
+        for device in self.devices.cameras():
+            text = device.label
+            if device.info.get('width'):
+                text += f" ({device.info['width']}x{device.info['height']})"
+            self.camera_combo.addItem(text, device.source)
+        self.camera_combo.setCurrentIndex(self.camera_combo.findData(selected))
+        self.camera_combo.blockSignals(False)
 
     def camera_selection_changed(self, index):
-        self.video_thread.terminate()
-        selected_camera_index = index
-        self.video_thread = VideoThread(selected_camera_index)
+        selected_camera_index = self.camera_combo.itemData(index)
+        if selected_camera_index is None or selected_camera_index == self.video_thread.selected_camera_index:
+            return
+        self.video_thread.stop()
+        self.start_video_thread(selected_camera_index)
+        self.display_converter.camera = str(selected_camera_index)
+    
+    def start_video_thread(self, selected_camera_index):
+        if settings.PROCESS_PIPELINE:
+            # Decode and inference in separate processes; the overlay is built once a worker reports the class names
+            self.video_thread = ProcessVideoThread(selected_camera_index)
+            self.video_thread.names_ready.connect(
+                lambda names: setattr(self, 'overlay', OverlayRenderer(names, self.video_thread.zones)))
+        else:
+            self.video_thread = VideoThread(selected_camera_index, model=self.model, variants=self.variants)
+            self.video_thread.model_failed.connect(self.model_failed)
+        # Both threads track and score breaches, so the alarm and alerts follow the video in either mode
+        self.video_thread.breach_event.connect(self.breach_changed)
         self.video_thread.frame_update.connect(self.update_frame)
         self.video_thread.start()
 
-        self.line_position = self.video_thread.frame_height // 2
-    
     def load_machine_learning(self):
-        # Implementasi fungsi untuk memuat model machine learning
-        # Isi dengan kode yang diperlukan untuk memuat model machine learning
-        pass
+        if settings.PROCESS_PIPELINE:
+            # The pipeline's inference processes already load the model
+            return
+        if self.model_loader is not None and self.model_loader.isRunning():
+            return
+        if self.model is not None:
+            # Already detecting: pick other weights and swap them in without stopping the video
+            dialog = QFileDialog(self, "Load Machine Learning", str(settings.MODEL_DIR),
+                                 "YOLOv8 weights (*.pt *.onnx *.xml);;All files (*)")
+            dialog.fileSelected.connect(self.swap_model)
+            dialog.open()
+            return
+        # Loads and warms up the model in the background; detections start once model_ready fires
+        self.model_loader = ModelLoader(models=self.models)
+        self.model_loader.model_ready.connect(self.model_loaded)
+        self.model_loader.load_failed.connect(self.model_load_failed)
+        self.model_loader.variant_ready.connect(self.variant_loaded)
+        self.model_loader.costs_ready.connect(self.costs_measured)
+        self.model_loader.start()
+
+    def swap_model(self, model_path):
+        """Loads, warms up and smoke tests `model_path` in the background, then swaps it in between two frames."""
+        if settings.PROCESS_PIPELINE or (self.model_loader is not None and self.model_loader.isRunning()):
+            return False
+        self.model_loader = ModelLoader(model_path, models=self.models, variants=False)
+        self.model_loader.model_ready.connect(self.model_loaded)
+        self.model_loader.load_failed.connect(self.model_load_failed)
+        self.model_loader.start()
+        return True
+
+    def model_loaded(self, model):
+        generation = self.models.swap(model, self.model_loader.model_path)
+        if self.models.previous is not None:
+            # The old model stays loaded for rollback until the new one has run cleanly for a while
+            QTimer.singleShot(int(settings.MODEL_SWAP_PROBATION * 1000), lambda: self.models.commit(generation))
+            print(f"Swapped to {self.model_loader.model_path}")
+
+    def install_model(self, model, model_path):
+        # Called by ModelManager on swap and rollback; nothing here may keep the replaced model alive
+        replaced, self.model = self.model, model
+        self.variants = {v: m for v, m in self.variants.items() if m is not replaced}
+        variant = variant_of(model_path) if model_path is not None else None
+        if variant is not None:
+            self.variants[variant] = model
+        self.overlay = OverlayRenderer(class_names(model), self.video_thread.zones)
+        if isinstance(self.video_thread, VideoThread):
+            self.video_thread.set_model(model, variant)
+
+    def model_load_failed(self, message):
+        # The running model, if any, simply stays in place
+        self.custom_message_box("Model", f"Gagal memuat model: {message}")
+
+    def model_failed(self, message):
+        if self.models.rollback() is not None:
+            self.custom_message_box("Model", "Model baru gagal, kembali ke model sebelumnya")
+        else:
+            self.custom_message_box("Model", f"Deteksi berhenti: {message}")
+
+    def variant_loaded(self, variant, model):
+        self.variants[variant] = model
+        self.video_thread.add_variant(variant, model)
+
+    def costs_measured(self, costs):
+        if self.video_thread.autoscaler is not None:
+            self.video_thread.autoscaler.set_costs(costs)
 
 class MainWindow(QMainWindow):
     def __init__(self):
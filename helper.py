@@ -1,35 +1,66 @@
-from ultralytics import YOLO
-import time
 import cv2
 import settings
-import pandas as pd
 
-from PIL import Image
-import cv2
-import numpy as np
-
-from utils import calculate_iou
+from utils import zone_iou
+from backends import load_backend
+from breach import BreachEngine
+from capture import streams
+from zones import ZoneSet
+from metrics import metrics
 
 first_frame = True
 
 # Initialize
-breach_frequency = {}
-prev_active_breachers = set()
+breach_engine = BreachEngine()
+breach_frequency = breach_engine.breach_counts  # track_id -> breach count, read-only view
+prev_active_breachers = breach_engine.active_breachers  # track IDs currently breaching
 
-def load_model(model_path):
+def load_model(model_path, backend=None, imgsz=None):
     """
     Loads a YOLO object detection model from the specified model_path.
 
     Parameters:
         model_path (str): The path to the YOLO model file.
+        backend (str): 'torch', 'onnx' or 'openvino' (default is settings.INFERENCE_BACKEND).
+        imgsz (int): Input size used when exporting to ONNX/OpenVINO (default is settings.INFERENCE_IMGSZ).
 
     Returns:
         A YOLO object detection model.
     """
-    model = YOLO(model_path)
+    model = load_backend(model_path, backend, imgsz)
 
     return model
 
+def update_breaches(track_ids, boxes, zones, now=None, bottom_percent=0.1, ground=None, danger_distance=None,
+                    engine=None, camera=None):
+    """
+    Feeds one frame of tracked detections into the breach engine.
+
+    Parameters:
+        track_ids (numpy array): (N,) tracker IDs, e.g. `result.boxes.id` from `model.track`.
+        boxes (numpy array): (N, 4) boxes in xyxy format.
+        zones (ZoneSet or list): A compiled ZoneSet, or DangerZone objects or polygons.
+        now (float): Frame timestamp in seconds (default is time.monotonic()).
+        bottom_percent (float): Foot-region height used for the zone overlap.
+        ground (homography.GroundLUT): Calibrated ground plane; tracks at least `danger_distance`
+            metres from the shoreline also count as inside.
+        danger_distance (float): Metres out to sea (default is settings.DANGER_DISTANCE_M).
+        engine (BreachEngine): Per-camera engine (default is the module-level `breach_engine`).
+        camera (str): Camera label for the zone_scoring timer.
+
+    Returns:
+        A list of BreachEvent hazard/safe transitions (usually empty).
+    """
+    with metrics.time('zone_scoring', camera):
+        if isinstance(zones, ZoneSet):
+            ious = zones.iou(boxes, bottom_percent=bottom_percent)
+        else:
+            ious = zone_iou(boxes, zones, bottom_percent)
+        in_zone = ious.max(axis=1, initial=0) > settings.BREACH_IOU_THRESHOLD
+        if ground is not None:
+            in_zone |= ground.in_danger(boxes, danger_distance)
+    return (breach_engine if engine is None else engine).update(track_ids, in_zone, now)
+
 def display_tracker_options():
     display_tracker = 'No' #st.radio("Display Tracker", ('Yes', 'No'))
     is_display_tracker = True if display_tracker == 'Yes' else False
@@ -71,7 +102,7 @@ def play_webcam(conf, model):
     Raises:
         None
     """
-    source_webcam = settings.WEBCAM_PATH #source webcam
+    source_webcam = settings.WEBCAM_PATH #source webcam, the configured IP camera
     is_display_tracker, tracker = display_tracker_options()
     
     print("Select Danger Zone:")
@@ -84,19 +115,12 @@ def play_webcam(conf, model):
     bg_color = "#eee"
     DZ_BOX = 0,0,0,0,0,0,0,0 #For storing polygon coordinates (4)
     
-    # Initialize video capture
-    video_capture = None
-    frame_width = 0
-    frame_height = 0
-    
-    video_capture = cv2.VideoCapture(bg_video)
-    # Check if the video file was successfully opened
-     #global first_frame
-    if video_capture.isOpened():
-        # Read the first frame
-        ret, frame = video_capture.read()
-        video_capture.release()
-        first_frame_webcam = frame
+    # The first frame comes from the shared connection to this source when one is already open
+    first_frame_webcam = streams.first_frame(bg_video, timeout=10.0)
+    if first_frame_webcam is None:
+        print(f"No frame from {bg_video} within 10 seconds, cannot draw the danger zone")
+        return
+    frame = first_frame_webcam.copy()
 
     frame_width, frame_height = (1280, int(1280*(9/16)))
     canvas_width = frame_width
@@ -104,6 +128,8 @@ def play_webcam(conf, model):
 
     # Convert BGR frame to RGB format
     frame_rgb = cv2.cvtColor(first_frame_webcam, cv2.COLOR_BGR2RGB)
+    from PIL import Image
+
     canvas_background_image = Image.fromarray(frame_rgb)
     
     flag = False 
@@ -0,0 +1,286 @@
+import argparse
+import hashlib
+import json
+import re
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import settings
+
+FORMAT_VERSION = 1
+# LUT channels
+WORLD_X, WORLD_Y, OFFSHORE = 0, 1, 2
+
+
+class Calibration:
+    """
+    Ground-plane calibration of one camera.
+
+    A few reference points clicked in the image with their positions on the
+    beach in metres (from a site survey or a map) give the pixel -> ground
+    homography. The shoreline is clicked in the image as a polyline, plus one
+    point in the water so distances can be signed: positive out to sea,
+    negative up the beach.
+    """
+
+    def __init__(self, pixels, world, shoreline=None, water_point=None, frame_size=None, camera=None):
+        """
+        Args:
+        - pixels (list): At least four [(u, v), ...] reference points in frame pixels.
+        - world (list): The same points on the ground plane in metres [(x, y), ...].
+        - shoreline (list): Shoreline polyline in frame pixels [(u, v), ...].
+        - water_point (tuple): Any (u, v) pixel in the water.
+        - frame_size (tuple): (width, height) the pixels refer to (default is settings.CAPTURE_FRAME_SIZE).
+        - camera: Camera the calibration belongs to.
+        """
+        self.pixels = np.asarray(pixels, dtype=np.float64).reshape(-1, 2)
+        self.world = np.asarray(world, dtype=np.float64).reshape(-1, 2)
+        if len(self.pixels) < 4 or len(self.pixels) != len(self.world):
+            raise ValueError("A calibration needs at least four pixel/world point pairs")
+        self.shoreline = None if shoreline is None else np.asarray(shoreline, dtype=np.float64).reshape(-1, 2)
+        self.water_point = None if water_point is None else tuple(float(v) for v in water_point)
+        self.frame_size = tuple(frame_size or settings.CAPTURE_FRAME_SIZE)
+        self.camera = camera
+        self.homography, _ = cv2.findHomography(self.pixels, self.world, 0)
+        if self.homography is None:
+            raise ValueError("Degenerate calibration: the reference points must not be collinear")
+
+    def homography_for(self, frame_size):
+        """Pixel -> ground homography for frames of another (width, height)."""
+        sx = self.frame_size[0] / frame_size[0]
+        sy = self.frame_size[1] / frame_size[1]
+        return self.homography @ np.diag([sx, sy, 1.0])
+
+    def to_world(self, points):
+        """Maps (N, 2) frame pixels to ground-plane metres."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+        return cv2.perspectiveTransform(points, self.homography).reshape(-1, 2)
+
+    def reprojection_error(self):
+        """Mean distance in metres between the reference points and where the homography puts them."""
+        return float(np.linalg.norm(self.to_world(self.pixels) - self.world, axis=1).mean())
+
+    def key(self):
+        """Short hash of everything the lookup table depends on."""
+        return hashlib.sha256(json.dumps(self.to_dict(), sort_keys=True).encode()).hexdigest()[:12]
+
+    def to_dict(self):
+        return {
+            'version': FORMAT_VERSION,
+            'camera': None if self.camera is None else str(self.camera),
+            'frame_size': list(self.frame_size),
+            'pixels': self.pixels.tolist(),
+            'world': self.world.tolist(),
+            'shoreline': None if self.shoreline is None else self.shoreline.tolist(),
+            'water_point': None if self.water_point is None else list(self.water_point),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('version', FORMAT_VERSION) != FORMAT_VERSION:
+            raise ValueError(f"Unsupported calibration file version {data.get('version')}")
+        return cls(data['pixels'], data['world'], data.get('shoreline'), data.get('water_point'),
+                   data['frame_size'], data.get('camera'))
+
+    def save(self, path=None):
+        path = Path(path) if path is not None else calibration_path(self.camera)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix('.tmp')
+        temporary.write_text(json.dumps(self.to_dict(), indent=2))
+        temporary.replace(path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        return cls.from_dict(json.loads(Path(path).read_text()))
+
+    @classmethod
+    def for_camera(cls, camera):
+        """Loads the saved calibration of a camera, or returns None when it was never calibrated."""
+        path = calibration_path(camera)
+        return cls.load(path) if path.exists() else None
+
+
+def _slug(camera):
+    slug = re.sub(r'[^A-Za-z0-9_.-]+', '-', str(camera)).strip('-') or 'default'
+    return f'camera-{slug}' if str(camera).isdigit() else slug
+
+
+def calibration_path(camera):
+    """Returns the calibration file of a camera, e.g. calibration/camera-0.json."""
+    return Path(settings.CALIBRATION_DIR) / f'{_slug(camera)}.json'
+
+
+def _segment_distance(points, starts, ends):
+    """Distance of (P, 2) points to each of S segments and the signed side, as (P,) of the nearest segment."""
+    best = np.full(len(points), np.inf)
+    side = np.zeros(len(points))
+    for start, end in zip(starts, ends):
+        direction = end - start
+        length = max(float(direction @ direction), 1e-12)
+        offset = points - start
+        t = np.clip(offset @ direction / length, 0.0, 1.0)
+        distance = np.hypot(*(offset - t[:, None] * direction).T)
+        closer = distance < best
+        best[closer] = distance[closer]
+        side[closer] = np.sign(direction[0] * offset[closer, 1] - direction[1] * offset[closer, 0])
+    return best, side
+
+
+def build_lut(calibration, frame_size=None, max_range=None):
+    """
+    Computes the (H, W, 3) float32 ground lookup table of a calibration at a frame size.
+
+    Channels are world x and y in metres and the signed distance to the
+    shoreline (positive on the water side), or NaN for pixels at or above
+    the horizon and beyond `max_range` metres from the reference points.
+    Without a shoreline the distance channel is NaN.
+    """
+    width, height = frame_size or calibration.frame_size
+    max_range = max_range or settings.GROUND_MAX_RANGE_M
+    homography = calibration.homography_for((width, height))
+    lut = np.empty((height, width, 3), dtype=np.float32)
+
+    us = np.arange(width, dtype=np.float64)
+    # A band of rows at a time keeps the float64 intermediates small
+    rows = max(1, (1 << 18) // width)
+    shore, water_side = None, 1.0
+    if calibration.shoreline is not None and len(calibration.shoreline) >= 2:
+        shore = calibration.to_world(calibration.shoreline)
+        if calibration.water_point is not None:
+            water = calibration.to_world([calibration.water_point])
+            water_side = _segment_distance(water, shore[:-1], shore[1:])[1][0] or 1.0
+    center = calibration.world.mean(axis=0)
+    # The ground is where the projective w has the same sign as at the reference points
+    ground_sign = np.sign((np.column_stack([calibration.pixels, np.ones(len(calibration.pixels))])
+                           @ calibration.homography[2]).mean())
+
+    for top in range(0, height, rows):
+        vs = np.arange(top, min(top + rows, height), dtype=np.float64)
+        u, v = np.meshgrid(us, vs)
+        x = homography[0, 0] * u + homography[0, 1] * v + homography[0, 2]
+        y = homography[1, 0] * u + homography[1, 1] * v + homography[1, 2]
+        w = homography[2, 0] * u + homography[2, 1] * v + homography[2, 2]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x, y = x / w, y / w
+        # Above the horizon the projective divide flips sign; points close to it are numerically meaningless
+        invalid = (w * ground_sign <= 0) | (np.hypot(x - center[0], y - center[1]) > max_range)
+        x[invalid] = np.nan
+        y[invalid] = np.nan
+        band = lut[top:top + len(vs)]
+        band[..., WORLD_X] = x
+        band[..., WORLD_Y] = y
+        if shore is None:
+            band[..., OFFSHORE] = np.nan
+        else:
+            points = np.column_stack([x.ravel(), y.ravel()])
+            with np.errstate(invalid='ignore'):
+                distance, side = _segment_distance(points, shore[:-1], shore[1:])
+                band[..., OFFSHORE] = (distance * side * water_side).reshape(x.shape)
+    return lut
+
+
+class GroundLUT:
+    """
+    Precomputed pixel -> ground lookup for one camera at one frame size.
+
+    The table is built once per calibration and resolution, saved under
+    settings.GROUND_LUT_DIR keyed by both, and memory-mapped on later runs,
+    so startup costs a file open. Mapping any number of boxes to metres is
+    then one fancy-indexing gather at their foot points.
+    """
+
+    def __init__(self, calibration, frame_size=None, directory=None, cache=True):
+        """
+        Args:
+        - calibration (Calibration): The camera's calibration.
+        - frame_size (tuple): (width, height) of the frames the boxes refer to (default is the calibration's).
+        - directory (str or Path): Table cache directory (default is settings.GROUND_LUT_DIR).
+        - cache (bool): Load and save the table in `directory`.
+        """
+        self.calibration = calibration
+        self.frame_size = tuple(frame_size or calibration.frame_size)
+        width, height = self.frame_size
+        directory = Path(directory or settings.GROUND_LUT_DIR)
+        self.path = directory / f'{_slug(calibration.camera)}-{calibration.key()}-{width}x{height}.npy'
+        self.built = False
+        if cache and self.path.exists():
+            self.lut = np.load(self.path, mmap_mode='r')
+        else:
+            self.lut = build_lut(calibration, self.frame_size)
+            self.built = True
+            if cache:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                temporary = self.path.with_suffix('.tmp')
+                with open(temporary, 'wb') as f:
+                    np.save(f, self.lut)
+                temporary.replace(self.path)
+
+    @classmethod
+    def for_camera(cls, camera, frame_size=None):
+        """Returns the lookup table of a calibrated camera, or None when it has no calibration."""
+        calibration = Calibration.for_camera(camera)
+        return None if calibration is None else cls(calibration, frame_size)
+
+    def lookup(self, points):
+        """Returns (N, 3) [x, y, offshore] in metres for (N, 2) frame pixels."""
+        points = np.asarray(points).reshape(-1, 2)
+        width, height = self.frame_size
+        # Table cells hold integer pixel positions, so round to the nearest one
+        ix = np.clip((points[:, 0] + 0.5).astype(np.intp), 0, width - 1)
+        iy = np.clip((points[:, 1] + 0.5).astype(np.intp), 0, height - 1)
+        return self.lut[iy, ix]
+
+    def feet(self, boxes):
+        """Returns (N, 3) [x, y, offshore] in metres of the bottom-centre point of (N, 4) xyxy boxes."""
+        boxes = np.asarray(boxes).reshape(-1, 4)
+        return self.lookup(np.column_stack([(boxes[:, 0] + boxes[:, 2]) * 0.5, boxes[:, 3] - 1]))
+
+    def offshore(self, boxes):
+        """Signed metres from the shoreline of every box's feet: positive in the water, NaN beyond the horizon."""
+        return self.feet(boxes)[:, OFFSHORE]
+
+    def in_danger(self, boxes, distance=None):
+        """True for boxes standing at least `distance` metres out to sea (default is settings.DANGER_DISTANCE_M)."""
+        distance = settings.DANGER_DISTANCE_M if distance is None else distance
+        offshore = self.offshore(boxes)
+        return np.greater_equal(offshore, distance, where=~np.isnan(offshore), out=np.zeros(len(offshore), bool))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate a camera's ground plane and build its lookup table")
+    parser.add_argument('camera', help="Camera index, name or stream URL")
+    parser.add_argument('--point', nargs=4, type=float, action='append', metavar=('U', 'V', 'X', 'Y'),
+                        help="Reference point: frame pixel U V at ground position X Y metres (repeat, at least 4)")
+    parser.add_argument('--shoreline', nargs='+', type=float, metavar='UV', help="Shoreline pixels u1 v1 u2 v2 ...")
+    parser.add_argument('--water', nargs=2, type=float, metavar=('U', 'V'), help="Any pixel in the water")
+    parser.add_argument('--probe', nargs=2, type=float, action='append', metavar=('U', 'V'),
+                        help="Print the ground position and distance to shore of a pixel")
+    args = parser.parse_args()
+
+    calibration = Calibration.for_camera(args.camera)
+    if args.point:
+        points = np.array(args.point)
+        shoreline = np.reshape(args.shoreline, (-1, 2)) if args.shoreline else \
+            (calibration.shoreline if calibration is not None else None)
+        water = args.water or (calibration.water_point if calibration is not None else None)
+        calibration = Calibration(points[:, :2], points[:, 2:], shoreline, water, camera=args.camera)
+        print(f"Saved {calibration.save()}")
+    if calibration is None:
+        parser.error(f"camera {args.camera} has no calibration yet, pass at least four --point")
+    print(f"Reprojection error {calibration.reprojection_error():.2f} m")
+
+    started = time.perf_counter()
+    ground = GroundLUT(calibration)
+    print(f"Lookup table {ground.path} ({'built' if ground.built else 'loaded'} in "
+          f"{(time.perf_counter() - started) * 1000:.0f} ms)")
+    for u, v in args.probe or []:
+        x, y, offshore = ground.lookup([(u, v)])[0]
+        print(f"pixel ({u:.0f}, {v:.0f}) -> ({x:.1f}, {y:.1f}) m, {offshore:.1f} m from shore")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+import settings
+
+QUANTILES = (0.5, 0.95, 0.99)
+PREFIX = 'drowning'
+
+
+class RollingHistogram:
+    """
+    Fixed-size window of the most recent samples of one stage.
+
+    Samples go into a preallocated list (a plain list store is several times
+    cheaper than a NumPy scalar store), so recording allocates nothing;
+    percentiles are only computed when a snapshot is taken. No lock is
+    taken, so each histogram must have a single writer thread: stages
+    recorded per frame carry their camera label, and unlabelled ones
+    ('serial_write', 'serial_dispatch') come from the one alarm worker.
+    """
+
+    def __init__(self, window=None):
+        self.values = [0.0] * (window or settings.METRICS_WINDOW)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value):
+        self.values[self.count % len(self.values)] = value
+        self.count += 1
+        self.total += value
+
+    def quantiles(self, quantiles=QUANTILES):
+        filled = self.values[:min(self.count, len(self.values))]
+        if not filled:
+            return [0.0] * len(quantiles)
+        return np.quantile(np.array(filled), quantiles).tolist()
+
+
+class FrameRate:
+    """Frames per second over the last `window` seconds."""
+
+    def __init__(self, window=5.0):
+        self.window = window
+        self.stamps = deque()
+        self.count = 0
+
+    def tick(self, now):
+        self.stamps.append(now)
+        self.count += 1
+        while self.stamps[0] < now - self.window:
+            self.stamps.popleft()
+
+    def rate(self, now=None):
+        now = time.monotonic() if now is None else now
+        recent = [stamp for stamp in list(self.stamps) if stamp >= now - self.window]
+        if len(recent) < 2:
+            return 0.0
+        return (len(recent) - 1) / max(recent[-1] - recent[0], 1e-9)
+
+
+class _StageTimer:
+    __slots__ = ('registry', 'stage', 'camera', 'start')
+
+    def __init__(self, registry, stage, camera):
+        self.registry = registry
+        self.stage = stage
+        self.camera = camera
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.stage, time.perf_counter() - self.start, self.camera)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Registry:
+    """
+    Per-stage latency histograms and per-camera frame rates for the whole pipeline.
+
+    Stages are free-form names (capture, resize, model, nms, zone_scoring,
+    annotate, qt_handoff, serial_dispatch, ...) optionally labelled with a
+    camera. When disabled, `time` returns a shared no-op context manager and
+    `observe`/`tick` return straight away.
+    """
+
+    def __init__(self, enabled=None, window=None):
+        """
+        Args:
+        - enabled (bool): Record anything at all (default is settings.METRICS_ENABLED).
+        - window (int): Samples kept per stage (default is settings.METRICS_WINDOW).
+        """
+        self.enabled = settings.METRICS_ENABLED if enabled is None else enabled
+        self.window = window or settings.METRICS_WINDOW
+        self._histograms = {}
+        self._rates = {}
+
+    def time(self, stage, camera=None):
+        """Context manager that records the wall-clock duration of its block under `stage`."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, stage, camera)
+
+    def observe(self, stage, seconds, camera=None):
+        """Records one duration in seconds."""
+        if not self.enabled:
+            return
+        key = (stage, camera)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms.setdefault(key, RollingHistogram(self.window))
+        histogram.add(seconds)
+
+    def tick(self, camera, now=None):
+        """Counts one processed frame for a camera's FPS."""
+        if not self.enabled:
+            return
+        rate = self._rates.get(camera)
+        if rate is None:
+            rate = self._rates.setdefault(camera, FrameRate())
+        rate.tick(time.monotonic() if now is None else now)
+
+    def snapshot(self):
+        """
+        Returns the current statistics.
+
+        Returns:
+        - stats (dict): {'stages': {(stage, camera): {'count', 'sum', 'p50', 'p95', 'p99'}},
+          'fps': {camera: frames per second}}, durations in seconds.
+        """
+        stages = {}
+        for key, histogram in list(self._histograms.items()):
+            p50, p95, p99 = histogram.quantiles()
+            stages[key] = {'count': histogram.count, 'sum': histogram.total, 'p50': p50, 'p95': p95, 'p99': p99}
+        now = time.monotonic()
+        fps = {camera: rate.rate(now) for camera, rate in list(self._rates.items())}
+        return {'stages': stages, 'fps': fps}
+
+    def prometheus_text(self):
+        """Renders the snapshot in the Prometheus text exposition format (summaries plus an FPS gauge)."""
+        snapshot = self.snapshot()
+        lines = [
+            f'# HELP {PREFIX}_stage_seconds Per-stage latency over the last {self.window} samples.',
+            f'# TYPE {PREFIX}_stage_seconds summary',
+        ]
+        for (stage, camera), stats in sorted(snapshot['stages'].items(), key=lambda item: str(item[0])):
+            labels = _labels(stage=stage, camera=camera)
+            for quantile in QUANTILES:
+                value = stats[f'p{int(quantile * 100)}']
+                lines.append(f'{PREFIX}_stage_seconds{{{labels},quantile="{quantile}"}} {value:.6g}')
+            lines.append(f'{PREFIX}_stage_seconds_sum{{{labels}}} {stats["sum"]:.6g}')
+            lines.append(f'{PREFIX}_stage_seconds_count{{{labels}}} {stats["count"]}')
+        lines.append(f'# HELP {PREFIX}_camera_fps Frames processed per second.')
+        lines.append(f'# TYPE {PREFIX}_camera_fps gauge')
+        for camera, fps in sorted(snapshot['fps'].items(), key=lambda item: str(item[0])):
+            lines.append(f'{PREFIX}_camera_fps{{{_labels(camera=camera)}}} {fps:.3f}')
+        return '\n'.join(lines) + '\n'
+
+    def hud_lines(self, camera=None):
+        """Short text lines for the on-screen HUD: camera FPS, then p50/p95 per stage in milliseconds."""
+        snapshot = self.snapshot()
+        lines = []
+        if camera in snapshot['fps']:
+            lines.append(f"fps {snapshot['fps'][camera]:.1f}")
+        for (stage, stage_camera), stats in sorted(snapshot['stages'].items(), key=lambda item: str(item[0])):
+            if stage_camera not in (None, camera):
+                continue
+            lines.append(f"{stage:<15} p50 {stats['p50'] * 1000:6.1f}  p95 {stats['p95'] * 1000:6.1f} ms")
+        return lines
+
+    def reset(self):
+        self._histograms.clear()
+        self._rates.clear()
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels.items() if value is not None)
+
+
+class MetricsServer(threading.Thread):
+    """Serves `registry.prometheus_text()` at http://host:port/metrics for a local Prometheus scraper."""
+
+    def __init__(self, registry, port=None, host='127.0.0.1'):
+        super().__init__(daemon=True)
+        text = registry.prometheus_text
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, settings.METRICS_PORT if port is None else port), Handler)
+        self.port = self.server.server_address[1]
+
+    def run(self):
+        self.server.serve_forever(poll_interval=0.5)
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FileExporter(threading.Thread):
+    """
+    Periodically writes `registry.prometheus_text()` to a file, e.g. for node_exporter's textfile collector.
+
+    The file is replaced atomically so a scraper never reads half a snapshot.
+    """
+
+    def __init__(self, registry, path=None, interval=None):
+        super().__init__(daemon=True)
+        self.registry = registry
+        self.path = Path(path or settings.METRICS_FILE)
+        self.interval = interval or settings.METRICS_EXPORT_INTERVAL
+        self._stop_event = threading.Event()
+
+    def write(self):
+        temporary = self.path.with_suffix('.tmp')
+        temporary.write_text(self.registry.prometheus_text())
+        temporary.replace(self.path)
+
+    def run(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        while not self._stop_event.wait(self.interval):
+            self.write()
+        self.write()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def start_exporters(registry=None):
+    """Starts the HTTP endpoint and/or file exporter configured in settings; returns the started threads."""
+    registry = registry or metrics
+    exporters = []
+    if settings.METRICS_PORT is not None:
+        exporters.append(MetricsServer(registry))
+    if settings.METRICS_FILE is not None:
+        exporters.append(FileExporter(registry))
+    for exporter in exporters:
+        exporter.start()
+    return exporters
+
+
+# Shared registry for every pipeline stage
+metrics = Registry()
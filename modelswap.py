@@ -0,0 +1,207 @@
+import gc
+import sys
+import threading
+import time
+import weakref
+
+import numpy as np
+
+import settings
+from backends import warm_up
+
+PERSON_CLASS = 0
+
+
+def smoke_test(model, frame_size=None, **predict_kwargs):
+    """
+    Checks that a freshly loaded model produces well-formed person detections.
+
+    The model runs once on a synthetic beach frame (see synthetic.py); it
+    fails when the call raises, class 0 is not 'person' (everything
+    downstream filters on it), or the boxes, confidences and classes are
+    malformed.
+
+    Returns:
+    - count (int): Number of detections on the test frame.
+
+    Raises:
+    - RuntimeError: The model failed the test.
+    """
+    from synthetic import SyntheticBeach
+
+    frame, _ = SyntheticBeach(frame_size or settings.CAPTURE_FRAME_SIZE, people=settings.MODEL_SMOKE_PEOPLE).next()
+    predict_kwargs.setdefault('verbose', False)
+    try:
+        result = model(frame, **predict_kwargs)[0]
+        xyxy = np.asarray(result.boxes.xyxy.cpu().numpy())
+        confidence = np.asarray(result.boxes.conf.cpu().numpy())
+        class_id = np.asarray(result.boxes.cls.cpu().numpy())
+    except Exception as ex:
+        raise RuntimeError(f"inference failed: {ex}") from ex
+    names = getattr(result, 'names', None) or {}
+    if names.get(PERSON_CLASS) != 'person':
+        raise RuntimeError(f"class {PERSON_CLASS} is {names.get(PERSON_CLASS)!r}, not 'person'")
+    if xyxy.ndim != 2 or xyxy.shape[1] != 4 or not len(xyxy) == len(confidence) == len(class_id):
+        raise RuntimeError(f"malformed output: boxes {xyxy.shape}, confidences {confidence.shape}, classes {class_id.shape}")
+    if not np.isfinite(xyxy).all() or ((confidence < 0) | (confidence > 1)).any():
+        raise RuntimeError("boxes or confidences out of range")
+    return len(xyxy)
+
+
+def release_memory(collect=True):
+    """Collects unreachable models now instead of whenever the collector runs, and returns cached GPU memory."""
+    if collect:
+        gc.collect()
+    torch = sys.modules.get('torch')
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+class ModelManager:
+    """
+    Owns the detector's weights and swaps them while the stream keeps running.
+
+    `prepare` loads, warms up and smoke tests new weights, and is meant for a
+    background thread. `swap` then installs the model between two frames
+    through the `install` callback (e.g. VideoThread.set_model), which is a
+    plain attribute assignment, so the capture and display loop never waits
+    for it. The old model is kept until the new one has run for
+    settings.MODEL_SWAP_PROBATION seconds (`commit`), so a model that starts
+    failing on live frames can be rolled back (`rollback`). Models are
+    released as soon as they are retired: their memory is collected
+    immediately, and any model still referenced elsewhere is reported in
+    `stats` as unreleased.
+    """
+
+    def __init__(self, install=None, loader=None, frame_size=None):
+        """
+        Args:
+        - install (callable): install(model, path) makes a model the live one.
+        - loader (callable): loader(path) returns a model (default is helper.load_model).
+        - frame_size (tuple): (width, height) for warm-up and the smoke test (default is settings.CAPTURE_FRAME_SIZE).
+        """
+        self.install = install
+        self.loader = loader
+        self.frame_size = frame_size
+        self.current = self.path = None
+        self.previous = self.previous_path = None
+        self.generation = 0
+        self.swaps = self.rollbacks = self.rejected = 0
+        self.timings = {}
+        self._unreleased = []
+        self._lock = threading.Lock()
+
+    def prepare(self, path):
+        """
+        Loads, warms up and smoke tests a model without touching the live one.
+
+        Returns:
+        - model: The ready model, to pass to `swap`.
+
+        Raises:
+        - Exception: Loading or warm-up failed, or RuntimeError from the smoke test.
+        """
+        if self.loader is None:
+            import helper
+            self.loader = helper.load_model
+        started = time.perf_counter()
+        model = self.loader(path)
+        loaded = time.perf_counter()
+        # The first calls are several times slower than steady state, so pay for them before the first real frame
+        warm_up(model, self.frame_size, agnostic_nms=True)
+        warmed = time.perf_counter()
+        try:
+            smoke_test(model, self.frame_size, agnostic_nms=True)
+            error = None
+        except RuntimeError as ex:
+            # Only the message: the traceback would keep the rejected model alive
+            error = str(ex)
+        if error is not None:
+            self.rejected += 1
+            self._retire(model)
+            del model
+            self._collect()
+            raise RuntimeError(f"{path} failed the smoke test: {error}")
+        done = time.perf_counter()
+        self.timings = {'load_s': loaded - started, 'warmup_s': warmed - loaded, 'smoke_s': done - warmed}
+        return model
+
+    def swap(self, model, path=None):
+        """
+        Makes `model` the live one; the current model stays around for rollback until `commit`.
+
+        Returns:
+        - generation (int): Identifies this swap for `commit` and `rollback`.
+        """
+        with self._lock:
+            if self.previous is not None:
+                # Swapped again during probation: the model before last can go
+                self._retire(self.previous)
+            self.previous, self.previous_path = self.current, self.path
+            self.current, self.path = model, path
+            self.generation += 1
+            if self.previous is not None:
+                self.swaps += 1
+            if self.install is not None:
+                self.install(model, path)
+            self._collect()
+            return self.generation
+
+    def commit(self, generation=None):
+        """Releases the previous model once the swap `generation` has proven itself; stale calls are ignored."""
+        with self._lock:
+            if self.previous is None or (generation is not None and generation != self.generation):
+                return False
+            self._retire(self.previous)
+            self.previous = self.previous_path = None
+            self._collect()
+            return True
+
+    def rollback(self, generation=None):
+        """
+        Reinstalls the previous model and releases the current one.
+
+        Returns:
+        - model: The reinstated model, or None when there is nothing to roll back to.
+        """
+        with self._lock:
+            if self.previous is None or (generation is not None and generation != self.generation):
+                return None
+            self._retire(self.current)
+            self.current, self.path = self.previous, self.previous_path
+            self.previous = self.previous_path = None
+            self.generation += 1
+            self.rollbacks += 1
+            if self.install is not None:
+                self.install(self.current, self.path)
+            self._collect()
+            return self.current
+
+    def _retire(self, model):
+        # Tracked weakly, the caller drops its own references before _collect
+        self._unreleased.append(weakref.ref(model))
+
+    def _collect(self):
+        if not self._unreleased:
+            return
+        self._check_released()
+        # Most models go with their last reference; a full collection stalls every thread for tens of
+        # milliseconds, so it only runs for models kept alive by reference cycles
+        release_memory(collect=bool(self._unreleased))
+        self._check_released()
+
+    def _check_released(self):
+        # A model still reachable after a full collection is referenced somewhere (e.g. mid-inference on
+        # another thread); it is re-checked on every later collection
+        self._unreleased = [ref for ref in self._unreleased if ref() is not None]
+
+    def stats(self):
+        with self._lock:
+            self._check_released()
+            return {
+                'model_generation': self.generation,
+                'model_swaps': self.swaps,
+                'model_rollbacks': self.rollbacks,
+                'models_rejected': self.rejected,
+                'models_unreleased': len(self._unreleased),
+            }
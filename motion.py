@@ -0,0 +1,168 @@
+import time
+
+import cv2
+import numpy as np
+
+import settings
+from utils import box_iou
+
+FULL_MODE = 'full'
+MOTION_MODE = 'motion'
+
+
+class MotionGate:
+    """
+    Cheap change detector restricted to the danger zone.
+
+    Frames are downscaled and converted to grayscale into reused buffers, then
+    compared with the frame seen at the last detector run (not just the
+    previous frame, so slow drift still accumulates into motion). Only pixels
+    inside the zone mask count.
+    """
+
+    def __init__(self, zones=None, scale=None, threshold=None, min_fraction=None):
+        """
+        Args:
+        - zones (list): DangerZone objects; motion outside them is ignored (default: whole frame).
+        - scale (float): Downscale factor for the comparison (default is settings.MOTION_SCALE).
+        - threshold (int): Per-pixel grayscale difference that counts as change (default is settings.MOTION_THRESHOLD).
+        - min_fraction (float): Fraction of zone pixels that must change (default is settings.MOTION_MIN_FRACTION).
+        """
+        self.zones = zones or []
+        self.scale = scale or settings.MOTION_SCALE
+        self.threshold = threshold or settings.MOTION_THRESHOLD
+        self.min_fraction = settings.MOTION_MIN_FRACTION if min_fraction is None else min_fraction
+        self._prepared_key = None
+        self._small = None
+        self._gray = None
+        self._reference = None
+        self._diff = None
+        self._mask = None
+        self._mask_pixels = 0
+        self.last_fraction = 0.0
+
+    def _prepare(self, frame):
+        shape = frame.shape[:2]
+        key = (shape, getattr(self.zones, 'version', None))
+        if key == self._prepared_key:
+            return
+        self._prepared_key = key
+        height, width = max(int(shape[0] * self.scale), 1), max(int(shape[1] * self.scale), 1)
+        self._small = np.empty((height, width, 3), dtype=np.uint8)
+        self._gray = np.empty((height, width), dtype=np.uint8)
+        self._diff = np.empty((height, width), dtype=np.uint8)
+        self._reference = None
+        if self.zones:
+            mask = np.zeros(shape, dtype=np.uint8)
+            for zone in self.zones:
+                mask |= zone.mask(shape)
+            self._mask = cv2.resize(mask, (width, height), interpolation=cv2.INTER_NEAREST)
+        else:
+            self._mask = np.ones((height, width), dtype=np.uint8)
+        self._mask_pixels = max(int(self._mask.sum()), 1)
+
+    def moved(self, frame):
+        """Returns True when the zone changed noticeably since the last `reset`."""
+        self._prepare(frame)
+        cv2.resize(frame, (self._small.shape[1], self._small.shape[0]), dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        if self._reference is None:
+            return True
+        cv2.absdiff(self._gray, self._reference, dst=self._diff)
+        changed = np.count_nonzero((self._diff > self.threshold) & (self._mask > 0))
+        self.last_fraction = float(changed / self._mask_pixels)
+        return self.last_fraction >= self.min_fraction
+
+    def reset(self):
+        """Makes the most recently checked frame the new reference."""
+        if self._reference is None:
+            self._reference = self._gray.copy()
+        else:
+            np.copyto(self._reference, self._gray)
+
+
+class BoxPropagator:
+    """Carries the last detections forward between detector runs with a per-box constant-velocity model."""
+
+    def __init__(self, match_iou=0.3):
+        self.match_iou = match_iou
+        self.xyxy = np.zeros((0, 4), dtype=np.float32)
+        self.confidence = np.zeros(0, dtype=np.float32)
+        self.class_id = np.zeros(0, dtype=int)
+        self.velocity = np.zeros((0, 4), dtype=np.float32)
+        self.timestamp = None
+
+    def observe(self, xyxy, confidence, class_id, now):
+        """Stores fresh detector output and estimates velocities by IoU-matching the previous boxes."""
+        # Copied: the fast path's results are reused buffers (see fastpath.FastDetector)
+        xyxy = np.array(xyxy, dtype=np.float32).reshape(-1, 4)
+        velocity = np.zeros_like(xyxy)
+        if self.timestamp is not None and len(self.xyxy) and len(xyxy) and now > self.timestamp:
+            previous = self.predict(now)
+            ious = box_iou(xyxy, previous)
+            best = ious.argmax(axis=1)
+            matched = ious[np.arange(len(xyxy)), best] >= self.match_iou
+            velocity[matched] = (xyxy[matched] - self.xyxy[best[matched]]) / (now - self.timestamp)
+        self.xyxy = xyxy
+        self.confidence = np.array(confidence, dtype=np.float32)
+        self.class_id = np.array(class_id)
+        self.velocity = velocity
+        self.timestamp = now
+
+    def predict(self, now):
+        """Returns the boxes extrapolated to `now`."""
+        if self.timestamp is None:
+            return self.xyxy
+        return self.xyxy + self.velocity * (now - self.timestamp)
+
+
+class AdaptiveScheduler:
+    """
+    Decides per frame whether the full detector has to run.
+
+    The detector runs when the motion gate fires or when `refresh_interval`
+    seconds have passed since the last run; in between, the propagated boxes
+    of the last run are reused. Capture and inference rates are counted so the
+    effective inference FPS can be reported next to the capture FPS.
+    """
+
+    def __init__(self, zones=None, refresh_interval=None, gate=None):
+        self.gate = gate or MotionGate(zones)
+        self.refresh_interval = settings.MOTION_REFRESH_INTERVAL if refresh_interval is None else refresh_interval
+        self.propagator = BoxPropagator()
+        self.started = None
+        self.last_run = None
+        self.frames_seen = 0
+        self.frames_detected = 0
+
+    def should_detect(self, frame, now=None):
+        now = time.monotonic() if now is None else now
+        if self.started is None:
+            self.started = now
+        self.frames_seen += 1
+        moved = self.gate.moved(frame)
+        due = self.last_run is None or now - self.last_run >= self.refresh_interval
+        return moved or due
+
+    def observe(self, xyxy, confidence, class_id, now=None):
+        """Records a detector run on the frame last passed to should_detect."""
+        now = time.monotonic() if now is None else now
+        self.frames_detected += 1
+        self.last_run = now
+        self.gate.reset()
+        self.propagator.observe(xyxy, confidence, class_id, now)
+
+    def propagate(self, now=None):
+        """Returns (xyxy, confidence, class_id) carried forward to `now`."""
+        now = time.monotonic() if now is None else now
+        return self.propagator.predict(now), self.propagator.confidence, self.propagator.class_id
+
+    def stats(self, now=None):
+        now = time.monotonic() if now is None else now
+        elapsed = now - self.started if self.started is not None else 0.0
+        return {
+            'capture_fps': self.frames_seen / elapsed if elapsed > 0 else 0.0,
+            'inference_fps': self.frames_detected / elapsed if elapsed > 0 else 0.0,
+            'detector_ratio': self.frames_detected / self.frames_seen if self.frames_seen else 0.0,
+            'motion_fraction': self.gate.last_fraction,
+        }
@@ -0,0 +1,137 @@
+import time
+
+import cv2
+import numpy as np
+
+import settings
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+class OverlayRenderer:
+    """
+    Draws danger zones, boxes, labels and track IDs onto display-resolution frames.
+
+    Created once per stream. Label bitmaps are rendered once per
+    (class, confidence rounded to 2 decimals) and per track ID and then just
+    blitted, so the per-frame work is one rectangle and one slice copy per
+    detection. Colours match supervision's default BoxAnnotator palette.
+    """
+
+    def __init__(self, class_names, zones=None, thickness=2, text_scale=1.0, text_thickness=2,
+                 text_padding=10, enabled=None, max_glyphs=4096):
+        """
+        Args:
+        - class_names (dict): Model class names, e.g. `backends.class_names(model)`.
+        - zones (list): DangerZone objects in source-frame coordinates.
+        - thickness (int): Box line thickness in source-frame pixels.
+        - text_scale (float): Label font scale in source-frame pixels.
+        - text_thickness (int): Label stroke thickness.
+        - text_padding (int): Padding around label text.
+        - enabled (bool): Set False in headless modes to skip annotation entirely (default is settings.ANNOTATE).
+        - max_glyphs (int): Glyph cache size before it is flushed.
+        """
+        self.class_names = class_names
+        self.zones = zones or []
+        self.thickness = thickness
+        self.text_scale = text_scale
+        self.text_thickness = text_thickness
+        self.text_padding = text_padding
+        self.enabled = settings.ANNOTATE if enabled is None else enabled
+        self.max_glyphs = max_glyphs
+        import supervision as sv  # deferred: only the palette is needed and the import is slow
+
+        self.palette = sv.ColorPalette.default()
+
+        self._scale = None
+        self._glyphs = {}
+        self._zone_points = []
+        self._zones_version = None
+        self.glyph_misses = 0
+        self.seconds = 0.0
+        self.frames = 0
+
+    def _color(self, class_id):
+        return self.palette.by_idx(int(class_id)).as_bgr()
+
+    def _set_scale(self, scale):
+        """Rescales zone outlines when the display size or the zones change, and flushes glyphs with the size."""
+        zones_version = getattr(self.zones, 'version', None)
+        if scale == self._scale and zones_version == self._zones_version:
+            return
+        if scale != self._scale:
+            self._scale = scale
+            self._glyphs.clear()
+        self._zones_version = zones_version
+        self._zone_points = [np.round(zone.vertices * scale).astype(np.int32) for zone in self.zones]
+
+    def _glyph(self, key, text, color):
+        glyph = self._glyphs.get(key)
+        if glyph is None:
+            self.glyph_misses += 1
+            if len(self._glyphs) >= self.max_glyphs:
+                self._glyphs.clear()
+            font_scale = self.text_scale * self._scale
+            stroke = max(int(round(self.text_thickness * self._scale)), 1)
+            padding = max(int(round(self.text_padding * self._scale)), 1)
+            (text_width, text_height), _ = cv2.getTextSize(text, FONT, font_scale, stroke)
+            glyph = np.empty((text_height + 2 * padding, text_width + 2 * padding, 3), dtype=np.uint8)
+            glyph[:] = color
+            cv2.putText(glyph, text, (padding, padding + text_height), FONT, font_scale, (0, 0, 0), stroke, cv2.LINE_AA)
+            self._glyphs[key] = glyph
+        return glyph
+
+    @staticmethod
+    def _blit(frame, glyph, x, y):
+        """Copies a glyph with its bottom-left corner at (x, y), clipped to the frame."""
+        height, width = glyph.shape[:2]
+        top = y - height
+        x1, y1 = max(x, 0), max(top, 0)
+        x2, y2 = min(x + width, frame.shape[1]), min(y, frame.shape[0])
+        if x2 > x1 and y2 > y1:
+            frame[y1:y2, x1:x2] = glyph[y1 - top:y2 - top, x1 - x:x2 - x]
+
+    def render(self, frame, detections, scale=1.0):
+        """
+        Draws everything onto `frame` in place.
+
+        Args:
+        - frame (numpy array): Display-resolution BGR frame.
+        - detections (sv.Detections): Detections in source-frame coordinates.
+        - scale (float): Display size divided by source size.
+
+        Returns:
+        The same frame.
+        """
+        if not self.enabled:
+            return frame
+        start = time.perf_counter()
+        self._set_scale(scale)
+        if self._zone_points:
+            cv2.polylines(frame, self._zone_points, True, (0, 0, 255), max(int(round(self.thickness * scale)), 1))
+
+        if detections is not None and len(detections):
+            boxes = np.round(detections.xyxy * scale).astype(np.int32)
+            confidences = np.round(detections.confidence * 100).astype(np.int32)
+            tracker_ids = detections.tracker_id
+            thickness = max(int(round(self.thickness * scale)), 1)
+            for i, ((x1, y1, x2, y2), confidence, class_id) in enumerate(zip(boxes.tolist(), confidences.tolist(),
+                                                                            detections.class_id.tolist())):
+                color = self._color(class_id)
+                cv2.rectangle(frame, (x1, y1), (x2, y2), color, thickness)
+                label = self._glyph((class_id, confidence), f"{self.class_names[class_id]} {confidence / 100:0.2f}", color)
+                self._blit(frame, label, x1, y1)
+                if tracker_ids is not None and tracker_ids[i] >= 0:
+                    track = self._glyph(('track', int(tracker_ids[i])), f"#{int(tracker_ids[i])}", color)
+                    self._blit(frame, track, x1, y2 + track.shape[0])
+
+        self.frames += 1
+        self.seconds += time.perf_counter() - start
+        return frame
+
+    def stats(self):
+        return {
+            'annotate_ms': self.seconds * 1000 / max(self.frames, 1),
+            'glyphs_cached': len(self._glyphs),
+            'glyph_misses': self.glyph_misses,
+        }
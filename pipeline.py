@@ -0,0 +1,429 @@
+import argparse
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+import settings
+from backends import class_names, warm_up
+from capture import is_file_source
+
+# Per-camera counters kept in shared memory
+DECODED, DROPPED, INFERRED = range(3)
+
+
+class SharedArray:
+    """A NumPy array backed by a named `multiprocessing.shared_memory` block."""
+
+    def __init__(self, shape, dtype, name=None):
+        """
+        Args:
+        - shape (tuple): Array shape.
+        - dtype: Array dtype.
+        - name (str): Attach to an existing block instead of creating one.
+        """
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        size = max(int(np.prod(self.shape)) * self.dtype.itemsize, 1)
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf)
+        if self.owner:
+            self.array.fill(0)
+
+    @property
+    def spec(self):
+        """Picklable (shape, dtype, name) to re-attach in another process."""
+        return self.shape, self.dtype.str, self.shm.name
+
+    @classmethod
+    def attach(cls, spec):
+        shape, dtype, name = spec
+        return cls(shape, dtype, name)
+
+    def close(self):
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _decoder_main(camera, source, spec, free_slots, work, stop, realtime, loop):
+    """
+    Decoder process: reads one source and resizes frames straight into free shared-memory slots.
+
+    When every slot of the camera is still in use downstream the frame is only
+    grabbed, never decoded, and counted as dropped, so a slow consumer never
+    makes the decoder fall behind the source.
+    """
+    frames, owners, counters = (SharedArray.attach(part) for part in spec)
+    height, width = frames.shape[2:4]
+    pid = os.getpid()
+    capture = cv2.VideoCapture(source)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    period = 1.0 / fps if realtime else 0.0
+    next_deadline = time.monotonic()
+    sequence = 0
+    raw = None
+    try:
+        while not stop.is_set():
+            if not capture.grab():
+                if loop and is_file_source(source):
+                    capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    if capture.grab():
+                        continue
+                break
+            captured_at = time.monotonic()
+            sequence += 1
+            try:
+                slot = free_slots.get_nowait()
+            except queue.Empty:
+                counters.array[camera, DROPPED] += 1
+            else:
+                owners.array[camera, slot] = pid
+                ret, raw = capture.retrieve(raw)
+                if not ret:
+                    owners.array[camera, slot] = 0
+                    free_slots.put(slot)
+                    break
+                cv2.resize(raw, (width, height), dst=frames.array[camera, slot])
+                counters.array[camera, DECODED] += 1
+                owners.array[camera, slot] = 0
+                work.put((camera, slot, sequence, captured_at))
+
+            if period:
+                next_deadline += period
+                delay = next_deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_deadline = time.monotonic()
+    finally:
+        capture.release()
+        for part in (frames, owners, counters):
+            part.close()
+
+
+def _inference_main(spec, model_factory, work, results, predict_kwargs, classes):
+    """
+    Inference process: runs the model on frames referenced by slot index and sends back only the boxes.
+
+    The frame itself stays in its slot until the consumer releases it.
+    """
+    frames, owners, counters = (SharedArray.attach(part) for part in spec)
+    pid = os.getpid()
+    model = model_factory()
+    names = class_names(model)
+    if not names:
+        # Exported models on older ultralytics versions only know their classes after the first call
+        warm_up(model, (frames.shape[3], frames.shape[2]), runs=1, **predict_kwargs)
+        names = class_names(model)
+    results.put(('ready', pid, names))
+    try:
+        while True:
+            item = work.get()
+            if item is None:
+                break
+            camera, slot, sequence, captured_at = item
+            owners.array[camera, slot] = pid
+            result = model(frames.array[camera, slot], **predict_kwargs)[0]
+            boxes = result.boxes
+            xyxy = boxes.xyxy.cpu().numpy().astype(np.float32)
+            confidence = boxes.conf.cpu().numpy().astype(np.float32)
+            class_id = boxes.cls.cpu().numpy().astype(np.int16)
+            if classes is not None:
+                keep = np.isin(class_id, classes)
+                xyxy, confidence, class_id = xyxy[keep], confidence[keep], class_id[keep]
+            counters.array[camera, INFERRED] += 1
+            owners.array[camera, slot] = 0
+            results.put(('frame', camera, slot, sequence, captured_at, xyxy, confidence, class_id))
+    finally:
+        for part in (frames, owners, counters):
+            part.close()
+
+
+class PipelineFrame:
+    """
+    One processed frame handed to the consumer.
+
+    `frame` is a view into shared memory: use it (draw, convert, copy) and
+    then call `release` so the decoder can reuse the slot.
+    """
+
+    __slots__ = ('pipeline', 'camera', 'slot', 'sequence', 'captured_at', 'frame', 'xyxy', 'confidence', 'class_id')
+
+    def __init__(self, pipeline, camera, slot, sequence, captured_at, xyxy, confidence, class_id):
+        self.pipeline = pipeline
+        self.camera = camera
+        self.slot = slot
+        self.sequence = sequence
+        self.captured_at = captured_at
+        self.frame = pipeline.frames.array[pipeline.camera_index[camera], slot]
+        self.xyxy = xyxy
+        self.confidence = confidence
+        self.class_id = class_id
+
+    def release(self):
+        if self.slot is not None:
+            self.pipeline.release(self.camera, self.slot)
+            self.slot = None
+            self.frame = None
+
+
+class ProcessPipeline:
+    """
+    Multi-process decode and inference for N cameras, sidestepping the GIL.
+
+    One decoder process per camera writes resized frames into a fixed set of
+    shared-memory slots; a pool of inference processes picks up slot indices
+    from a shared work queue and returns only the detection arrays. The
+    consumer (the UI process) reads the frame straight from the slot and
+    releases it afterwards. A supervisor thread restarts crashed processes and
+    reclaims the slots they held.
+    """
+
+    def __init__(self, sources, model_factory, workers=None, slots=None, frame_size=None, realtime=True,
+                 loop=False, classes=(0,), start_method=None, **predict_kwargs):
+        """
+        Args:
+        - sources (dict): Mapping of camera name to camera index, RTSP URL or video path.
+        - model_factory (callable): Picklable callable returning a model, run once in every inference process,
+          e.g. functools.partial(helper.load_model, settings.DETECTION_MODEL).
+        - workers (int): Inference processes (default is settings.PIPELINE_WORKERS).
+        - slots (int): Shared-memory frame slots per camera (default is settings.PIPELINE_SLOTS).
+        - frame_size (tuple): (width, height) frames are resized to (default is settings.CAPTURE_FRAME_SIZE).
+        - realtime (bool): Pace file sources at their native FPS.
+        - loop (bool): Restart file sources at the end instead of finishing.
+        - classes (tuple): Class IDs to keep, or None for all.
+        - start_method (str): multiprocessing start method (default is settings.PIPELINE_START_METHOD).
+        - predict_kwargs: Extra keyword arguments for every model call.
+        """
+        self.sources = dict(sources)
+        self.cameras = list(self.sources)
+        self.camera_index = {name: i for i, name in enumerate(self.cameras)}
+        self.model_factory = model_factory
+        self.worker_count = workers or settings.PIPELINE_WORKERS
+        self.slot_count = slots or settings.PIPELINE_SLOTS
+        width, height = frame_size or settings.CAPTURE_FRAME_SIZE
+        self.realtime = realtime
+        self.loop = loop
+        self.classes = None if classes is None else np.asarray(classes)
+        predict_kwargs.setdefault('verbose', False)
+        self.predict_kwargs = predict_kwargs
+        self.context = multiprocessing.get_context(start_method or settings.PIPELINE_START_METHOD)
+
+        count = len(self.cameras)
+        self.frames = SharedArray((count, self.slot_count, height, width, 3), np.uint8)
+        self.owners = SharedArray((count, self.slot_count), np.int64)
+        self.counters = SharedArray((count, 3), np.int64)
+        self.free_slots = [self.context.Queue() for _ in self.cameras]
+        for free in self.free_slots:
+            for slot in range(self.slot_count):
+                free.put(slot)
+        self.work = self.context.Queue()
+        self.results = self.context.Queue()
+        self.stop_event = self.context.Event()
+
+        self.decoders = {}
+        self.inference = []
+        self.names = {}
+        self.restarts = 0
+        self.stale_results = 0
+        self._latest = {}
+        self._decoder_started = {}
+        # Camera -> last restart delay, and -> time of the pending restart
+        self._decoder_backoff = {}
+        self._decoder_retry = {}
+        self._supervisor = None
+        self._running = False
+        self._final_stats = None
+
+    @property
+    def _spec(self):
+        return self.frames.spec, self.owners.spec, self.counters.spec
+
+    def _start_decoder(self, name):
+        camera = self.camera_index[name]
+        process = self.context.Process(
+            target=_decoder_main, daemon=True, name=f'decoder-{name}',
+            args=(camera, self.sources[name], self._spec, self.free_slots[camera], self.work, self.stop_event,
+                  self.realtime, self.loop),
+        )
+        process.start()
+        self.decoders[name] = process
+        self._decoder_started[name] = time.monotonic()
+
+    def _start_worker(self, index=None):
+        process = self.context.Process(
+            target=_inference_main, daemon=True, name='inference',
+            args=(self._spec, self.model_factory, self.work, self.results, self.predict_kwargs, self.classes),
+        )
+        process.start()
+        if index is None:
+            self.inference.append(process)
+        else:
+            self.inference[index] = process
+
+    def start(self):
+        self._running = True
+        for _ in range(self.worker_count):
+            self._start_worker()
+        for name in self.cameras:
+            self._start_decoder(name)
+        self._supervisor = threading.Thread(target=self._supervise, daemon=True)
+        self._supervisor.start()
+
+    def _reclaim(self, pid):
+        """Returns the slots a dead process was holding to their cameras' free lists."""
+        for camera, slot in zip(*np.nonzero(self.owners.array == pid)):
+            self.owners.array[camera, slot] = 0
+            self.free_slots[camera].put(int(slot))
+
+    def _supervise(self):
+        while self._running:
+            time.sleep(settings.PIPELINE_SUPERVISE_INTERVAL)
+            if not self._running:
+                break
+            for index, process in enumerate(self.inference):
+                if not process.is_alive() and process.exitcode != 0:
+                    print(f"Inference worker {process.pid} died ({process.exitcode}), restarting")
+                    self._reclaim(process.pid)
+                    self._start_worker(index)
+                    self.restarts += 1
+            for name, process in list(self.decoders.items()):
+                if process.is_alive() or self._played_to_end(name):
+                    continue
+                # A live decoder also exits cleanly when its camera or stream stops delivering frames; it is
+                # reopened with the same exponential backoff as capture.CaptureWorker's reconnects
+                now = time.monotonic()
+                if name not in self._decoder_retry:
+                    previous = self._decoder_backoff.get(name)
+                    ran_for = now - self._decoder_started[name]
+                    if previous is None or ran_for >= settings.CAPTURE_RECONNECT_MAX:
+                        delay = settings.CAPTURE_RECONNECT_BASE
+                    else:
+                        delay = min(previous * 2, settings.CAPTURE_RECONNECT_MAX)
+                    self._decoder_backoff[name] = delay
+                    self._decoder_retry[name] = now + delay
+                    print(f"Decoder for {name} stopped ({process.exitcode}), restarting in {delay:.1f} s")
+                if now < self._decoder_retry[name]:
+                    continue
+                del self._decoder_retry[name]
+                self._reclaim(process.pid)
+                self._start_decoder(name)
+                self.restarts += 1
+
+    def _played_to_end(self, name):
+        """A file decoder that exits cleanly has reached the end of its file; live sources never end."""
+        process = self.decoders[name]
+        return not process.is_alive() and process.exitcode == 0 and is_file_source(self.sources[name])
+
+    def get(self, timeout=None):
+        """
+        Returns the next processed frame as a PipelineFrame, or None on timeout.
+
+        Results that arrive after a newer frame of the same camera was already
+        returned are released and skipped, so frames never go back in time.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                message = self.results.get(timeout=remaining)
+            except queue.Empty:
+                return None
+            if message[0] == 'ready':
+                self.names = message[2]
+                continue
+            _, camera, slot, sequence, captured_at, xyxy, confidence, class_id = message
+            name = self.cameras[camera]
+            # Capture times come from the system-wide monotonic clock, so they stay ordered across decoder restarts
+            if captured_at <= self._latest.get(name, 0.0):
+                self.stale_results += 1
+                self.free_slots[camera].put(slot)
+                continue
+            self._latest[name] = captured_at
+            return PipelineFrame(self, name, slot, sequence, captured_at, xyxy, confidence, class_id)
+
+    def release(self, camera, slot):
+        self.free_slots[self.camera_index[camera]].put(slot)
+
+    @property
+    def finished(self):
+        """True when every source is a file that has played to the end; live sources are restarted instead."""
+        return all(self._played_to_end(name) for name in self.decoders)
+
+    def stats(self):
+        if self.counters.array is None:
+            # Stopped: the shared counters are gone, report their final values
+            return self._final_stats
+        return {
+            'restarts': self.restarts,
+            'stale_results': self.stale_results,
+            'cameras': {
+                name: {
+                    'frames_decoded': int(self.counters.array[i, DECODED]),
+                    'frames_dropped': int(self.counters.array[i, DROPPED]),
+                    'frames_inferred': int(self.counters.array[i, INFERRED]),
+                }
+                for i, name in enumerate(self.cameras)
+            },
+        }
+
+    def stop(self):
+        self._running = False
+        self.stop_event.set()
+        for _ in self.inference:
+            self.work.put(None)
+        for process in list(self.decoders.values()) + self.inference:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        if self._supervisor is not None:
+            self._supervisor.join()
+        self._final_stats = self.stats()
+        for part in (self.frames, self.owners, self.counters):
+            part.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-process decode and inference over the configured sources")
+    parser.add_argument('--workers', type=int, default=settings.PIPELINE_WORKERS, help="Inference processes")
+    parser.add_argument('--slots', type=int, default=settings.PIPELINE_SLOTS, help="Frame slots per camera")
+    parser.add_argument('--conf', type=float, default=0.2)
+    parser.add_argument('--no-videos', action='store_true', help="Only use the RTSP cameras from settings")
+    args = parser.parse_args()
+
+    import functools
+    import helper
+    from scheduler import default_sources
+
+    factory = functools.partial(helper.load_model, settings.DETECTION_MODEL)
+    pipeline = ProcessPipeline(default_sources(not args.no_videos), factory, workers=args.workers,
+                               slots=args.slots, conf=args.conf, agnostic_nms=True)
+    pipeline.start()
+    started = time.monotonic()
+    processed = 0
+    try:
+        while not pipeline.finished:
+            item = pipeline.get(timeout=1.0)
+            if item is None:
+                continue
+            item.release()
+            processed += 1
+            if processed % 100 == 0:
+                print(f"{processed / (time.monotonic() - started):.1f} fps {pipeline.stats()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.stop()
+
+
+if __name__ == "__main__":
+    main()
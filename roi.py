@@ -0,0 +1,127 @@
+import numpy as np
+
+import settings
+from metrics import metrics
+from utils import nms
+
+ROI_MODE = 'roi'
+
+
+def zone_roi(zones, frame_shape, margin=None):
+    """
+    Returns the (x1, y1, x2, y2) crop covering all danger zones plus a margin, clipped to the frame.
+
+    Args:
+    - zones (list): DangerZone objects; with no zones the whole frame is returned.
+    - frame_shape (tuple): (height, width, ...) of the frame.
+    - margin (int): Pixels added on every side (default is settings.ROI_MARGIN).
+    """
+    height, width = frame_shape[:2]
+    if not zones:
+        return 0, 0, width, height
+    margin = settings.ROI_MARGIN if margin is None else margin
+    bounds = np.array([zone.bounds for zone in zones])
+    x1 = max(int(np.floor(bounds[:, 0].min())) - margin, 0)
+    y1 = max(int(np.floor(bounds[:, 1].min())) - margin, 0)
+    x2 = min(int(np.ceil(bounds[:, 2].max())) + margin, width)
+    y2 = min(int(np.ceil(bounds[:, 3].max())) + margin, height)
+    return x1, y1, x2, y2
+
+
+def tile_grid(roi, tile_size, overlap=0):
+    """
+    Splits a crop into native-resolution tiles of at most tile_size x tile_size.
+
+    Tiles overlap by at least `overlap` pixels and are spread evenly, so every
+    tile keeps the full size when the crop allows it.
+
+    Returns:
+    - tiles (list): (x1, y1, x2, y2) rectangles in frame coordinates.
+    """
+    x1, y1, x2, y2 = roi
+
+    def starts(low, high):
+        if high - low <= tile_size:
+            return [low]
+        step = max(tile_size - overlap, 1)
+        count = int(np.ceil((high - low - overlap) / step))
+        return [int(round(position)) for position in np.linspace(low, high - tile_size, count)]
+
+    return [(x, y, min(x + tile_size, x2), min(y + tile_size, y2))
+            for y in starts(y1, y2) for x in starts(x1, x2)]
+
+
+class RoiDetector:
+    """
+    Runs the detector only on the danger zone's bounding box, optionally tiled at native resolution.
+
+    All tiles of a frame go through one batched model call. Boxes are shifted
+    back to full-frame coordinates and merged with class-agnostic cross-tile
+    NMS. Crops are NumPy views, so no pixels are copied before the model.
+    """
+
+    def __init__(self, model, zones, margin=None, tile_size=None, overlap=None, iou_threshold=None, **predict_kwargs):
+        """
+        Args:
+        - model (YoloV8): A YOLOv8 object detection model.
+        - zones (list): DangerZone objects in frame coordinates.
+        - margin (int): Pixels around the zones' bounding box (default is settings.ROI_MARGIN).
+        - tile_size (int): Native tile size, 0 for a single crop (default is settings.ROI_TILE_SIZE).
+        - overlap (int): Overlap between tiles (default is settings.ROI_TILE_OVERLAP).
+        - iou_threshold (float): Cross-tile NMS threshold (default is settings.ROI_NMS_IOU).
+        - predict_kwargs: Extra keyword arguments for the model call (e.g. conf, classes).
+        """
+        self.model = model
+        self.zones = zones
+        self.margin = margin
+        self.tile_size = settings.ROI_TILE_SIZE if tile_size is None else tile_size
+        self.overlap = settings.ROI_TILE_OVERLAP if overlap is None else overlap
+        self.iou_threshold = iou_threshold or settings.ROI_NMS_IOU
+        predict_kwargs.setdefault('verbose', False)
+        predict_kwargs.setdefault('agnostic_nms', True)
+        self.predict_kwargs = predict_kwargs
+        self._layout_key = None
+        self.tiles = []
+        self.pixels_per_frame = 0
+
+    def _layout(self, frame_shape):
+        # Zones are rescaled in place when the frame size changes (ZoneSet.fit), so their version is part of the key
+        key = (frame_shape[:2], getattr(self.zones, 'version', None))
+        if key == self._layout_key:
+            return
+        self._layout_key = key
+        roi = zone_roi(self.zones, frame_shape, self.margin)
+        self.tiles = tile_grid(roi, self.tile_size, self.overlap) if self.tile_size else [roi]
+        self.pixels_per_frame = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in self.tiles)
+
+    def detect(self, frame, camera=None):
+        """
+        Detects objects inside the danger-zone crop.
+
+        Args:
+        - frame (numpy array): BGR frame.
+        - camera (str): Camera label for the stage timers.
+
+        Returns:
+        - (xyxy, confidence, class_id) NumPy arrays in full-frame coordinates.
+        """
+        self._layout(frame.shape)
+        crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in self.tiles]
+        with metrics.time('model', camera):
+            results = self.model(crops, **self.predict_kwargs)
+
+        boxes, scores, classes = [], [], []
+        for (x1, y1, _, _), result in zip(self.tiles, results):
+            detected = result.boxes
+            boxes.append(detected.xyxy.cpu().numpy() + np.array([x1, y1, x1, y1], dtype=np.float32))
+            scores.append(detected.conf.cpu().numpy())
+            classes.append(detected.cls.cpu().numpy().astype(int))
+        xyxy = np.concatenate(boxes) if boxes else np.zeros((0, 4), dtype=np.float32)
+        confidence = np.concatenate(scores) if scores else np.zeros(0, dtype=np.float32)
+        class_id = np.concatenate(classes) if classes else np.zeros(0, dtype=int)
+
+        if len(self.tiles) > 1 and len(xyxy):
+            with metrics.time('nms', camera):
+                keep = nms(xyxy, confidence, self.iou_threshold)
+                xyxy, confidence, class_id = xyxy[keep], confidence[keep], class_id[keep]
+        return xyxy, confidence, class_id
@@ -0,0 +1,195 @@
+import argparse
+import threading
+import time
+from collections import deque
+
+import settings
+import helper
+from capture import CaptureWorker, LatencyTracker
+
+
+class CameraStats:
+    """Per-camera counters maintained by the BatchScheduler."""
+
+    def __init__(self, window=120):
+        self.frames_processed = 0
+        self.result_times = deque(maxlen=window)
+        self.latency = LatencyTracker()
+        self.queue_depth = 0
+        self.dropped_frames = 0
+
+    def record(self, captured_at, now):
+        self.frames_processed += 1
+        self.result_times.append(now)
+        self.latency.add(captured_at, now)
+
+    @property
+    def fps(self):
+        if len(self.result_times) < 2:
+            return 0.0
+        span = self.result_times[-1] - self.result_times[0]
+        return (len(self.result_times) - 1) / span if span > 0 else 0.0
+
+    def as_dict(self):
+        stats = {
+            'frames_processed': self.frames_processed,
+            'fps': self.fps,
+            'queue_depth': self.queue_depth,
+            'dropped_frames': self.dropped_frames,
+        }
+        stats.update(self.latency.stats())
+        return stats
+
+
+class BatchScheduler(threading.Thread):
+    """
+    Runs the newest frame of N camera/video sources through one shared model as a single batched call.
+
+    A batch is dispatched as soon as `batch_size` sources have a fresh frame, or
+    `max_wait` seconds after the first fresh frame arrived, whichever comes
+    first. Larger batches raise throughput; a smaller `max_wait` bounds latency.
+    """
+
+    def __init__(self, model, sources, batch_size=None, max_wait=None, on_result=None, opener=None,
+                 **predict_kwargs):
+        """
+        Args:
+        - model (YoloV8): A YOLOv8 model from `helper.load_model`, shared by all sources.
+        - sources (dict): Mapping of camera name to camera index, RTSP URL or video path.
+        - batch_size (int): Maximum frames per model call (default is settings.BATCH_SIZE).
+        - max_wait (float): Seconds to wait for a full batch (default is settings.BATCH_MAX_WAIT).
+        - on_result (callable): Called as on_result(name, frame, result) for every frame processed.
+        - opener (callable): Capture factory passed to every CaptureWorker (e.g. capture.StreamEmulator).
+        - predict_kwargs: Extra keyword arguments passed to every model call (e.g. conf, agnostic_nms).
+        """
+        super().__init__(daemon=True)
+        self.model = model
+        self.batch_size = batch_size or settings.BATCH_SIZE
+        self.max_wait = settings.BATCH_MAX_WAIT if max_wait is None else max_wait
+        self.on_result = on_result
+        self.predict_kwargs = predict_kwargs
+        predict_kwargs.setdefault('verbose', False)
+
+        self._frame_event = threading.Event()
+        self.workers = {}
+        for name, source in sources.items():
+            worker = CaptureWorker(source, opener=opener)
+            worker.ring.on_commit = self._frame_event.set
+            self.workers[name] = worker
+        self.camera_stats = {name: CameraStats() for name in self.workers}
+        self.batches_run = 0
+        self.frames_batched = 0
+        self._names = list(self.workers)
+        self._next_start = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        for worker in self.workers.values():
+            worker.start()
+        try:
+            while not self._stop_event.is_set():
+                batch = self._collect_batch()
+                if not batch:
+                    if all(worker.ring.closed for worker in self.workers.values()):
+                        break
+                    continue
+
+                names = [name for name, _, _ in batch]
+                frames = [frame for _, frame, _ in batch]
+                results = self.model(frames, **self.predict_kwargs)
+                now = time.monotonic()
+                self.batches_run += 1
+                self.frames_batched += len(batch)
+
+                for (name, frame, captured_at), result in zip(batch, results):
+                    self.camera_stats[name].record(captured_at, now)
+                    if self.on_result is not None:
+                        self.on_result(name, frame, result)
+        finally:
+            for worker in self.workers.values():
+                worker.stop()
+            # Capture threads must be gone before the scheduler counts as stopped
+            for worker in self.workers.values():
+                worker.join()
+
+    def _collect_batch(self):
+        """Gathers up to batch_size fresh frames, one per source, rotating the start for fairness."""
+        batch = {}
+        deadline = None
+        count = len(self._names)
+        start = self._next_start
+        self._next_start = (start + 1) % max(count, 1)
+        while not self._stop_event.is_set():
+            # Clear before scanning so a frame committed mid-scan still wakes us up
+            self._frame_event.clear()
+            for offset in range(count):
+                name = self._names[(start + offset) % count]
+                if name in batch:
+                    continue
+                ring = self.workers[name].ring
+                self.camera_stats[name].queue_depth = ring.pending
+                frame, captured_at, _ = ring.read_latest(timeout=0)
+                self.camera_stats[name].dropped_frames = ring.dropped_frames
+                if frame is not None:
+                    batch[name] = (name, frame, captured_at)
+                    if len(batch) >= self.batch_size:
+                        return list(batch.values())
+
+            now = time.monotonic()
+            if batch and deadline is None:
+                deadline = now + self.max_wait
+            if deadline is not None and now >= deadline:
+                break
+            if not batch and all(worker.ring.closed for worker in self.workers.values()):
+                break
+            self._frame_event.wait(None if deadline is None else deadline - now)
+        return list(batch.values())
+
+    def stop(self):
+        self._stop_event.set()
+        self._frame_event.set()
+
+    def stats(self):
+        """Returns per-camera FPS/queue-depth stats plus the overall mean batch size."""
+        return {
+            'batches_run': self.batches_run,
+            'mean_batch_size': self.frames_batched / self.batches_run if self.batches_run else 0.0,
+            'cameras': {name: stats.as_dict() for name, stats in self.camera_stats.items()},
+        }
+
+
+def default_sources(include_videos=True):
+    """Returns the configured RTSP cameras plus, optionally, the stored videos in settings.VIDEOS_DICT."""
+    sources = dict(settings.CAMERA_SOURCES)
+    if include_videos:
+        sources.update({name: str(path) for name, path in settings.VIDEOS_DICT.items()})
+    return sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched multi-camera detection on a shared model")
+    parser.add_argument('--batch-size', type=int, default=settings.BATCH_SIZE)
+    parser.add_argument('--max-wait', type=float, default=settings.BATCH_MAX_WAIT)
+    parser.add_argument('--conf', type=float, default=0.2)
+    parser.add_argument('--no-videos', action='store_true', help="Only use the RTSP cameras from settings")
+    args = parser.parse_args()
+
+    model = helper.load_model(settings.DETECTION_MODEL)
+    scheduler = BatchScheduler(model, default_sources(not args.no_videos), batch_size=args.batch_size,
+                               max_wait=args.max_wait, conf=args.conf, agnostic_nms=True)
+    scheduler.start()
+    try:
+        while scheduler.is_alive():
+            scheduler.join(5)
+            stats = scheduler.stats()
+            print(f"batches={stats['batches_run']} mean_batch={stats['mean_batch_size']:.2f}")
+            for name, camera in stats['cameras'].items():
+                print(f"  {name}: fps={camera['fps']:.1f} queue={camera['queue_depth']} "
+                      f"dropped={camera['dropped_frames']} latency_p95={camera['latency_p95_ms']:.0f}ms")
+    except KeyboardInterrupt:
+        scheduler.stop()
+        scheduler.join()
+
+
+if __name__ == "__main__":
+    main()
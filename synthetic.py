@@ -0,0 +1,262 @@
+import argparse
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import settings
+
+PERSON_CLASS = 0
+# Clothing colours (BGR) kept in the red hue band so the stub model can segment them from water and sand
+CLOTHING = ((30, 30, 200), (40, 20, 170), (60, 40, 220), (20, 10, 150))
+
+
+class SyntheticBeach:
+    """
+    Procedural stand-in for the beach footage in settings.VIDEOS_DICT, which is not checked in.
+
+    Textured water scrolls above a slanted shoreline with sand below it, and
+    person-like blobs (a body ellipse and a head) random-walk across both,
+    larger towards the bottom of the frame for a rough perspective. Everything
+    is seeded, so the same arguments always give the same frames and
+    ground-truth boxes.
+    """
+
+    def __init__(self, frame_size=(1280, 650), fps=25.0, people=10, seed=0):
+        """
+        Args:
+        - frame_size (tuple): (width, height) of the frames.
+        - fps (float): Frame rate; person speeds are in pixels per second.
+        - people (int): Crowd density, the number of people in the scene.
+        - seed (int): Random seed.
+        """
+        self.frame_size = tuple(frame_size)
+        self.fps = fps
+        self.rng = np.random.default_rng(seed)
+        width, height = self.frame_size
+
+        # Shoreline from 65% of the height on the left to 45% on the right
+        self.shore_left, self.shore_right = 0.65 * height, 0.45 * height
+        noise = self.rng.integers(0, 255, (height + 64, width + 64), dtype=np.uint8)
+        noise = cv2.GaussianBlur(noise, (0, 0), 3)
+        self.water = cv2.merge([
+            cv2.add(noise // 3, 120), cv2.add(noise // 4, 80), cv2.add(noise // 8, 20),
+        ])
+        sand = np.empty((height, width, 3), dtype=np.uint8)
+        sand[:] = (140, 190, 215)
+        self.sand = cv2.add(sand, cv2.merge([noise[:height, :width] // 12] * 3))
+        columns = np.arange(width)
+        shore = self.shore_left + (self.shore_right - self.shore_left) * columns / max(width - 1, 1)
+        self.sand_mask = (np.arange(height)[:, None] >= shore[None, :]).astype(np.uint8)
+
+        self.positions = np.column_stack([
+            self.rng.uniform(0.05 * width, 0.95 * width, people),
+            self.rng.uniform(0.25 * height, 0.95 * height, people),
+        ])
+        self.velocities = self.rng.normal(0, 25, (people, 2))
+        self.colors = [CLOTHING[i % len(CLOTHING)] for i in range(people)]
+        self.index = 0
+        self._frame = np.empty((height, width, 3), dtype=np.uint8)
+
+    def shoreline_zone(self):
+        """The water polygon above the shoreline, in frame pixels, usable as a danger zone."""
+        width = self.frame_size[0]
+        return [(0, 0), (width, 0), (width, self.shore_right), (0, self.shore_left)]
+
+    def _person_size(self, y):
+        height = self.frame_size[1]
+        scale = 0.4 + 0.6 * y / height
+        return 16 * scale * height / 650, 48 * scale * height / 650
+
+    def _step(self):
+        width, height = self.frame_size
+        self.velocities += self.rng.normal(0, 10, self.velocities.shape) / self.fps
+        np.clip(self.velocities, -60, 60, out=self.velocities)
+        self.positions += self.velocities / self.fps
+        low = np.array([0.02 * width, 0.2 * height])
+        high = np.array([0.98 * width, 0.98 * height])
+        bounced = (self.positions < low) | (self.positions > high)
+        self.velocities[bounced] *= -1
+        np.clip(self.positions, low, high, out=self.positions)
+
+    def next(self):
+        """
+        Renders the next frame.
+
+        Returns:
+        - frame (numpy array): BGR frame; the same buffer is reused, copy it to keep it.
+        - boxes (numpy array): (N, 4) ground-truth person boxes in xyxy format.
+        """
+        width, height = self.frame_size
+        offset = self.index % 64
+        frame = self._frame
+        np.copyto(frame, self.water[offset:offset + height, offset // 2:offset // 2 + width])
+        np.copyto(frame, self.sand, where=self.sand_mask[:, :, None].astype(bool))
+
+        boxes = np.empty((len(self.positions), 4), dtype=np.float32)
+        for i, ((x, y), color) in enumerate(zip(self.positions, self.colors)):
+            body_width, body_height = self._person_size(y)
+            head = body_width * 0.45
+            center = (int(x), int(y - body_height / 2))
+            cv2.ellipse(frame, center, (int(body_width / 2), int(body_height / 2 - head)), 0, 0, 360, color, -1)
+            cv2.circle(frame, (int(x), int(y - body_height + head)), int(head), color, -1)
+            boxes[i] = (x - body_width / 2, y - body_height, x + body_width / 2, y)
+        np.clip(boxes, 0, [width, height, width, height], out=boxes)
+
+        self.index += 1
+        self._step()
+        return frame, boxes
+
+    def frames(self, count):
+        for _ in range(count):
+            yield self.next()
+
+
+def write_video(path, frame_size=(1280, 650), fps=25.0, seconds=10.0, people=10, seed=0):
+    """
+    Renders a SyntheticBeach clip to an MP4 file.
+
+    Returns:
+    - boxes (list): Ground-truth (N, 4) boxes of every frame.
+    """
+    scene = SyntheticBeach(frame_size, fps, people, seed)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, scene.frame_size)
+    boxes = []
+    try:
+        for frame, frame_boxes in scene.frames(int(seconds * fps)):
+            writer.write(frame)
+            boxes.append(frame_boxes)
+    finally:
+        writer.release()
+    return boxes
+
+
+class _Array:
+    """Mimics the torch tensor calls used on ultralytics results (.cpu().numpy())."""
+
+    def __init__(self, values):
+        self.values = values
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.values
+
+
+class _Boxes:
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = _Array(xyxy)
+        self.conf = _Array(conf)
+        self.cls = _Array(cls)
+        self.id = None
+
+    def __len__(self):
+        return len(self.xyxy.values)
+
+
+class _Result:
+    def __init__(self, boxes, names):
+        self.boxes = boxes
+        self.names = names
+
+
+class _StubBackend:
+    """
+    Mimics ultralytics' AutoBackend: letterboxed (1, 3, H, W) RGB input in, raw (1, 5, anchors) predictions out.
+
+    Like the real head, every person is reported by a few neighbouring
+    anchors with slightly shifted boxes and lower scores, which NMS has to
+    merge.
+    """
+    pt = True
+    stride = 32
+    fp16 = False
+    device = None
+
+    def __init__(self, stub, duplicates=3):
+        self.stub = stub
+        self.duplicates = duplicates
+
+    def __call__(self, image):
+        planes = np.asarray(image)[0]
+        frame = cv2.convertScaleAbs(cv2.merge([planes[2], planes[1], planes[0]]), alpha=255)
+        xyxy, confidence = self.stub._segment(frame)
+        height, width = frame.shape[:2]
+        anchors = sum((height // stride) * (width // stride) for stride in (8, 16, 32))
+        predictions = np.zeros((1, 5, anchors), dtype=np.float32)
+        count = min(len(xyxy), anchors // self.duplicates)
+        for copy in range(self.duplicates):
+            columns = slice(copy * count, (copy + 1) * count)
+            size = xyxy[:count, 2:] - xyxy[:count, :2]
+            shifted = xyxy[:count] + 0.03 * copy * np.hstack([size, size])
+            predictions[0, 0:2, columns] = ((shifted[:, :2] + shifted[:, 2:]) / 2).T
+            predictions[0, 2:4, columns] = (shifted[:, 2:] - shifted[:, :2]).T
+            predictions[0, 4, columns] = confidence[:count] * (1 - 0.1 * copy)
+        return predictions
+
+
+class _StubPredictor:
+    def __init__(self, model):
+        self.model = model
+
+
+class StubModel:
+    """
+    Tiny CPU-only stand-in for the YOLO detector, for benchmarks on machines without the weights.
+
+    Segments the synthetic people's clothing by colour and returns one box per
+    blob, wrapped like ultralytics Results so `sv.Detections.from_yolov8`,
+    RoiDetector and analyze.detect_batch work unchanged.
+    """
+
+    def __init__(self, min_area=20):
+        self.names = {PERSON_CLASS: 'person'}
+        self.model = self  # mirrors YOLO.model, which backends.class_names also looks at
+        # fastpath.FastDetector drives the raw network through the predictor, as on a warmed-up YOLO model
+        self.predictor = _StubPredictor(_StubBackend(self))
+        self.min_area = min_area
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+
+    def _segment(self, frame):
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        mask = cv2.inRange(hsv, (0, 120, 80), (8, 255, 255)) | cv2.inRange(hsv, (172, 120, 80), (180, 255, 255))
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, self._kernel)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+        stats = stats[1:]
+        stats = stats[stats[:, cv2.CC_STAT_AREA] >= self.min_area]
+        x, y = stats[:, cv2.CC_STAT_LEFT], stats[:, cv2.CC_STAT_TOP]
+        w, h = stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT]
+        xyxy = np.column_stack([x, y, x + w, y + h]).astype(np.float32)
+        confidence = np.clip(stats[:, cv2.CC_STAT_AREA] / np.maximum(w * h, 1) + 0.2, 0, 1).astype(np.float32)
+        return xyxy, confidence
+
+    def _detect(self, frame, conf):
+        xyxy, confidence = self._segment(frame)
+        keep = confidence >= conf
+        cls = np.full(int(keep.sum()), PERSON_CLASS, dtype=np.float32)
+        return _Result(_Boxes(xyxy[keep], confidence[keep], cls), self.names)
+
+    def __call__(self, source, conf=0.25, **kwargs):
+        frames = source if isinstance(source, list) else [source]
+        return [self._detect(frame, conf) for frame in frames]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a synthetic beach clip for benchmarks")
+    parser.add_argument('output', help="MP4 file to write")
+    parser.add_argument('--size', default=f'{settings.CAPTURE_FRAME_SIZE[0]}x{settings.CAPTURE_FRAME_SIZE[1]}',
+                        help="Resolution as WIDTHxHEIGHT")
+    parser.add_argument('--fps', type=float, default=25.0)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--people', type=int, default=10, help="Crowd density")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    width, height = (int(value) for value in args.size.lower().split('x'))
+    boxes = write_video(args.output, (width, height), args.fps, args.seconds, args.people, args.seed)
+    print(f"Wrote {len(boxes)} frames to {Path(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
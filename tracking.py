@@ -0,0 +1,92 @@
+import time
+
+import numpy as np
+
+import settings
+from utils import box_iou
+
+
+class IouTracker:
+    """
+    Gives detections persistent track IDs by greedy IoU matching between frames.
+
+    Every track keeps a constant-velocity estimate of its box (as
+    motion.BoxPropagator does), so a swimmer moving between detector runs is
+    matched against where it should be now, not where it was last seen. The
+    most overlapping detection/track pairs are matched first. Detections left
+    over start new tracks, and tracks unseen for settings.TRACK_TTL seconds
+    are dropped. IDs only ever increase, so the breach engine never sees an
+    ID come back for a different person.
+    """
+
+    def __init__(self, match_iou=None, track_ttl=None):
+        """
+        Args:
+        - match_iou (float): Minimum IoU between a detection and a track's predicted box (default is settings.TRACK_MATCH_IOU).
+        - track_ttl (float): Seconds after which an unseen track is dropped (default is settings.TRACK_TTL).
+        """
+        self.match_iou = settings.TRACK_MATCH_IOU if match_iou is None else match_iou
+        self.track_ttl = settings.TRACK_TTL if track_ttl is None else track_ttl
+        self.track_ids = np.zeros(0, dtype=np.int64)
+        self.xyxy = np.zeros((0, 4), dtype=np.float64)
+        self.velocity = np.zeros((0, 4), dtype=np.float64)
+        self.last_seen = np.zeros(0)
+        self.next_id = 1
+
+    def __len__(self):
+        return len(self.track_ids)
+
+    def predict(self, now):
+        """Returns every track's box extrapolated to `now`."""
+        return self.xyxy + self.velocity * (now - self.last_seen)[:, None]
+
+    def update(self, xyxy, now=None):
+        """
+        Matches one frame's detections to the tracks.
+
+        Args:
+        - xyxy (numpy array): (N, 4) boxes in xyxy format.
+        - now (float): Frame timestamp in seconds (default is time.monotonic()).
+
+        Returns:
+        - track_ids (numpy array): (N,) int64 track ID of every detection.
+        """
+        now = time.monotonic() if now is None else now
+        xyxy = np.asarray(xyxy, dtype=np.float64).reshape(-1, 4)
+        keep = now - self.last_seen <= self.track_ttl
+        if not keep.all():
+            self.track_ids, self.xyxy = self.track_ids[keep], self.xyxy[keep]
+            self.velocity, self.last_seen = self.velocity[keep], self.last_seen[keep]
+
+        track_of = np.full(len(xyxy), -1, dtype=np.intp)
+        if len(xyxy) and len(self.track_ids):
+            ious = box_iou(xyxy, self.predict(now))
+            taken = np.zeros(len(self.track_ids), dtype=bool)
+            for flat in np.argsort(-ious, axis=None):
+                detection, track = divmod(int(flat), ious.shape[1])
+                if ious[detection, track] < self.match_iou:
+                    break
+                if track_of[detection] < 0 and not taken[track]:
+                    track_of[detection] = track
+                    taken[track] = True
+
+        matched = track_of >= 0
+        tracks = track_of[matched]
+        elapsed = now - self.last_seen[tracks]
+        moving = elapsed > 0
+        self.velocity[tracks[moving]] = ((xyxy[matched][moving] - self.xyxy[tracks[moving]])
+                                         / elapsed[moving][:, None])
+        self.xyxy[tracks] = xyxy[matched]
+        self.last_seen[tracks] = now
+
+        ids = np.empty(len(xyxy), dtype=np.int64)
+        ids[matched] = self.track_ids[tracks]
+        new = np.flatnonzero(~matched)
+        if len(new):
+            ids[new] = np.arange(self.next_id, self.next_id + len(new))
+            self.next_id += len(new)
+            self.track_ids = np.concatenate([self.track_ids, ids[new]])
+            self.xyxy = np.concatenate([self.xyxy, xyxy[new]])
+            self.velocity = np.concatenate([self.velocity, np.zeros((len(new), 4))])
+            self.last_seen = np.concatenate([self.last_seen, np.full(len(new), now)])
+        return ids
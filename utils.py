@@ -1,3 +1,7 @@
+import cv2
+import numpy as np
+
+
 def calculate_iou(box, polygon, bottom_percent=0.1):
     """
     Calculate IoU between the bottom 10% of a bounding box (xyxy format) and a polygon.
@@ -33,3 +37,262 @@ def calculate_iou(box, polygon, bottom_percent=0.1):
     # Calculate IoU
     iou = intersection_area / (bottom_10_percent_height * (x2 - x1) + polygon_area - intersection_area)
     return iou
+
+
+class DangerZone:
+    """
+    A danger-zone polygon with everything needed for scoring precomputed once.
+
+    Holds the vertices, edge vectors and shoelace area of an arbitrary-vertex
+    polygon. The rasterized mask is built lazily once per frame shape.
+    """
+
+    def __init__(self, polygon, name=None):
+        """
+        Args:
+        - polygon (list): List of coordinates [(x1, y1), (x2, y2), ...] representing the polygon.
+        - name (str): Optional zone name.
+        """
+        self.vertices = np.asarray(polygon, dtype=np.float64).reshape(-1, 2)
+        if len(self.vertices) < 3:
+            raise ValueError("A danger zone needs at least 3 vertices")
+        self.name = name
+        self.edges = np.roll(self.vertices, -1, axis=0) - self.vertices
+        x, y = self.vertices[:, 0], self.vertices[:, 1]
+        self.area = 0.5 * abs(np.sum(x * self.edges[:, 1] - self.edges[:, 0] * y))
+        self.bounds = (x.min(), y.min(), x.max(), y.max())
+        self._masks = {}
+
+    @classmethod
+    def from_flat(cls, dz_box, name=None):
+        """Builds a zone from a flat (x1, y1, x2, y2, ...) tuple such as DZ_BOX."""
+        return cls(np.asarray(dz_box).reshape(-1, 2), name=name)
+
+    def mask(self, frame_shape):
+        """Returns the rasterized uint8 mask of the zone for a (height, width) frame, cached per shape."""
+        key = tuple(frame_shape[:2])
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = np.zeros(key, dtype=np.uint8)
+            cv2.fillPoly(mask, [np.round(self.vertices).astype(np.int32)], 1)
+            self._masks[key] = mask
+        return mask
+
+    def contains_points(self, points, frame_shape):
+        """Vectorized point-in-zone test for an (N, 2) array of pixel coordinates using the raster mask."""
+        mask = self.mask(frame_shape)
+        points = np.asarray(points)
+        xs = np.clip(points[:, 0].astype(np.intp), 0, mask.shape[1] - 1)
+        ys = np.clip(points[:, 1].astype(np.intp), 0, mask.shape[0] - 1)
+        return mask[ys, xs].astype(bool)
+
+
+def foot_regions(boxes, bottom_percent=0.1):
+    """
+    Returns the bottom `bottom_percent` strip of each box as an (N, 4) xyxy array.
+
+    Args:
+    - boxes (numpy array): (N, 4) bounding boxes in xyxy format.
+    - bottom_percent (float): The percentage of the bounding box's height to use (default is 0.1).
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    strips = boxes.copy()
+    strips[:, 1] = boxes[:, 3] - bottom_percent * (boxes[:, 3] - boxes[:, 1])
+    return strips
+
+
+def _next_vertex(values):
+    """Column-wise rotate by one (cheaper than np.roll for 2-D rows)."""
+    return np.concatenate((values[:, 1:], values[:, :1]), axis=1)
+
+
+def _clip_polygons(xs, ys, bound, axis, keep_greater):
+    """
+    One Sutherland-Hodgman pass of many padded polygons against axis-aligned half-planes.
+
+    Polygons are rows of (M,) vertex arrays padded by repeating their last
+    vertex, which adds zero-length edges that change neither the clip nor the
+    shoelace area. Empty results are returned as all-zero rows.
+    """
+    coord = xs if axis == 0 else ys
+    bound = bound[:, None]
+    inside = coord >= bound if keep_greater else coord <= bound
+
+    next_xs = _next_vertex(xs)
+    next_ys = _next_vertex(ys)
+    next_coord = next_xs if axis == 0 else next_ys
+    next_inside = _next_vertex(inside)
+
+    delta = next_coord - coord
+    t = (bound - coord) / np.where(delta == 0, 1, delta)
+    cross_xs = xs + t * (next_xs - xs)
+    cross_ys = ys + t * (next_ys - ys)
+
+    # Each edge emits its crossing point (if it crosses) followed by its end vertex (if inside)
+    rows, size = xs.shape
+    out_xs = np.empty((rows, 2 * size))
+    out_ys = np.empty((rows, 2 * size))
+    valid = np.empty((rows, 2 * size), dtype=bool)
+    out_xs[:, 0::2], out_xs[:, 1::2] = cross_xs, next_xs
+    out_ys[:, 0::2], out_ys[:, 1::2] = cross_ys, next_ys
+    valid[:, 0::2], valid[:, 1::2] = inside != next_inside, next_inside
+
+    # Compact the emitted vertices to the left of each row
+    counts = valid.sum(axis=1)
+    width = max(int(counts.max()), 1)
+    row_index, col_index = np.nonzero(valid)
+    position = np.cumsum(valid, axis=1)[row_index, col_index] - 1
+    packed_xs = np.zeros((rows, width))
+    packed_ys = np.zeros((rows, width))
+    packed_xs[row_index, position] = out_xs[row_index, col_index]
+    packed_ys[row_index, position] = out_ys[row_index, col_index]
+
+    # Pad every row with its own last vertex (empty rows stay all-zero)
+    last = np.maximum(counts - 1, 0)[:, None]
+    pad = np.arange(width)[None, :] > last
+    out_xs = np.where(pad, np.take_along_axis(packed_xs, last, axis=1), packed_xs)
+    out_ys = np.where(pad, np.take_along_axis(packed_ys, last, axis=1), packed_ys)
+    return out_xs, out_ys
+
+
+def _shoelace(xs, ys):
+    return 0.5 * np.abs(np.sum(xs * _next_vertex(ys) - _next_vertex(xs) * ys, axis=1))
+
+
+def zone_iou(boxes, zones, bottom_percent=0.1):
+    """
+    Batched version of `calculate_iou`: scores all boxes of a frame against all danger zones at once.
+
+    The foot strip of every box is intersected with the actual zone polygon
+    (not its bounding rectangle), so slanted shorelines are scored exactly.
+
+    Args:
+    - boxes (numpy array): (N, 4) bounding boxes in xyxy format.
+    - zones (list): DangerZone objects (or polygons, which are wrapped on the fly).
+    - bottom_percent (float): The percentage of the bounding box's height to use (default is 0.1).
+
+    Returns:
+    - IoU (numpy array): (N, Z) Intersection over Union values.
+    """
+    zones = [zone if isinstance(zone, DangerZone) else DangerZone(zone) for zone in zones]
+    strips = foot_regions(boxes, bottom_percent)
+    n, z = len(strips), len(zones)
+    if n == 0 or z == 0:
+        return np.zeros((n, z))
+
+    # Stack the zones padded to a common vertex count, then pair every strip with every zone
+    size = max(len(zone.vertices) for zone in zones)
+    vertices = np.empty((z, size, 2))
+    for i, zone in enumerate(zones):
+        vertices[i, :len(zone.vertices)] = zone.vertices
+        vertices[i, len(zone.vertices):] = zone.vertices[-1]
+    xs = np.broadcast_to(vertices[None, :, :, 0], (n, z, size)).reshape(n * z, size)
+    ys = np.broadcast_to(vertices[None, :, :, 1], (n, z, size)).reshape(n * z, size)
+    rect = np.repeat(strips, z, axis=0)
+
+    xs, ys = _clip_polygons(xs, ys, rect[:, 0], 0, True)
+    xs, ys = _clip_polygons(xs, ys, rect[:, 2], 0, False)
+    xs, ys = _clip_polygons(xs, ys, rect[:, 1], 1, True)
+    xs, ys = _clip_polygons(xs, ys, rect[:, 3], 1, False)
+    intersection = _shoelace(xs, ys).reshape(n, z)
+
+    strip_area = ((strips[:, 2] - strips[:, 0]) * (strips[:, 3] - strips[:, 1]))[:, None]
+    zone_area = np.array([zone.area for zone in zones])[None, :]
+    union = strip_area + zone_area - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+def box_iou(boxes_a, boxes_b):
+    """
+    Pairwise IoU between two sets of xyxy boxes.
+
+    Args:
+    - boxes_a (numpy array): (N, 4) boxes in xyxy format.
+    - boxes_b (numpy array): (M, 4) boxes in xyxy format.
+
+    Returns:
+    - IoU (numpy array): (N, M) Intersection over Union values.
+    """
+    boxes_a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+def average_precision(predictions, references, iou_threshold=0.5):
+    """
+    VOC-style all-point average precision of predictions against reference boxes.
+
+    Args:
+    - predictions (list): Per image (boxes (N, 4), scores (N,)) tuples.
+    - references (list): Per image (M, 4) reference boxes.
+    - iou_threshold (float): Minimum IoU for a prediction to match a reference (default is 0.5).
+
+    Returns:
+    - AP (float): Area under the precision/recall curve.
+    """
+    total_references = sum(len(boxes) for boxes in references)
+    if total_references == 0:
+        return 1.0 if sum(len(scores) for _, scores in predictions) == 0 else 0.0
+
+    scores_all, hits_all = [], []
+    for (boxes, scores), reference in zip(predictions, references):
+        order = np.argsort(-np.asarray(scores))
+        ious = box_iou(np.asarray(boxes)[order], reference)
+        matched = np.zeros(len(reference), dtype=bool)
+        hits = np.zeros(len(order), dtype=bool)
+        for i in range(len(order)):
+            if ious.shape[1] == 0:
+                break
+            candidates = np.where(~matched, ious[i], 0)
+            best = int(np.argmax(candidates))
+            if candidates[best] >= iou_threshold:
+                matched[best] = True
+                hits[i] = True
+        scores_all.append(np.asarray(scores)[order])
+        hits_all.append(hits)
+
+    scores_all = np.concatenate(scores_all)
+    hits_all = np.concatenate(hits_all)[np.argsort(-scores_all, kind='stable')]
+    true_positives = np.cumsum(hits_all)
+    recall = true_positives / total_references
+    precision = true_positives / np.arange(1, len(hits_all) + 1)
+    # Precision envelope, integrated over recall steps
+    recall = np.concatenate(([0.0], recall, [1.0]))
+    precision = np.concatenate(([1.0], precision, [0.0]))
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    steps = np.where(recall[1:] != recall[:-1])[0]
+    return float(np.sum((recall[steps + 1] - recall[steps]) * precision[steps + 1]))
+
+
+def nms(boxes, scores, iou_threshold=0.5):
+    """
+    Greedy class-agnostic non-maximum suppression.
+
+    Args:
+    - boxes (numpy array): (N, 4) boxes in xyxy format.
+    - scores (numpy array): (N,) confidence scores.
+    - iou_threshold (float): Boxes overlapping a kept box by more than this are dropped.
+
+    Returns:
+    - keep (numpy array): Indices of the kept boxes, highest score first.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    order = np.argsort(-np.asarray(scores))
+    areas = np.prod(boxes[:, 2:] - boxes[:, :2], axis=1)
+    keep = []
+    while len(order):
+        best = order[0]
+        keep.append(best)
+        rest = order[1:]
+        top_left = np.maximum(boxes[best, :2], boxes[rest, :2])
+        bottom_right = np.minimum(boxes[best, 2:], boxes[rest, 2:])
+        intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=1)
+        iou = intersection / np.maximum(areas[best] + areas[rest] - intersection, 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.intp)
@@ -0,0 +1,255 @@
+import argparse
+import json
+import re
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import settings
+from utils import DangerZone, foot_regions
+
+FORMAT_VERSION = 1
+
+
+class ZoneSet:
+    """
+    Named danger zones of one camera, compiled into summed-area tables for scoring.
+
+    Every zone is rasterized once into a binary mask and its integral image
+    (cv2.integral), so the zone area inside any axis-aligned rectangle, and
+    therefore inside a box's foot strip, takes a fixed number of table lookups
+    no matter how many vertices the polygon has. Tables are only rebuilt when a
+    zone is edited or the frame size changes.
+
+    Iterating a ZoneSet yields its DangerZone objects, so it can be passed
+    wherever a list of zones is expected (overlay, motion gate, ROI detector).
+    """
+
+    def __init__(self, zones=None, camera=None, frame_size=None):
+        """
+        Args:
+        - zones (dict): Zone name -> polygon [(x1, y1), (x2, y2), ...] or DangerZone.
+        - camera (str): Camera name or source the zones belong to.
+        - frame_size (tuple): (width, height) the zone coordinates refer to (default is settings.CAPTURE_FRAME_SIZE).
+        """
+        self.camera = camera
+        self.frame_size = tuple(frame_size or settings.CAPTURE_FRAME_SIZE)
+        self._zones = {}
+        self._version = 0
+        self._compiled_key = None
+        self._tables = None
+        self._areas = None
+        self.compilations = 0
+        for name, polygon in (zones or {}).items():
+            self.set(name, polygon)
+
+    def __iter__(self):
+        return iter(self._zones.values())
+
+    def __len__(self):
+        return len(self._zones)
+
+    def __getitem__(self, name):
+        return self._zones[name]
+
+    def __contains__(self, name):
+        return name in self._zones
+
+    @property
+    def names(self):
+        return list(self._zones)
+
+    @property
+    def version(self):
+        """Changes whenever a zone is added, edited, removed or rescaled."""
+        return self._version
+
+    def set(self, name, polygon):
+        """Adds or replaces a zone; the tables are recompiled on the next query."""
+        zone = polygon if isinstance(polygon, DangerZone) else DangerZone(polygon, name=name)
+        zone.name = name
+        self._zones[name] = zone
+        self._version += 1
+
+    def remove(self, name):
+        del self._zones[name]
+        self._version += 1
+
+    def compile(self, frame_shape=None):
+        """
+        Builds the (Z, H + 1, W + 1) int32 summed-area tables for a frame shape if they are stale.
+
+        Args:
+        - frame_shape (tuple): (height, width, ...) of the frames being scored (default is self.frame_size).
+        """
+        if frame_shape is None:
+            frame_shape = (self.frame_size[1], self.frame_size[0])
+        height, width = frame_shape[:2]
+        key = (height, width, self._version)
+        if key == self._compiled_key:
+            return self._tables
+
+        tables = np.empty((len(self._zones), height + 1, width + 1), dtype=np.int32)
+        mask = np.empty((height, width), dtype=np.uint8)
+        for i, zone in enumerate(self._zones.values()):
+            mask.fill(0)
+            cv2.fillPoly(mask, [np.round(zone.vertices).astype(np.int32)], 1)
+            cv2.integral(mask, tables[i], sdepth=cv2.CV_32S)
+        self._tables = tables
+        self._areas = tables[:, -1, -1].astype(np.float64)
+        self._compiled_key = key
+        self.compilations += 1
+        return tables
+
+    def overlap(self, boxes, frame_shape=None, bottom_percent=0.1):
+        """
+        Zone area inside the foot strip of every box, in pixels.
+
+        Corners are looked up with bilinear interpolation of the summed-area
+        table, which is exact for the raster mask at sub-pixel coordinates, so
+        thin strips are not distorted by rounding to whole pixels.
+
+        Returns:
+        - overlap (numpy array): (N, Z) zone area inside each strip.
+        - strip_area (numpy array): (N,) area of every strip after clipping to the frame.
+        """
+        tables = self.compile(frame_shape)
+        height, width = tables.shape[1] - 1, tables.shape[2] - 1
+        strips = foot_regions(boxes, bottom_percent)
+        x1 = np.clip(strips[:, 0], 0, width)
+        x2 = np.clip(strips[:, 2], 0, width)
+        y1 = np.clip(strips[:, 1], 0, height)
+        y2 = np.clip(strips[:, 3], 0, height)
+        overlap = (_integral(tables, x2, y2) - _integral(tables, x2, y1)
+                   - _integral(tables, x1, y2) + _integral(tables, x1, y1)).T
+        strip_area = np.maximum(x2 - x1, 0) * np.maximum(y2 - y1, 0)
+        return overlap, strip_area
+
+    def iou(self, boxes, frame_shape=None, bottom_percent=0.1):
+        """
+        Raster counterpart of `utils.zone_iou`: IoU of every foot strip with every zone.
+
+        Args:
+        - boxes (numpy array): (N, 4) bounding boxes in xyxy format.
+        - frame_shape (tuple): (height, width, ...) of the frame (default is self.frame_size).
+        - bottom_percent (float): The percentage of the bounding box's height to use (default is 0.1).
+
+        Returns:
+        - IoU (numpy array): (N, Z) Intersection over Union values.
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        if not len(boxes) or not self._zones:
+            return np.zeros((len(boxes), len(self._zones)))
+        overlap, strip_area = self.overlap(boxes, frame_shape, bottom_percent)
+        union = strip_area[:, None] + self._areas[None, :] - overlap
+        return np.divide(overlap, union, out=np.zeros_like(overlap), where=union > 0)
+
+    def fit(self, frame_size):
+        """
+        Rescales every zone in place to another (width, height), keeping the object everyone holds.
+
+        Returns:
+        - changed (bool): False when the zones already refer to that size.
+        """
+        frame_size = tuple(frame_size)
+        if frame_size == self.frame_size:
+            return False
+        scale = (frame_size[0] / self.frame_size[0], frame_size[1] / self.frame_size[1])
+        for name, zone in list(self._zones.items()):
+            self._zones[name] = DangerZone(zone.vertices * scale, name=name)
+        self.frame_size = frame_size
+        self._version += 1
+        return True
+
+    def scaled(self, frame_size):
+        """Returns a copy with every zone rescaled to another (width, height)."""
+        sx = frame_size[0] / self.frame_size[0]
+        sy = frame_size[1] / self.frame_size[1]
+        zones = {name: zone.vertices * (sx, sy) for name, zone in self._zones.items()}
+        return ZoneSet(zones, camera=self.camera, frame_size=frame_size)
+
+    def to_dict(self):
+        return {
+            'version': FORMAT_VERSION,
+            'camera': None if self.camera is None else str(self.camera),
+            'frame_size': list(self.frame_size),
+            # Integer pixel vertices keep the file small and diff-friendly
+            'zones': {name: np.round(zone.vertices).astype(int).tolist() for name, zone in self._zones.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data, frame_size=None):
+        if data.get('version', FORMAT_VERSION) != FORMAT_VERSION:
+            raise ValueError(f"Unsupported zone file version {data.get('version')}")
+        zones = cls(data['zones'], camera=data.get('camera'), frame_size=data['frame_size'])
+        if frame_size is not None and tuple(frame_size) != zones.frame_size:
+            zones = zones.scaled(frame_size)
+        return zones
+
+    def save(self, path=None):
+        """Writes the zones as JSON (default: the camera's file under settings.ZONES_DIR) and returns the path."""
+        path = Path(path) if path is not None else zones_path(self.camera)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix('.tmp')
+        temporary.write_text(json.dumps(self.to_dict(), separators=(',', ':')))
+        temporary.replace(path)
+        return path
+
+    @classmethod
+    def load(cls, path, frame_size=None):
+        """Reads a zone file, rescaling the zones when `frame_size` differs from the one they were drawn on."""
+        return cls.from_dict(json.loads(Path(path).read_text()), frame_size)
+
+    @classmethod
+    def for_camera(cls, camera, frame_size=None):
+        """Loads the saved zones of a camera, or returns an empty set when none were saved."""
+        path = zones_path(camera)
+        if path.exists():
+            return cls.load(path, frame_size)
+        return cls(camera=camera, frame_size=frame_size)
+
+
+def _integral(tables, xs, ys):
+    """Bilinear lookup of (Z, H + 1, W + 1) summed-area tables at fractional (N,) points, returning (Z, N)."""
+    x0 = np.minimum(xs.astype(np.intp), tables.shape[2] - 2)
+    y0 = np.minimum(ys.astype(np.intp), tables.shape[1] - 2)
+    fx = xs - x0
+    fy = ys - y0
+    top = tables[:, y0, x0] * (1 - fx) + tables[:, y0, x0 + 1] * fx
+    bottom = tables[:, y0 + 1, x0] * (1 - fx) + tables[:, y0 + 1, x0 + 1] * fx
+    return top * (1 - fy) + bottom * fy
+
+
+def zones_path(camera):
+    """Returns the zone file of a camera under settings.ZONES_DIR, e.g. zones/camera-0.json."""
+    slug = re.sub(r'[^A-Za-z0-9_.-]+', '-', str(camera)).strip('-') or 'default'
+    if str(camera).isdigit():
+        slug = f'camera-{slug}'
+    return Path(settings.ZONES_DIR) / f'{slug}.json'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Edit the saved danger zones of a camera")
+    parser.add_argument('camera', help="Camera index, name or stream URL")
+    parser.add_argument('--set', nargs='+', metavar=('NAME', 'XY'),
+                        help="Add or replace a zone: NAME x1 y1 x2 y2 ... in frame pixels")
+    parser.add_argument('--remove', metavar='NAME', help="Delete a zone")
+    args = parser.parse_args()
+
+    zones = ZoneSet.for_camera(args.camera)
+    if args.set:
+        name, coordinates = args.set[0], [float(value) for value in args.set[1:]]
+        if len(coordinates) < 6 or len(coordinates) % 2:
+            parser.error("--set needs a name followed by at least three x y pairs")
+        zones.set(name, np.reshape(coordinates, (-1, 2)))
+    if args.remove:
+        zones.remove(args.remove)
+    if args.set or args.remove:
+        print(f"Saved {zones.save()}")
+    for zone in zones:
+        print(f"{zone.name}: {len(zone.vertices)} vertices, area {zone.area:.0f} px")
+
+
+if __name__ == "__main__":
+    main()